@@ -28,9 +28,13 @@ with open("trino/__init__.py", "rb") as f:
 kerberos_require = ["requests_kerberos"]
 sqlalchemy_require = ["sqlalchemy~=1.3"]
 external_authentication_token_cache_require = ["keyring"]
+tracing_require = ["opentelemetry-api"]
+# the proxy argument of httpx.Client requires httpx 0.26
+http2_require = ["httpx[http2]>=0.26"]
+arrow_require = ["pyarrow"]
 
 # We don't add localstorage_require to all_require as users must explicitly opt in to use keyring.
-all_require = kerberos_require + sqlalchemy_require
+all_require = kerberos_require + sqlalchemy_require + tracing_require + http2_require + arrow_require
 
 tests_require = all_require + [
     # httpretty >= 1.1 duplicates requests in `httpretty.latest_requests`
@@ -39,6 +43,7 @@ tests_require = all_require + [
     "pytest",
     "pytest-runner",
     "click",
+    "opentelemetry-sdk",
 ]
 
 setup(
@@ -76,11 +81,19 @@ setup(
         "Topic :: Database :: Front-Ends",
     ],
     python_requires='>=3.7',
-    install_requires=["pytz", "requests"],
+    install_requires=[
+        "backports.zoneinfo;python_version<'3.9'",
+        "requests",
+        # IANA time zone database for platforms without one, e.g. Windows
+        "tzdata",
+    ],
     extras_require={
         "all": all_require,
         "kerberos": kerberos_require,
         "sqlalchemy": sqlalchemy_require,
+        "tracing": tracing_require,
+        "http2": http2_require,
+        "arrow": arrow_require,
         "tests": tests_require,
         "external-authentication-token-cache": external_authentication_token_cache_require,
     },
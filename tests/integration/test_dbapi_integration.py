@@ -14,7 +14,6 @@ from datetime import datetime, time, date, timezone, timedelta
 from decimal import Decimal
 
 import pytest
-import pytz
 import requests
 
 import trino
@@ -22,6 +21,11 @@ from tests.integration.conftest import trino_version
 from trino.exceptions import TrinoQueryError, TrinoUserError, NotSupportedError
 from trino.transaction import IsolationLevel
 
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+
 
 @pytest.fixture
 def trino_connection(run_trino):
@@ -254,7 +258,7 @@ def test_datetime_query_param(trino_connection):
 def test_datetime_with_utc_time_zone_query_param(trino_connection):
     cur = trino_connection.cursor(experimental_python_types=True)
 
-    params = datetime(2020, 1, 1, 16, 43, 22, 320000, tzinfo=pytz.timezone('UTC'))
+    params = datetime(2020, 1, 1, 16, 43, 22, 320000, tzinfo=ZoneInfo('UTC'))
 
     cur.execute("SELECT ?", params=(params,))
     rows = cur.fetchall()
@@ -280,7 +284,7 @@ def test_datetime_with_numeric_offset_time_zone_query_param(trino_connection):
 def test_datetime_with_named_time_zone_query_param(trino_connection):
     cur = trino_connection.cursor(experimental_python_types=True)
 
-    params = datetime(2020, 1, 1, 16, 43, 22, 320000, tzinfo=pytz.timezone('America/Los_Angeles'))
+    params = datetime(2020, 1, 1, 16, 43, 22, 320000, tzinfo=ZoneInfo('America/Los_Angeles'))
 
     cur.execute("SELECT ?", params=(params,))
     rows = cur.fetchall()
@@ -320,7 +324,7 @@ def test_datetimes_with_time_zone_in_dst_gap_query_param(trino_connection):
     cur = trino_connection.cursor(experimental_python_types=True)
 
     # This is a datetime that lies within a DST transition and not actually exists.
-    params = datetime(2021, 3, 28, 2, 30, 0, tzinfo=pytz.timezone('Europe/Brussels'))
+    params = datetime(2021, 3, 28, 2, 30, 0, tzinfo=ZoneInfo('Europe/Brussels'))
     with pytest.raises(trino.exceptions.TrinoUserError):
         cur.execute("SELECT ?", params=(params,))
         cur.fetchall()
@@ -331,21 +335,21 @@ def test_doubled_datetimes(trino_connection):
     # See also https://github.com/trinodb/trino/issues/5781
     cur = trino_connection.cursor(experimental_python_types=True)
 
-    params = pytz.timezone('US/Eastern').localize(datetime(2002, 10, 27, 1, 30, 0), is_dst=True)
+    params = datetime(2002, 10, 27, 1, 30, 0, tzinfo=ZoneInfo('US/Eastern'))
 
     cur.execute("SELECT ?", params=(params,))
     rows = cur.fetchall()
 
-    assert rows[0][0] == datetime(2002, 10, 27, 1, 30, 0, tzinfo=pytz.timezone('US/Eastern'))
+    assert rows[0][0] == datetime(2002, 10, 27, 1, 30, 0, tzinfo=ZoneInfo('US/Eastern'))
 
     cur = trino_connection.cursor(experimental_python_types=True)
 
-    params = pytz.timezone('US/Eastern').localize(datetime(2002, 10, 27, 1, 30, 0), is_dst=False)
+    params = datetime(2002, 10, 27, 1, 30, 0, fold=1, tzinfo=ZoneInfo('US/Eastern'))
 
     cur.execute("SELECT ?", params=(params,))
     rows = cur.fetchall()
 
-    assert rows[0][0] == datetime(2002, 10, 27, 1, 30, 0, tzinfo=pytz.timezone('US/Eastern'))
+    assert rows[0][0] == datetime(2002, 10, 27, 1, 30, 0, tzinfo=ZoneInfo('US/Eastern'))
 
 
 def test_date_query_param(trino_connection):
@@ -430,7 +434,7 @@ def test_time_with_named_time_zone_query_param(trino_connection):
     with pytest.raises(trino.exceptions.NotSupportedError):
         cur = trino_connection.cursor()
 
-        params = time(16, 43, 22, 320000, tzinfo=pytz.timezone('Asia/Shanghai'))
+        params = time(16, 43, 22, 320000, tzinfo=ZoneInfo('Asia/Shanghai'))
 
         cur.execute("SELECT ?", params=(params,))
 
@@ -565,7 +569,10 @@ def test_array_timestamp_query_param(trino_connection):
 def test_array_timestamp_with_timezone_query_param(trino_connection):
     cur = trino_connection.cursor(experimental_python_types=True)
 
-    params = [datetime(2020, 1, 1, 0, 0, 0, tzinfo=pytz.utc), datetime(2020, 1, 2, 0, 0, 0, tzinfo=pytz.utc)]
+    params = [
+        datetime(2020, 1, 1, 0, 0, 0, tzinfo=ZoneInfo('UTC')),
+        datetime(2020, 1, 2, 0, 0, 0, tzinfo=ZoneInfo('UTC')),
+    ]
 
     cur.execute("SELECT ?", params=(params,))
     rows = cur.fetchall()
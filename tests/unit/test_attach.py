@@ -0,0 +1,65 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+import trino.dbapi
+from trino.bench.coordinator import FakeCoordinator
+from trino.client import QueryHandle, RowType
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator, **kwargs):
+    return trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test", **kwargs)
+
+
+def test_submit_and_attach(coordinator):
+    with _connect(coordinator, session_properties={"query_max_run_time": "1h"}) as conn:
+        handle = conn.submit("SELECT * FROM narrow LIMIT 2500")
+    assert handle.session["properties"] == {"query_max_run_time": "1h"}
+    query = next(iter(coordinator.queries.values()))
+    assert not query.cancelled
+
+    # as sent to another process
+    handle = QueryHandle.from_json(handle.to_json())
+    with _connect(coordinator) as conn:
+        cur = conn.attach(handle, row_type=RowType.TUPLE)
+        assert cur.description[0][0] == "id"
+        rows = cur.fetchall()
+        assert len(rows) == 2500
+        assert isinstance(rows[0], tuple)
+        assert cur._query._request._client_session.properties == {"query_max_run_time": "1h"}
+        assert cur._request._client_session.properties == {}
+    assert len(coordinator.queries) == 1
+
+
+def test_attached_query_is_cancelled_on_close(coordinator):
+    handle = _connect(coordinator).submit("SELECT * FROM narrow")
+    conn = _connect(coordinator)
+    cur = conn.attach(handle)
+    cur.fetchone()
+    conn.close()
+
+    assert next(iter(coordinator.queries.values())).cancelled
+
+
+def test_detach_consumed_query(coordinator):
+    cur = _connect(coordinator).cursor()
+    cur.execute("SELECT * FROM narrow")
+    cur.fetchone()
+
+    with pytest.raises(ValueError):
+        cur._query.detach()
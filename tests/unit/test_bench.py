@@ -0,0 +1,157 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+import trino.exceptions
+from trino.bench import load, replay
+from trino.bench.coordinator import FakeCoordinator, ReplayScenario, record
+from trino.client import TrinoRequest
+from trino.dbapi import connect
+
+
+@pytest.fixture(scope="module")
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+@pytest.mark.parametrize("scenario", ["narrow", "wide", "nested", "temporal", "tiny_pages", "low_cardinality"])
+def test_fake_coordinator_scenarios(coordinator, scenario):
+    cur = connect(coordinator.host, coordinator.port, "test").cursor(experimental_python_types=True)
+
+    cur.execute("SELECT * FROM {} LIMIT 1234".format(scenario))
+    rows = cur.fetchall()
+
+    assert len(rows) == 1234
+    assert len(rows[0]) == len(cur.description)
+    assert cur.stats["state"] == "FINISHED"
+    assert cur.client_stats.rows == 1234
+
+
+def test_fake_coordinator_unknown_table(coordinator):
+    cur = connect(coordinator.host, coordinator.port, "test").cursor()
+
+    with pytest.raises(trino.exceptions.TrinoUserError):
+        cur.execute("SELECT * FROM missing")
+        cur.fetchall()
+
+
+def test_fake_coordinator_cancel(coordinator):
+    cur = connect(coordinator.host, coordinator.port, "test").cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 5000")
+
+    cur.cancel()
+
+    assert coordinator.queries[cur._query.query_id].cancelled
+
+
+def test_fake_coordinator_evicts_finished_queries():
+    with FakeCoordinator(history=2) as coordinator:
+        conn = connect(coordinator.host, coordinator.port, "test")
+        running = conn.cursor()
+        running.execute("SELECT * FROM narrow LIMIT 5000")
+        finished = []
+        for _ in range(3):
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM narrow LIMIT 10")
+            cur.fetchall()
+            finished.append(cur._query.query_id)
+        cancelled = conn.cursor()
+        cancelled.execute("SELECT * FROM narrow LIMIT 5000")
+        cancelled.cancel()
+
+        # the running query and the last finished ones are kept
+        assert list(coordinator.queries) == [running._query.query_id, finished[2], cancelled._query.query_id]
+        assert coordinator.queries[cancelled._query.query_id].cancelled
+
+
+def test_record_and_replay(coordinator, tmp_path):
+    path = str(tmp_path / "narrow.jsonl")
+    request = TrinoRequest(coordinator.host, coordinator.port, "test")
+
+    responses = record(request, "SELECT * FROM narrow LIMIT 2500", path)
+
+    assert responses == 4  # queued, two full pages and a partial page
+    with FakeCoordinator(scenarios={}) as replaying:
+        replaying.add_scenario(ReplayScenario.load("recorded", path))
+        cur = connect(replaying.host, replaying.port, "test").cursor()
+        cur.execute("SELECT * FROM recorded")
+        rows = cur.fetchall()
+
+    assert len(rows) == 2500
+    assert rows[1] == [1, "name-1", 0.5]
+
+
+def test_run_benchmark(coordinator):
+    result = replay.run_benchmark(coordinator.host, coordinator.port, "narrow", "fetchall", 2500, repeat=1)
+
+    assert result["rows"] == 2500
+    assert result["pages"] == 3
+    assert result["rows_per_second"] > 0
+    assert result["mb_per_second"] > 0
+    assert result["page_latency_p99_ms"] >= result["page_latency_p50_ms"] > 0
+    assert result["peak_memory_mb"] > 0
+
+
+def test_run_benchmark_intern_strings(coordinator):
+    result = replay.run_benchmark(coordinator.host, coordinator.port, "low_cardinality", "intern_strings", 2500,
+                                  repeat=1)
+
+    assert result["rows"] == 2500
+    assert result["rows_per_second"] > 0
+
+
+@pytest.mark.parametrize("mode", load.MODES)
+def test_run_load(coordinator, mode):
+    target = {"host": coordinator.host, "port": coordinator.port, "user": "test"}
+    result = load.run_load(target, "SELECT * FROM narrow LIMIT 1500", queries=6, concurrency=3, mode=mode)
+
+    assert result["errors"] == 0
+    assert result["rows"] == 6 * 1500
+    metrics = result["metrics"]
+    assert metrics["total_ms"]["count"] == 6
+    assert metrics["total_ms"]["p99"] >= metrics["total_ms"]["p50"] > 0
+    assert metrics["first_row_ms"]["p50"] > 0
+    assert metrics["polls"]["p50"] == 1
+    assert sum(metrics["submit_ms"]["histogram"].values()) == 6
+    assert "submit_ms" in load._format([result])
+
+
+def test_run_load_closes_connections(coordinator, monkeypatch):
+    closed = []
+    close = load._close
+
+    def record(connections):
+        closed.extend(connections)
+        close(connections)
+
+    monkeypatch.setattr(load, "_close", record)
+    target = {"host": coordinator.host, "port": coordinator.port, "user": "test"}
+    load.run_load(target, "SELECT * FROM narrow LIMIT 10", queries=6, concurrency=3)
+    load.run_load(target, "SELECT * FROM narrow LIMIT 10", queries=6, concurrency=3)
+
+    # a connection per thread of each run
+    assert 2 <= len(closed) <= 6
+    assert len(set(map(id, closed))) == len(closed)
+
+
+def test_run_load_modes():
+    with pytest.raises(ValueError):
+        load.run_load({}, "SELECT 1", queries=1, concurrency=1, mode="async")
+
+
+def test_run_load_errors(coordinator):
+    target = {"host": coordinator.host, "port": coordinator.port, "user": "test"}
+    result = load.run_load(target, "SELECT * FROM missing", queries=2, concurrency=2)
+
+    assert result["errors"] == 2
+    assert "TABLE_NOT_FOUND" in result["first_errors"][0]
@@ -0,0 +1,295 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+import time
+
+import pytest
+
+import trino.dbapi
+from trino.auth import BasicAuthentication, JWTAuthentication, OAuth2Authentication
+from trino.bench.coordinator import FakeCoordinator
+from trino.cache import CacheEntry, ResultCache, is_cacheable, normalize_sql
+from trino.client import RowType
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator, cache, **kwargs):
+    return trino.dbapi.connect(
+        host=coordinator.host, port=coordinator.port, user="test", result_cache=cache, **kwargs
+    )
+
+
+def _entry(size):
+    return CacheEntry([], RowType.LIST, None, None, {}, [], None, size)
+
+
+def test_normalize_sql():
+    assert normalize_sql("  SELECT *\n\tFROM t ;") == "SELECT * FROM t"
+    assert normalize_sql("SELECT 'a  b',  \"c  d\"") == "SELECT 'a  b', \"c  d\""
+    assert is_cacheable(" (SELECT 1)")
+    assert is_cacheable("with t as (select 1) select * from t")
+    assert not is_cacheable("INSERT INTO t SELECT 1")
+
+
+def test_cache_hit(coordinator):
+    conn = _connect(coordinator, ResultCache())
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 5")
+    rows = cur.fetchall()
+    expected = [list(row) for row in rows]
+    rows[0].append("modified")
+
+    cur = conn.cursor()
+    cur.execute("SELECT *  FROM narrow\nLIMIT 5;")
+    assert cur.fetchall() == expected
+    assert cur.description[0][0] == "id"
+    assert len(coordinator.queries) == 1
+    assert conn.result_cache.hits == 1
+
+
+def test_cache_key_includes_session(coordinator):
+    conn = _connect(coordinator, ResultCache())
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 5")
+    cur.fetchall()
+    cur.execute("SET SESSION query_max_run_time = '1h'")
+    cur.fetchall()
+    cur.execute("SELECT * FROM narrow LIMIT 5")
+    cur.fetchall()
+    conn.cursor(row_type=RowType.TUPLE).execute("SELECT * FROM narrow LIMIT 5")
+
+    assert len(coordinator.queries) == 4
+
+
+def test_cache_key_includes_principal():
+    cache = ResultCache()
+
+    def key(**kwargs):
+        conn = trino.dbapi.connect(host="coordinator", port=443, user="test", http_scheme="https", **kwargs)
+        return cache.key(conn.cursor(), "SELECT 1")
+
+    keys = [
+        key(),
+        key(auth=BasicAuthentication("alice", "secret")),
+        key(auth=BasicAuthentication("alice", "other")),
+        key(auth=JWTAuthentication("token")),
+        key(http_headers={"X-Tenant": "a"}),
+        key(client_tags=["etl"]),
+    ]
+
+    assert len(set(keys)) == len(keys)
+    assert key(auth=BasicAuthentication("alice", "secret")) == keys[1]
+    # no secret is kept in the key, which disk caches write to their files
+    assert all("secret" not in repr(k) and "token" not in repr(k) for k in keys)
+
+    oauth2 = OAuth2Authentication()
+    assert key(auth=oauth2) == key(auth=oauth2)
+    assert key(auth=oauth2) != key(auth=OAuth2Authentication())
+
+
+def test_cache_key_digests_extra_credential():
+    cache = ResultCache()
+
+    def key(extra_credential):
+        conn = trino.dbapi.connect(host="coordinator", port=8080, user="test", extra_credential=extra_credential)
+        return cache.key(conn.cursor(), "SELECT 1")
+
+    with_password = key([("pg.password", "hunter2")])
+
+    assert "hunter2" not in repr(with_password)
+    assert "pg.password" not in repr(with_password)
+    assert with_password == key([("pg.password", "hunter2")])
+    assert with_password != key([("pg.password", "other")])
+    assert with_password != key(None)
+
+
+def test_ttl():
+    cache = ResultCache(ttl=0.05)
+    calls = []
+
+    def run():
+        calls.append(1)
+        return _entry(10)
+
+    assert cache.get_or_run("key", run)[1]
+    assert not cache.get_or_run("key", run)[1]
+    time.sleep(0.1)
+    assert cache.get_or_run("key", run)[1]
+    assert len(calls) == 2
+
+
+def test_lru_eviction_by_size():
+    cache = ResultCache(max_bytes=100)
+    cache.get_or_run("a", lambda: _entry(40))
+    cache.get_or_run("b", lambda: _entry(40))
+    cache.get_or_run("a", lambda: _entry(40))
+    cache.get_or_run("c", lambda: _entry(40))
+    cache.get_or_run("d", lambda: _entry(1000))
+
+    assert len(cache) == 2
+    assert cache.size == 80
+    assert not cache.get_or_run("a", lambda: _entry(40))[1]
+    assert cache.get_or_run("b", lambda: _entry(40))[1]
+
+
+def test_concurrent_queries_are_coalesced():
+    with FakeCoordinator(delay=0.05) as coordinator:
+        cache = ResultCache()
+        results = []
+
+        def run():
+            cur = _connect(coordinator, cache).cursor()
+            cur.execute("SELECT * FROM narrow LIMIT 10")
+            results.append(cur.fetchall())
+
+        threads = [threading.Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(coordinator.queries) == 1
+        assert len(results) == 10
+        assert all(rows == results[0] for rows in results)
+        assert cache.misses == 1
+        assert cache.hits + cache.coalesced == 9
+
+
+def test_error_is_shared_and_not_cached():
+    cache = ResultCache()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("failed")
+
+    def run(run_query):
+        try:
+            cache.get_or_run("key", run_query)
+        except ValueError as err:
+            errors.append(err)
+
+    leader = threading.Thread(target=run, args=(fail,))
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=run, args=(lambda: _entry(1),))
+    waiter.start()
+    while cache.coalesced == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+
+    assert [str(err) for err in errors] == ["failed", "failed"]
+    assert len(cache) == 0
+
+
+def test_disk_cache(coordinator, tmp_path):
+    pytest.importorskip("pyarrow")
+    from trino.cache import DiskResultCache
+
+    sql = "SELECT * FROM nested LIMIT 20"
+    cur = _connect(coordinator, DiskResultCache(str(tmp_path))).cursor()
+    cur.execute(sql)
+    expected = cur.fetchall()
+    description = cur.description
+
+    # a new cache on the same directory, as in another process
+    cache = DiskResultCache(str(tmp_path))
+    for row_type in RowType:
+        cur = _connect(coordinator, cache).cursor(row_type=row_type)
+        cur.execute(sql)
+        cur.fetchall()
+    cur = _connect(coordinator, cache).cursor()
+    cur.execute(sql)
+    assert cur.fetchall() == expected
+    assert cur.description == description
+    assert len(coordinator.queries) == 3
+    assert len(cache) == 3
+
+    cache.invalidate(cur, sql)
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("row_type", list(RowType))
+def test_disk_cache_rows_read_back(coordinator, tmp_path, row_type):
+    pytest.importorskip("pyarrow")
+    from trino.cache import DiskResultCache
+
+    sql = "SELECT * FROM nested LIMIT 20"
+    cache = DiskResultCache(str(tmp_path))
+    results = []
+    for _ in range(3):
+        cur = _connect(coordinator, cache).cursor(row_type=row_type)
+        cur.execute(sql)
+        results.append(cur.fetchall())
+
+    assert len(coordinator.queries) == 1
+    assert cache.hits == 2
+    assert results[1] == results[2] == results[0]
+    row = results[2][0]
+    if row_type is RowType.NAMED:
+        assert row.a == row[0]
+        assert row._fields == tuple(column[0] for column in cur.description)
+    else:
+        assert type(row) is (tuple if row_type is RowType.TUPLE else list)
+
+
+def test_disk_cache_files_keep_no_secret(coordinator, tmp_path):
+    pytest.importorskip("pyarrow")
+    from trino.cache import DiskResultCache
+
+    # literals of the statement may be secrets too
+    sql = "SELECT * FROM narrow WHERE api_key = 'k3y' LIMIT 20"
+    cache = DiskResultCache(str(tmp_path))
+    for _ in range(2):
+        cur = _connect(coordinator, cache, extra_credential=[("pg.password", "hunter2")],
+                       http_headers={"X-Api-Key": "s3cr3t"}).cursor()
+        cur.execute(sql)
+        cur.fetchall()
+
+    assert cache.hits == 1
+    files = [path for path in tmp_path.iterdir() if path.suffix == ".arrow"]
+    assert len(files) == 1
+    content = files[0].read_bytes()
+    assert b"hunter2" not in content
+    assert b"s3cr3t" not in content
+    assert b"pg.password" not in content
+    assert b"k3y" not in content
+
+
+def test_disk_cache_eviction(tmp_path):
+    pytest.importorskip("pyarrow")
+    from trino.cache import DiskResultCache
+
+    columns = [{"name": "x", "type": "bigint"}]
+    cache = DiskResultCache(str(tmp_path), max_bytes=4096, ttl=60)
+    rows = [[i] for i in range(100)]
+    for key in range(10):
+        cache.get_or_run(key, lambda: CacheEntry(rows, RowType.LIST, None, columns, {}, [], None, 0))
+        time.sleep(0.01)
+
+    assert 0 < cache.size <= 4096
+    assert len(cache) < 10
+    entry, executed = cache.get_or_run(9, lambda: _entry(0))
+    assert not executed
+    assert list(entry.rows) == rows
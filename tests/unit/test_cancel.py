@@ -0,0 +1,120 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gc
+import time
+
+import pytest
+
+import trino.client
+import trino.dbapi
+from trino.bench.coordinator import FakeCoordinator
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator, **kwargs):
+    return trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test", **kwargs)
+
+
+def _cancelled(coordinator):
+    return sorted(query.cancelled for query in coordinator.queries.values())
+
+
+def test_connection_close_cancels_running_queries(coordinator):
+    conn = _connect(coordinator)
+    running = [conn.cursor() for _ in range(3)]
+    for cur in running:
+        cur.execute("SELECT * FROM narrow")
+        cur.fetchone()
+    finished = conn.cursor()
+    finished.execute("SELECT * FROM narrow LIMIT 10")
+    finished.fetchall()
+
+    conn.close()
+
+    assert _cancelled(coordinator) == [False, True, True, True]
+    assert all(cur._query.cancelled for cur in running)
+
+
+def test_cursor_close_cancels_its_query(coordinator):
+    conn = _connect(coordinator)
+    other = conn.cursor()
+    other.execute("SELECT * FROM narrow")
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM narrow")
+        cur.fetchone()
+
+    assert cur._query.cancelled
+    assert not other._query.cancelled
+
+
+def test_with_block_cancels_queries_on_error(coordinator):
+    with pytest.raises(ValueError):
+        with _connect(coordinator) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM narrow")
+            for _ in cur:
+                raise ValueError("stop iterating")
+
+    assert _cancelled(coordinator) == [True]
+
+
+def test_abandoned_result_is_cancelled(coordinator):
+    conn = _connect(coordinator)
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow")
+    cur.fetchone()
+    query = next(iter(coordinator.queries.values()))
+
+    # executing again abandons the result of the first query
+    cur.execute("SELECT * FROM narrow LIMIT 1")
+    cur.fetchall()
+    gc.collect()
+    assert not query.cancelled
+
+    # it is cancelled by the next query of the connection
+    conn.cursor().execute("SELECT * FROM narrow LIMIT 1")
+    assert query.cancelled
+
+
+def test_close_waits_at_most_cancel_timeout(coordinator, monkeypatch):
+    conn = _connect(coordinator, cancel_timeout=0.1)
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow")
+    monkeypatch.setattr(trino.client.TrinoQuery, "cancel", lambda query: time.sleep(1))
+
+    start = time.monotonic()
+    conn.close()
+    assert time.monotonic() - start < 0.9
+
+
+def test_max_rows_cancels_query(coordinator):
+    cur = _connect(coordinator).cursor()
+    cur.execute("SELECT * FROM narrow", max_rows=1500)
+
+    assert len(cur.fetchall()) == 1500
+    assert cur.truncated
+    assert cur._query.cancelled
+    assert _cancelled(coordinator) == [True]
+
+
+def test_max_rows_of_small_result(coordinator):
+    cur = _connect(coordinator).cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 10", max_rows=100)
+
+    assert len(cur.fetchall()) == 10
+    assert not cur.truncated
+    assert _cancelled(coordinator) == [False]
@@ -0,0 +1,79 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+import trino.dbapi
+from trino.bench.coordinator import FakeCoordinator
+from trino.checkpoint import CheckpointStore, FileCheckpointStore, MemoryCheckpointStore
+from trino.client import QueryHandle
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator, store):
+    return trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test", checkpoint_store=store)
+
+
+@pytest.mark.parametrize("make_store", [lambda path: MemoryCheckpointStore(), FileCheckpointStore])
+def test_resume_after_crash(coordinator, tmp_path, make_store):
+    store = make_store(str(tmp_path))
+    conn = _connect(coordinator, store)
+    assert conn.resume("export") is None
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 3500", checkpoint_key="export")
+    for _ in range(2500):
+        cur.fetchone()
+    # the worker crashes while processing the third page
+    conn._untrack_query(cur._query)
+    handle = store.load("export")
+    assert handle.rownumber == 2000
+
+    cur = _connect(coordinator, store).resume("export")
+    assert cur.rownumber == 2000
+    assert cur.description[0][0] == "id"
+    assert len(cur.fetchall()) == 1500
+    assert cur.rownumber == 3500
+    assert store.load("export") is None
+    assert len(coordinator.queries) == 1
+
+
+def test_file_store(tmp_path):
+    store = FileCheckpointStore(str(tmp_path))
+    store.save("a", QueryHandle("q1", "http://coordinator/1", rownumber=10))
+    store.save("a", QueryHandle("q1", "http://coordinator/2", rownumber=20))
+    assert store.load("a").next_uri == "http://coordinator/2"
+    assert store.load("a").rownumber == 20
+    assert [path.name for path in tmp_path.iterdir()] == ["a.json"]
+    store.delete("a")
+    store.delete("a")
+    assert store.load("a") is None
+    with pytest.raises(ValueError):
+        store.load("../a")
+
+
+def test_checkpoint_key_requires_store(coordinator):
+    cur = _connect(coordinator, None).cursor()
+    with pytest.raises(ValueError):
+        cur.execute("SELECT 1", checkpoint_key="export")
+
+
+def test_checkpoint_store_is_abstract():
+    class IncompleteStore(CheckpointStore):
+        def save(self, key, handle):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
@@ -13,6 +13,7 @@ import json
 import threading
 import time
 import uuid
+from datetime import timedelta
 from unittest import mock
 from urllib.parse import urlparse
 
@@ -22,13 +23,14 @@ import requests
 from httpretty import httprettified
 from requests_kerberos.exceptions import KerberosExchangeError
 
+import trino.client
 import trino.exceptions
 from tests.unit.oauth_test_utils import RedirectHandler, GetTokenCallback, PostStatementCallback, \
     MultithreadedTokenServer, _post_statement_requests, _get_token_requests, REDIRECT_RESOURCE, TOKEN_RESOURCE, \
     SERVER_ADDRESS
 from trino import constants
 from trino.auth import KerberosAuthentication, _OAuth2TokenBearer
-from trino.client import TrinoQuery, TrinoRequest, TrinoResult
+from trino.client import ClientStats, QueryListener, RowType, TrinoQuery, TrinoRequest, TrinoResult
 
 
 @mock.patch("trino.client.TrinoRequest.http")
@@ -876,7 +878,405 @@ def test_trino_query_response_headers(sample_get_response_data):
         result = query.execute(additional_http_headers=additional_headers)
 
         # Validate the the post function was called with the right argguments
-        mock_post.assert_called_once_with(sql, additional_headers)
+        mock_post.assert_called_once_with(sql, additional_headers, query._retry_budget, query.client_stats.retry_stats,
+                                          query._cancel_event)
 
         # Validate the result is an instance of TrinoResult
         assert isinstance(result, TrinoResult)
+
+
+def test_map_timestamp_with_named_time_zone():
+    data_type = {"typeSignature": {"rawType": "timestamp with time zone", "arguments": []}}
+
+    value = TrinoResult._map_to_python_type(("2002-10-27 01:30:00.000 US/Eastern", data_type))
+
+    assert value.tzinfo is trino.client._get_timezone("US/Eastern")
+    assert value.utcoffset() == timedelta(hours=-4)
+    # the time zone is looked up once per name
+    TrinoResult._map_to_python_type(("2020-01-01 00:00:00.000 US/Eastern", data_type))
+    assert trino.client._get_timezone.cache_info().hits >= 1
+
+
+def test_map_timestamp_with_unknown_time_zone():
+    data_type = {"typeSignature": {"rawType": "timestamp with time zone", "arguments": []}}
+
+    with pytest.raises(trino.exceptions.TrinoDataError):
+        TrinoResult._map_to_python_type(("2020-01-01 00:00:00.000 Mars/Olympus_Mons", data_type))
+
+
+def _mock_query(columns, pages):
+    query = mock.Mock(columns=columns, finished=False, client_stats=ClientStats())
+
+    def fetch():
+        rows = pages.pop(0)
+        query.finished = not pages
+        return rows
+
+    query.fetch.side_effect = fetch
+    return query
+
+
+@pytest.mark.parametrize("experimental_python_types", [False, True])
+def test_trino_result_tuple_rows(sample_get_response_data, experimental_python_types):
+    rows = sample_get_response_data["data"]
+    query = _mock_query(sample_get_response_data["columns"], [rows[1:]])
+
+    result = TrinoResult(query, rows[:1], experimental_python_types, row_type=RowType.TUPLE)
+
+    assert list(result) == [tuple(row) for row in rows]
+
+
+def test_trino_result_named_rows(sample_get_response_data):
+    rows = sample_get_response_data["data"]
+    query = _mock_query(sample_get_response_data["columns"], [[], rows])
+
+    result = list(TrinoResult(query, row_type="named"))
+
+    assert result == [tuple(row) for row in rows]
+    assert result[0].node_id == "UUID-0"
+    assert result[2].state == result[2][4] == "active"
+    assert result[0]._asdict()["http_uri"] == "http://worker0:8080"
+    assert type(result[0]) is type(result[1])
+    with pytest.raises(AttributeError):
+        result[0].missing
+
+
+def test_named_row_class_with_invalid_identifiers():
+    row_class = trino.client._named_row_class(("count(*)", "a", "a"))
+    row = row_class([10, 1, 2])
+
+    assert getattr(row, "count(*)") == 10
+    assert row.a == 1
+    assert repr(row) == "Row(count(*)=10, a=1, a=2)"
+
+
+def test_trino_result_intern_strings(sample_get_response_data, monkeypatch):
+    columns = sample_get_response_data["columns"]
+    pages = [
+        [["UUID-%d" % i, "http://worker:8080", "0.157", False, "".join(["act", "ive"])] for i in range(3)]
+        for _ in range(2)
+    ]
+    query = _mock_query(columns, list(pages))
+    monkeypatch.setattr(trino.client, "MAX_INTERNED_STRINGS_PER_COLUMN", 2)
+
+    rows = list(TrinoResult(query, intern_strings=True))
+
+    assert rows == [row for page in pages for row in page]
+    # low cardinality column
+    assert all(row[4] is rows[0][4] for row in rows)
+    # non string column
+    assert rows[0][3] is False
+    # high cardinality column is no longer interned after the first page
+    assert rows[3][0] == rows[0][0] and rows[3][0] is not rows[0][0]
+
+
+class RecordingListener(QueryListener):
+    def __init__(self):
+        self.events = []
+
+    def on_page(self, query, rows):
+        self.events.append(("page", query.query_id, len(rows)))
+
+    def on_completed(self, query):
+        self.events.append(("completed", query.query_id, query.client_stats.rows))
+
+    def on_failed(self, query, error):
+        self.events.append(("failed", query.query_id, type(error)))
+
+
+@httprettified
+def test_trino_query_client_stats(sample_post_response_data, sample_get_response_data):
+    next_uri = f"http://{sample_post_response_data['nextUri']}"
+    post_body = json.dumps(dict(sample_post_response_data, nextUri=next_uri))
+    get_body = json.dumps(dict(sample_get_response_data, nextUri=None))
+    httpretty.register_uri(
+        method=httpretty.POST,
+        uri=f"http://coordinator:8080{constants.URL_STATEMENT_PATH}",
+        body=post_body)
+    httpretty.register_uri(method=httpretty.GET, uri=next_uri, body=get_body)
+    listener = RecordingListener()
+
+    req = TrinoRequest(host="coordinator", port=8080, user="test")
+    query = TrinoQuery(req, "SELECT * FROM system.runtime.nodes", experimental_python_types=True,
+                       listeners=[listener])
+    rows = list(query.execute())
+
+    stats = query.client_stats
+    assert len(rows) == 3
+    assert stats.http_requests == 2
+    assert stats.bytes_received == len(post_body) + len(get_body)
+    assert stats.pages == 1
+    assert stats.rows == 3
+    assert stats.rows_per_page == 3.0
+    assert stats.http_time > 0
+    assert stats.json_decode_time > 0
+    assert stats.mapping_time > 0
+    assert stats.to_dict()["rows"] == 3
+    query_id = sample_post_response_data["id"]
+    assert listener.events == [
+        ("page", query_id, 0),
+        ("page", query_id, 3),
+        ("completed", query_id, 3),
+    ]
+
+
+@httprettified
+def test_trino_query_listener_on_failed(sample_get_error_response_data):
+    httpretty.register_uri(
+        method=httpretty.POST,
+        uri=f"http://coordinator:8080{constants.URL_STATEMENT_PATH}",
+        body=json.dumps(sample_get_error_response_data))
+    listener = RecordingListener()
+
+    query = TrinoQuery(TrinoRequest(host="coordinator", port=8080, user="test"), "SELECT", listeners=[listener])
+    with pytest.raises(trino.exceptions.TrinoUserError):
+        query.execute()
+
+    assert query.client_stats.http_requests == 1
+    assert listener.events == [("failed", None, trino.exceptions.TrinoUserError)]
+
+
+class NoDelay(object):
+    def retry(self, func, args, kwargs, err, attempt):
+        pass
+
+
+def _register_query(sample_post_response_data, sample_get_response_data, get_responses):
+    next_uri = f"http://{sample_post_response_data['nextUri']}"
+    httpretty.register_uri(
+        method=httpretty.POST,
+        uri=f"http://coordinator:8080{constants.URL_STATEMENT_PATH}",
+        body=json.dumps(dict(sample_post_response_data, nextUri=next_uri)))
+    get_body = json.dumps(dict(sample_get_response_data, nextUri=None))
+    httpretty.register_uri(
+        method=httpretty.GET,
+        uri=next_uri,
+        responses=[httpretty.Response(body="bad gateway", status=status) for status in get_responses]
+        + [httpretty.Response(body=get_body)])
+
+
+@httprettified
+def test_trino_query_resumes_fetch_after_502(sample_post_response_data, sample_get_response_data):
+    _register_query(sample_post_response_data, sample_get_response_data, [502, 504])
+
+    query = TrinoQuery(TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=NoDelay()), "SELECT")
+    rows = list(query.execute())
+
+    assert len(rows) == 3
+    assert query.client_stats.retry_stats.retries == 2
+    assert query.client_stats.retry_stats.causes == {"502": 1, "504": 1}
+    assert query.client_stats.to_dict()["retries"] == 2
+
+
+@httprettified
+def test_trino_query_does_not_retry_post_after_502(sample_post_response_data):
+    httpretty.register_uri(
+        method=httpretty.POST,
+        uri=f"http://coordinator:8080{constants.URL_STATEMENT_PATH}",
+        body="bad gateway",
+        status=502)
+
+    query = TrinoQuery(TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=NoDelay()), "SELECT")
+    with pytest.raises(trino.exceptions.HttpError) as exc_info:
+        query.execute()
+
+    assert len(httpretty.latest_requests()) == 1
+    assert exc_info.value.retry_stats.retries == 0
+
+
+def test_get_retries_truncated_body(monkeypatch):
+    http_resp = TrinoRequest.http.Response()
+    http_resp.status_code = 200
+    responses = [requests.exceptions.ChunkedEncodingError("connection broken"), http_resp]
+
+    def get(*args, **kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(TrinoRequest.http.Session, "get", get)
+    retry_stats = trino.exceptions.RetryStats()
+
+    req = TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=NoDelay())
+
+    assert req.get("URL", retry_stats=retry_stats) is http_resp
+    assert retry_stats.causes == {"ChunkedEncodingError": 1}
+
+
+@httprettified
+def test_trino_query_retry_budget(sample_post_response_data, sample_get_response_data):
+    _register_query(sample_post_response_data, sample_get_response_data, [503] * 10)
+
+    req = TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=NoDelay(), max_attempts=10)
+    query = TrinoQuery(req, "SELECT", max_retries=2)
+    with pytest.raises(trino.exceptions.Http503Error) as exc_info:
+        list(query.execute())
+
+    assert exc_info.value.retry_stats is query.client_stats.retry_stats
+    assert exc_info.value.retry_stats.retries == 2
+
+
+def test_retry_budget_shared_by_requests(monkeypatch):
+    http_resp = TrinoRequest.http.Response()
+    http_resp.status_code = 503
+    get_retry = RetryRecorder(result=http_resp)
+    monkeypatch.setattr(TrinoRequest.http.Session, "get", get_retry)
+    budget = trino.exceptions.RetryBudget(max_retries=3)
+
+    for _ in range(2):
+        TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=NoDelay(), max_attempts=3,
+                     retry_budget=budget).get("URL")
+
+    # 3 attempts for the first request, then the budget only allows one more retry
+    assert get_retry.retry_count == 5
+    assert budget.used == 3
+    assert budget.remaining == 0
+
+
+@httprettified
+def test_trino_query_cancel_interrupts_retry(sample_post_response_data, sample_get_response_data):
+    _register_query(sample_post_response_data, sample_get_response_data, [503] * 10)
+    httpretty.register_uri(
+        method=httpretty.DELETE,
+        uri=f"http://coordinator:8080/v1/query/{sample_post_response_data['id']}",
+        status=204)
+    # the first retry would wait 2 minutes
+    handle_retry = trino.exceptions.RetryWithExponentialBackoff(base=60, jitter=False)
+    req = TrinoRequest(host="coordinator", port=8080, user="test", handle_retry=handle_retry, max_attempts=10)
+    query = TrinoQuery(req, "SELECT")
+    result = query.execute()
+    timer = threading.Timer(0.2, query.cancel)
+    timer.start()
+
+    start = time.monotonic()
+    with pytest.raises(trino.exceptions.TrinoUserError, match="cancelled"):
+        list(result)
+
+    timer.join()
+    assert time.monotonic() - start < 10
+    assert query.cancelled
+    assert query.client_stats.retry_stats.retries == 1
+
+
+def test_token_bucket_retry_budget(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("trino.exceptions.time.monotonic", lambda: now[0])
+    budget = trino.exceptions.TokenBucketRetryBudget(capacity=2, rate=0.5)
+
+    assert budget.acquire()
+    assert budget.acquire()
+    assert not budget.acquire()
+    now[0] += 2
+    assert budget.remaining == 1
+    assert budget.acquire()
+    assert not budget.acquire()
+    now[0] += 60
+    assert budget.remaining == 2
+    assert budget.used == 3
+
+
+def test_retry_with_async():
+    import asyncio
+
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.exceptions.ConnectionError()
+        return "result"
+
+    with_retry = trino.exceptions.retry_with_async(
+        trino.exceptions.RetryWithExponentialBackoff(base=0.001),
+        exceptions=(requests.exceptions.ConnectionError,),
+        conditions=(),
+        max_attempts=3,
+    )
+    retry_stats = trino.exceptions.RetryStats()
+
+    assert asyncio.run(with_retry(call)(retry_stats=retry_stats)) == "result"
+    assert retry_stats.causes == {"ConnectionError": 2}
+
+
+def test_retry_with_async_cancelled():
+    import asyncio
+
+    async def call():
+        raise requests.exceptions.ConnectionError()
+
+    with_retry = trino.exceptions.retry_with_async(
+        trino.exceptions.RetryWithExponentialBackoff(base=60, jitter=False),
+        exceptions=(requests.exceptions.ConnectionError,),
+        conditions=(),
+        max_attempts=3,
+    )
+
+    async def run():
+        cancelled = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.1, cancelled.set)
+        await with_retry(call)(cancelled=cancelled)
+
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.ConnectionError) as exc_info:
+        asyncio.run(run())
+    assert time.monotonic() - start < 10
+    assert exc_info.value.retry_stats.retries == 1
+
+
+def test_retry_with_async_budget():
+    import asyncio
+
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise requests.exceptions.ConnectionError()
+
+    budget = trino.exceptions.RetryBudget(2)
+    with_retry = trino.exceptions.retry_with_async(
+        trino.exceptions.RetryWithExponentialBackoff(base=0.001),
+        exceptions=(requests.exceptions.ConnectionError,),
+        conditions=(),
+        max_attempts=5,
+        budget=budget,
+    )
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        asyncio.run(with_retry(call)())
+    assert len(calls) == 3
+    assert budget.remaining == 0
+
+    # a budget of the caller is taken from too
+    calls.clear()
+    with_retry = trino.exceptions.retry_with_async(
+        trino.exceptions.RetryWithExponentialBackoff(base=0.001),
+        exceptions=(requests.exceptions.ConnectionError,),
+        conditions=(),
+        max_attempts=5,
+    )
+    with pytest.raises(requests.exceptions.ConnectionError):
+        asyncio.run(with_retry(call)(retry_budget=trino.exceptions.RetryBudget(1)))
+    assert len(calls) == 2
+
+
+def test_trino_request_child():
+    req = TrinoRequest(host="coordinator", port=8080, user="test", session_properties={"a": "1"})
+    child = req.child()
+
+    assert child._http_session is req._http_session
+    assert child._get is req._get
+    child._client_session.update_properties([("b", "2")], ["a"])
+    child.transaction_id = "txn"
+
+    assert req._client_session.properties == {"a": "1"}
+    assert req.transaction_id == trino.client.NO_TRANSACTION
+    assert child.http_headers[constants.HEADER_SESSION] == "b=2"
+
+
+def test_trino_request_updates_headers_of_http_session():
+    http_session = requests.Session()
+    TrinoRequest(host="coordinator", port=8080, user="test", http_session=http_session, client_tags=["etl"])
+
+    assert http_session.headers[constants.HEADER_USER] == "test"
+    assert http_session.headers[constants.HEADER_CLIENT_TAGS] == "etl"
@@ -11,11 +11,12 @@
 # limitations under the License.
 import threading
 import uuid
+from datetime import datetime
 from unittest.mock import patch
 
 import httpretty
 from httpretty import httprettified
-from requests import Session
+from requests import Response, Session
 
 from tests.unit.oauth_test_utils import _post_statement_requests, _get_token_requests, RedirectHandler, \
     GetTokenCallback, REDIRECT_RESOURCE, TOKEN_RESOURCE, PostStatementCallback, SERVER_ADDRESS
@@ -23,6 +24,11 @@ from trino import constants
 from trino.auth import OAuth2Authentication
 from trino.dbapi import connect
 
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+
 
 @patch("trino.dbapi.trino.client")
 def test_http_session_is_correctly_passed_in(mock_client):
@@ -234,3 +240,59 @@ def test_tags_are_set_when_specified(mock_client):
     # THEN
     _, passed_client_tags = mock_client.TrinoRequest.call_args
     assert passed_client_tags["client_tags"] == client_tags
+
+
+def test_format_prepared_param_with_named_time_zone():
+    with connect("sample_trino_cluster:443") as conn:
+        cur = conn.cursor()
+
+    params = datetime(2020, 1, 1, 16, 43, 22, 320000, tzinfo=ZoneInfo("America/Los_Angeles"))
+
+    assert cur._format_prepared_param(params) == "TIMESTAMP '2020-01-01 16:43:22.320000 America/Los_Angeles'"
+
+
+def test_retry_budgets():
+    conn = connect("sample_trino_cluster:443", max_retries=10, query_max_retries=2)
+
+    request = conn._create_request()
+
+    assert request._retry_budget is conn.retry_budget
+    assert conn.retry_budget.capacity == 10
+    assert conn.retry_budget.rate == 10 / constants.DEFAULT_RETRY_WINDOW
+    with patch("trino.dbapi.trino.client.TrinoQuery") as mock_query:
+        conn.cursor().execute("SOME FAKE QUERY")
+    _, query_kwargs = mock_query.call_args
+    assert query_kwargs["max_retries"] == 2
+
+
+class NoDelay(object):
+    def retry(self, func, args, kwargs, err, attempt):
+        pass
+
+
+def test_connection_retry_budget_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("trino.exceptions.time.monotonic", lambda: now[0])
+    attempts = []
+
+    def get(self, url, **kwargs):
+        attempts.append(url)
+        response = Response()
+        response.status_code = 503
+        return response
+
+    monkeypatch.setattr(Session, "get", get)
+    conn = connect("coordinator", max_retries=2, retry_window=10, max_attempts=10)
+    request = conn._create_request()
+    request._handle_retry = NoDelay()
+
+    request.get("URL")
+    assert len(attempts) == 3
+    request.get("URL")
+    # the budget is exhausted
+    assert len(attempts) == 4
+
+    now[0] += 10
+    request.get("URL")
+    # refilled after the window, the connection keeps retrying
+    assert len(attempts) == 7
@@ -0,0 +1,190 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+import socket
+
+import pytest
+import requests
+
+from trino.bench.coordinator import FakeCoordinator
+from trino.dbapi import connect
+from trino.endpoints import Endpoint, EndpointSelector, LoadBalancing, parse_endpoints
+from trino.transaction import IsolationLevel
+
+
+@pytest.fixture
+def coordinators():
+    coordinators = [FakeCoordinator().start() for _ in range(3)]
+    yield coordinators
+    for coordinator in coordinators:
+        coordinator.stop()
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_parse_endpoints():
+    endpoints = parse_endpoints(["a", "b:8081", ("c", 8082)], 8080, "https")
+
+    assert [endpoint.netloc for endpoint in endpoints] == ["a:8080", "b:8081", "c:8082"]
+    assert endpoints[0].get_url("/v1/info") == "https://a:8080/v1/info"
+
+
+def test_parse_ipv6_endpoints():
+    endpoints = parse_endpoints(["[::1]:8081", "[fe80::2]", "fe80::3", ("::4", 8084)], 8080, "http")
+
+    assert [endpoint.netloc for endpoint in endpoints] == [
+        "[::1]:8081", "[fe80::2]:8080", "[fe80::3]:8080", "[::4]:8084",
+    ]
+    assert endpoints[0].get_url("/v1/statement") == "http://[::1]:8081/v1/statement"
+    # the coordinator of a nextUri is found from its netloc
+    selector = EndpointSelector(endpoints)
+    assert selector.endpoint_for("http://[::1]:8081/v1/statement/executing/q/1") is endpoints[0]
+
+    with pytest.raises(ValueError):
+        parse_endpoints(["[::1"], 8080, "http")
+    with pytest.raises(ValueError):
+        parse_endpoints(["[::1]8080"], 8080, "http")
+
+
+def test_round_robin(coordinators):
+    conn = connect(["{}:{}".format(c.host, c.port) for c in coordinators], user="test")
+
+    for _ in range(6):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM tiny_pages LIMIT 50")
+        assert len(cur.fetchall()) == 50
+
+    assert [len(coordinator.queries) for coordinator in coordinators] == [2, 2, 2]
+
+
+def test_failover_to_healthy_coordinator(coordinators):
+    hosts = [("127.0.0.1", _unused_port())] + [(c.host, c.port) for c in coordinators[:1]]
+    conn = connect(hosts, user="test", max_attempts=3)
+
+    for _ in range(4):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM narrow LIMIT 10")
+        assert len(cur.fetchall()) == 10
+
+    dead, alive = conn.endpoints.endpoints
+    assert len(coordinators[0].queries) == 4
+    assert dead.failures == 1
+    assert dead.ejected_until is not None
+    assert alive.failures == 0
+    assert alive.outstanding == 0
+    assert alive.latency > 0
+
+
+def test_next_uri_and_cancel_pinned_to_coordinator(coordinators):
+    conn = connect([(c.host, c.port) for c in coordinators[:2]], user="test")
+    cursors = []
+    for _ in range(2):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM tiny_pages LIMIT 100")
+        cursors.append(cur)
+
+    for cur in cursors:
+        assert len(cur.fetchmany(15)) == 15
+        cur.cancel()
+
+    for coordinator in coordinators[:2]:
+        query, = coordinator.queries.values()
+        assert query.cancelled
+
+
+def test_transaction_pinned_to_coordinator(coordinators):
+    conn = connect([(c.host, c.port) for c in coordinators], user="test", isolation_level=IsolationLevel.READ_COMMITTED)
+
+    for _ in range(4):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM narrow LIMIT 10")
+        assert len(cur.fetchall()) == 10
+    transaction_id = conn.transaction.id
+    conn.commit()
+
+    used = [coordinator for coordinator in coordinators if coordinator.queries]
+    assert len(used) == 1
+    queries = list(used[0].queries.values())
+    # START TRANSACTION, the queries and COMMIT
+    assert len(queries) == 6
+    assert [query.transaction_id for query in queries[1:]] == [transaction_id] * 5
+
+    # the next transaction may start on another coordinator
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 10")
+    cur.fetchall()
+    conn.commit()
+    assert sum(len(coordinator.queries) for coordinator in coordinators) == 9
+
+
+def test_retried_statement_sent_to_another_coordinator(coordinators):
+    dead = [("127.0.0.1", _unused_port()) for _ in range(2)]
+    # the first dead coordinator has always the fewest requests in flight
+    conn = connect(dead + [(coordinators[0].host, coordinators[0].port)], user="test", max_attempts=3,
+                   load_balancing=LoadBalancing.LEAST_OUTSTANDING)
+    # the dead coordinators are not ejected, only the attempts of a statement avoid them
+    conn.endpoints._max_failures = 100
+
+    for _ in range(3):
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM narrow LIMIT 10")
+        assert len(cur.fetchall()) == 10
+        assert cur.client_stats.retry_stats.retries == 2
+
+    assert len(coordinators[0].queries) == 3
+
+
+def test_least_outstanding():
+    endpoints = [Endpoint("a", 8080), Endpoint("b", 8080)]
+    selector = EndpointSelector(endpoints, LoadBalancing.LEAST_OUTSTANDING)
+
+    selector.begin(endpoints[0])
+
+    assert selector.select() is endpoints[1]
+    selector.begin(endpoints[1])
+    selector.begin(endpoints[1])
+    assert selector.select() is endpoints[0]
+
+
+def test_latency_weighted():
+    random.seed(0)
+    endpoints = [Endpoint("a", 8080), Endpoint("b", 8080)]
+    endpoints[0].latency = 0.01
+    endpoints[1].latency = 0.09
+    selector = EndpointSelector(endpoints, LoadBalancing.LATENCY_WEIGHTED)
+
+    selected = [selector.select() for _ in range(1000)]
+
+    assert 850 < selected.count(endpoints[0]) < 950
+
+
+def test_ejection_and_check_health(coordinators):
+    coordinator = coordinators[0]
+    endpoints = [Endpoint(coordinator.host, coordinator.port), Endpoint("127.0.0.1", _unused_port())]
+    selector = EndpointSelector(endpoints, ejection_time=60)
+
+    selector.begin(endpoints[0])
+    selector.end(endpoints[0], 0.1, healthy=False)
+    # fail open when every healthy endpoint is excluded
+    assert selector.select(exclude=[endpoints[1]]) is endpoints[0]
+    assert selector.select() is endpoints[1]
+
+    selector.check_health(requests.Session(), timeout=1)
+
+    assert endpoints[0].ejected_until is None
+    assert endpoints[1].ejected_until is not None
+    assert selector.select() is endpoints[0]
+    assert selector.select(exclude=endpoints) is None
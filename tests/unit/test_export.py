@@ -0,0 +1,133 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import csv
+import io
+import json
+import threading
+
+import pytest
+
+import trino.dbapi
+from trino.bench.coordinator import FakeCoordinator
+from trino.exceptions import TrinoUserError
+from trino.export import _END, _Stage, _Stopped, export, main
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator):
+    return trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test")
+
+
+def test_export_csv(coordinator, tmp_path):
+    path = str(tmp_path / "narrow.csv")
+    assert export(_connect(coordinator), "SELECT * FROM narrow LIMIT 2500", path, "csv", queue_size=1) == 2500
+
+    with open(path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["id", "name", "value"]
+    assert rows[1] == ["0", "name-0", "0.0"]
+    assert len(rows) == 2501
+
+
+def test_export_nested_values(coordinator):
+    output = io.BytesIO()
+    export(_connect(coordinator), "SELECT * FROM nested LIMIT 5", output, "csv", header=False)
+    row = next(csv.reader(io.StringIO(output.getvalue().decode())))
+    assert isinstance(json.loads(row[0]), list)
+
+    output = io.BytesIO()
+    export(_connect(coordinator), "SELECT * FROM nested LIMIT 5", output, "jsonl")
+    lines = output.getvalue().decode().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[1]) == {"a": [0], "m": {"k0": 0}, "r": [1, "field-1"]}
+
+
+def test_export_without_columns(coordinator):
+    output = io.BytesIO()
+    assert export(_connect(coordinator), "SET SESSION query_max_run_time = '1h'", output, "csv") == 0
+    assert output.getvalue() == b""
+
+
+def test_export_parquet(coordinator, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    path = str(tmp_path / "narrow.parquet")
+    export(_connect(coordinator), "SELECT * FROM narrow LIMIT 2500", path, "parquet")
+
+    table = pyarrow.parquet.read_table(path)
+    assert table.num_rows == 2500
+    assert table.schema.names == ["id", "name", "value"]
+    assert str(table.schema.field("id").type) == "int64"
+    assert pyarrow.parquet.ParquetFile(path).num_row_groups == 3
+
+
+def test_export_error(coordinator, tmp_path):
+    path = tmp_path / "missing.csv"
+    with pytest.raises(TrinoUserError):
+        export(_connect(coordinator), "SELECT * FROM missing", str(path))
+    # no partial file is left
+    assert not path.exists()
+
+
+def test_stage_stopped():
+    stopped = threading.Event()
+    stage = _Stage("test", lambda put: None, 1, stopped)
+    stage.put(1)
+    stopped.set()
+
+    # the producer learns that the item was not delivered
+    with pytest.raises(_Stopped):
+        stage.put(2)
+    # the consumer does not wait for an item that will never come
+    with pytest.raises(_Stopped):
+        list(stage)
+
+
+def test_stage_ends_without_stop():
+    stopped = threading.Event()
+    stage = _Stage("test", lambda put: None, 2, stopped)
+    stage.put(1)
+    stage.put(_END)
+    assert list(stage) == [1]
+
+
+def test_export_write_error_stops_stages(coordinator):
+    class FailingOutput(io.BytesIO):
+        def write(self, data):
+            raise OSError("disk full")
+
+    threads = set(threading.enumerate())
+    with pytest.raises(OSError, match="disk full"):
+        export(_connect(coordinator), "SELECT * FROM narrow LIMIT 100000", FailingOutput(), queue_size=1)
+
+    for thread in set(threading.enumerate()) - threads:
+        if thread.name.startswith("trino-export"):
+            thread.join(5)
+            assert not thread.is_alive()
+    assert all(query.cancelled for query in coordinator.queries.values())
+
+
+def test_main(coordinator, tmp_path, capsys):
+    path = str(tmp_path / "narrow.jsonl")
+    main([
+        "--host", coordinator.host, "--port", str(coordinator.port), "--user", "test",
+        "--format", "jsonl", "--output", path, "SELECT * FROM narrow LIMIT 10",
+    ])
+    with open(path) as file:
+        assert len(file.readlines()) == 10
+    assert "10 rows exported" in capsys.readouterr().err
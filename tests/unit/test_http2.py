@@ -0,0 +1,115 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+import time
+
+import pytest
+import requests
+
+import trino.dbapi
+from trino.auth import BasicAuthentication
+from trino.bench.coordinator import FakeCoordinator
+from trino.http2 import Http2Session
+
+httpx = pytest.importorskip("httpx")
+
+
+def test_queries_over_http2_session():
+    with FakeCoordinator() as coordinator, Http2Session() as http_session:
+        conn = trino.dbapi.connect(
+            host=coordinator.host, port=coordinator.port, user="test", http_session=http_session
+        )
+        cursors = [conn.cursor() for _ in range(5)]
+        for cur in cursors:
+            cur.execute("SELECT * FROM narrow LIMIT 10")
+        for cur in cursors:
+            assert len(cur.fetchall()) == 10
+        assert cursors[0].description[0][0] == "id"
+
+
+def test_headers_and_basic_authentication():
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        return httpx.Response(200, json={"ok": True})
+
+    http_session = Http2Session(transport=httpx.MockTransport(handler))
+    http_session.headers["X-Trino-User"] = "test"
+    BasicAuthentication("user", "password").set_http_session(http_session)
+
+    response = http_session.post("http://coordinator/v1/statement", data=b"SELECT 1", headers={"X-Extra": "1"})
+
+    assert response.ok
+    assert response.json() == {"ok": True}
+    request = requests_seen[0]
+    assert request.content == b"SELECT 1"
+    assert request.headers["X-Trino-User"] == "test"
+    assert request.headers["X-Extra"] == "1"
+    assert request.headers["Authorization"].startswith("Basic ")
+
+
+def test_redirect_is_returned_when_not_followed():
+    def handler(request):
+        return httpx.Response(307, headers={"Location": "http://other/v1/statement"})
+
+    http_session = Http2Session(transport=httpx.MockTransport(handler))
+    response = http_session.post("http://coordinator/v1/statement", data=b"SELECT 1", allow_redirects=False)
+
+    assert response.is_redirect
+    assert response.headers["location"] == "http://other/v1/statement"
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (httpx.ConnectTimeout("timeout"), requests.exceptions.ConnectTimeout),
+        (httpx.ReadTimeout("timeout"), requests.exceptions.ReadTimeout),
+        (httpx.ConnectError("refused"), requests.exceptions.ConnectionError),
+        (httpx.RemoteProtocolError("reset"), requests.exceptions.ConnectionError),
+    ],
+)
+def test_errors_are_translated(error, expected):
+    def handler(request):
+        raise error
+
+    http_session = Http2Session(transport=httpx.MockTransport(handler))
+    with pytest.raises(expected):
+        http_session.get("http://coordinator/v1/statement/1")
+
+
+def test_single_client_created_by_concurrent_requests(monkeypatch):
+    clients = []
+    client_class = httpx.Client
+
+    def create_client(**kwargs):
+        # widen the window of the race between the first requests
+        time.sleep(0.05)
+        clients.append(client_class(**kwargs))
+        return clients[-1]
+
+    monkeypatch.setattr(httpx, "Client", create_client)
+    http_session = Http2Session(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    barrier = threading.Barrier(8)
+
+    def run():
+        barrier.wait()
+        http_session.get("http://coordinator/v1/info")
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    http_session.close()
+
+    assert len(clients) == 1
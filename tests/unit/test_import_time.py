@@ -0,0 +1,103 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+Import time regression checks. Each statement is run in a fresh interpreter
+with ``-X importtime`` so that modules already loaded by pytest do not hide
+regressions. The imported modules are always checked. The time spent is
+only checked against budgets given in the environment, as timings vary too
+much between machines: ::
+
+    $ TRINO_IMPORT_TIME_BUDGET_US=5000 TRINO_DBAPI_IMPORT_TIME_BUDGET_US=300000 pytest tests/unit/test_import_time.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# modules ``import trino`` must not load, the package imports nothing until a submodule is accessed
+HEAVY_MODULES = ["requests", "pytz", "webbrowser", "trino.client", "trino.dbapi"]
+
+LAZY_MODULES = ["pytz", "webbrowser", "trino.auth", "requests_kerberos", "keyring", "sqlalchemy"]
+
+# cumulative import time budgets in microseconds, by module, and the variables setting them
+IMPORT_TIME_BUDGETS = {
+    "trino": "TRINO_IMPORT_TIME_BUDGET_US",
+    "trino.dbapi": "TRINO_DBAPI_IMPORT_TIME_BUDGET_US",
+}
+
+
+def _import_times(statement):
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:
+            # header line
+            continue
+    return times
+
+
+def test_import_trino_does_not_load_heavy_modules():
+    process = subprocess.run(
+        [sys.executable, "-c", "import json, sys, trino; print(json.dumps(sorted(sys.modules)))"],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    modules = set(json.loads(process.stdout))
+
+    assert "trino" in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules, "{} imported by 'import trino'".format(module)
+
+
+@pytest.mark.parametrize("statement", ["import trino", "import trino.dbapi", "import trino.client"])
+def test_optional_modules_are_not_imported_eagerly(statement):
+    times = _import_times(statement)
+
+    for module in LAZY_MODULES:
+        assert module not in times, "{} imported by '{}'".format(module, statement)
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_TIME_BUDGETS))
+def test_import_time_is_within_budget(module):
+    variable = IMPORT_TIME_BUDGETS[module]
+    if not os.environ.get(variable):
+        pytest.skip("{} is not set".format(variable))
+    budget = int(os.environ[variable])
+
+    # the fastest of a few runs, the others being slowed down by the machine rather than the imports
+    spent = min(_import_times("import " + module)[module] for _ in range(3))
+
+    assert spent <= budget, "'import {}' took {}us, budget {}us".format(module, spent, budget)
+
+
+def test_submodules_are_accessible_from_package():
+    process = subprocess.run(
+        [sys.executable, "-c", "import trino; print(trino.dbapi.connect.__module__, trino.constants.DEFAULT_PORT)"],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    assert process.stdout.split() == ["trino.dbapi", "8080"]
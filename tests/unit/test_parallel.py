@@ -0,0 +1,164 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import collections
+import concurrent.futures
+import datetime
+import decimal
+import hashlib
+import re
+import sqlite3
+import time
+
+import pytest
+
+import trino.dbapi
+import trino.parallel
+from trino.bench.coordinator import FakeCoordinator
+from trino.exceptions import TrinoUserError
+from trino.parallel import _literal, partition_queries, read
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _target(coordinator):
+    return {"host": coordinator.host, "port": coordinator.port, "user": "test"}
+
+
+def test_range_partitions():
+    queries = partition_queries("SELECT * FROM t;", "id", 4, bounds=(0, 100))
+    assert queries == [
+        'SELECT * FROM (SELECT * FROM t) AS partitioned WHERE "id" < 25 OR "id" IS NULL',
+        'SELECT * FROM (SELECT * FROM t) AS partitioned WHERE "id" >= 25 AND "id" < 50',
+        'SELECT * FROM (SELECT * FROM t) AS partitioned WHERE "id" >= 50 AND "id" < 75',
+        'SELECT * FROM (SELECT * FROM t) AS partitioned WHERE "id" >= 75',
+    ]
+    # fewer partitions than requested for a small range
+    assert len(partition_queries("SELECT * FROM t", "id", 8, bounds=(1, 3))) == 3
+    assert partition_queries("SELECT * FROM t", "id", 8, bounds=(None, None)) == ["SELECT * FROM t"]
+
+    bounds = (datetime.date(2022, 1, 1), datetime.date(2022, 1, 30))
+    queries = partition_queries("SELECT * FROM t", "day", 2, bounds=bounds)
+    assert queries[1].endswith("\"day\" >= DATE '2022-01-16'")
+
+
+def test_literal():
+    assert _literal(datetime.date(2022, 1, 1)) == "DATE '2022-01-01'"
+    assert _literal(decimal.Decimal("1.50")) == "DECIMAL '1.50'"
+    # nested values are formatted as parameters of cursors are
+    assert _literal([1, (2, "a")]) == "ARRAY[1,ROW(2,'a')]"
+    assert _literal({"k": None}) == "MAP(ARRAY['k'], ARRAY[NULL])"
+
+
+def test_hash_partitions():
+    queries = partition_queries("SELECT * FROM t", 'odd"name', 3, method="hash")
+    assert len(queries) == 3
+    assert '"odd""name"' in queries[0]
+    assert queries[2].endswith(", 3) = 2")
+
+
+def _sqlite_dataset(values):
+    """Table ``t(id, x)`` of ``values`` in SQLite, with the functions of the hash partitions."""
+    db = sqlite3.connect(":memory:")
+    db.create_function("to_utf8", 1, lambda value: value.encode("utf-8"))
+    # stand-in for xxhash64, the buckets only depend on the 64 bits being spread
+    db.create_function("xxhash64", 1, lambda value: hashlib.blake2b(value, digest_size=8).digest())
+    db.create_function("from_big_endian_64", 1, lambda value: int.from_bytes(value, "big", signed=True))
+    db.create_function("bitwise_and", 2, lambda a, b: a & b)
+    db.create_function("mod", 2, lambda a, b: a % b)
+    db.execute("CREATE TABLE t (id INTEGER, x)")
+    db.executemany("INSERT INTO t VALUES (?, ?)", list(enumerate(values)))
+    return db
+
+
+def _sqlite_literals(sql):
+    # dates and timestamps are stored as ISO strings, decimals and doubles as numbers
+    sql = re.sub(r"\b(?:DATE|TIMESTAMP) ('[^']*')", r"\1", sql)
+    return re.sub(r"\b(?:DECIMAL|DOUBLE) '([^']*)'", r"\1", sql)
+
+
+@pytest.mark.parametrize("values, stored", [
+    (list(range(-7, 53)), int),
+    ([decimal.Decimal(i) / 8 for i in range(-20, 40)], float),
+    ([i / 3 for i in range(-20, 40)], float),
+    ([datetime.date(2021, 12, 25) + datetime.timedelta(days=i) for i in range(70)], str),
+    ([datetime.datetime(2022, 1, 1) + datetime.timedelta(minutes=97 * i) for i in range(60)],
+     lambda value: value.strftime("%Y-%m-%d %H:%M:%S.%f")),
+])
+@pytest.mark.parametrize("partitions", [1, 2, 3, 7, 16])
+@pytest.mark.parametrize("method", ["range", "hash"])
+def test_partitions_cover_dataset(values, stored, partitions, method):
+    values = values + [None, values[0], values[-1]]
+    db = _sqlite_dataset([stored(value) if value is not None else None for value in values])
+    bounds = (min(v for v in values if v is not None), max(v for v in values if v is not None))
+    queries = partition_queries("SELECT * FROM t", "x", partitions, method, bounds)
+
+    ids = collections.Counter()
+    for query in queries:
+        ids.update(row[0] for row in db.execute(_sqlite_literals(query)))
+
+    # every row is in exactly one partition
+    assert ids == collections.Counter(range(len(values)))
+
+
+def test_read_rows(coordinator):
+    conn = trino.dbapi.connect(**_target(coordinator))
+    rows = read(conn, "SELECT * FROM narrow LIMIT 1500", "id", partitions=3, bounds=(0, 1499), output="rows")
+
+    # the stand-in coordinator ignores the predicates, every partition returns the whole table
+    assert len(rows) == 3 * 1500
+    assert len(coordinator.queries) == 3
+
+
+def test_read_arrow_in_processes(coordinator):
+    pytest.importorskip("pyarrow")
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        table = read(_target(coordinator), "SELECT * FROM narrow LIMIT 100", "id", partitions=2,
+                     method="hash", executor=executor)
+
+    assert table.num_rows == 200
+    assert table.column_names == ["id", "name", "value"]
+
+
+def test_read_error(coordinator):
+    conn = trino.dbapi.connect(**_target(coordinator))
+    with pytest.raises(TrinoUserError):
+        read(conn, "SELECT * FROM missing", "id", partitions=2, method="hash", output="rows")
+
+
+def test_read_error_cancels_other_partitions(monkeypatch):
+    fetch = trino.parallel._fetch
+
+    def failing_fetch(connection, sql, stopped=None):
+        if "IS NULL" not in sql:
+            return fetch(connection, sql, stopped)
+        # fails once the other partitions are running
+        deadline = time.monotonic() + 5
+        while len(coordinator.queries) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        raise TrinoUserError({"message": "failed partition"}, query_id="failed")
+
+    monkeypatch.setattr(trino.parallel, "_fetch", failing_fetch)
+    with FakeCoordinator(delay=0.01) as coordinator:
+        conn = trino.dbapi.connect(**_target(coordinator))
+        start = time.monotonic()
+        with pytest.raises(TrinoUserError, match="failed partition"):
+            read(conn, "SELECT * FROM narrow LIMIT 1000000", "id", partitions=3, bounds=(0, 999999),
+                 output="rows")
+
+        # the queries of the other partitions are cancelled before the error is raised
+        assert len(coordinator.queries) == 2
+        assert all(query.cancelled for query in coordinator.queries.values())
+        assert time.monotonic() - start < 5
@@ -0,0 +1,169 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+
+import pytest
+
+from trino.bench.coordinator import FakeCoordinator
+from trino.dbapi import IsolationLevel
+from trino.exceptions import OperationalError
+from trino.pool import ConnectionPool
+
+
+@pytest.fixture(scope="module")
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _pool(coordinator, **kwargs):
+    return ConnectionPool(host=coordinator.host, port=coordinator.port, user="test", **kwargs)
+
+
+def test_connection_is_reused(coordinator):
+    pool = _pool(coordinator, min_size=1)
+    assert pool.size == 1
+
+    with pool.connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM narrow LIMIT 3")
+        assert len(cur.fetchall()) == 3
+        first = conn.connection
+    with pool.connect() as conn:
+        assert conn.connection is first
+        assert conn._http_session is pool.http_session
+
+    assert pool.size == 1
+    assert pool.idle == 1
+
+
+def test_closed_connection_cannot_be_used(coordinator):
+    pool = _pool(coordinator)
+    conn = pool.connect()
+    conn.close()
+    conn.close()
+
+    with pytest.raises(OperationalError):
+        conn.cursor()
+    assert pool.idle == 1
+
+
+def test_max_size_and_timeout(coordinator):
+    pool = _pool(coordinator, max_size=2, timeout=0.1)
+    pool.connect()
+    second = pool.connect()
+
+    with pytest.raises(OperationalError, match="no connection available"):
+        pool.connect()
+    assert pool.size == 2
+
+    pool = _pool(coordinator, max_size=1, timeout=5)
+    first = pool.connect()
+    connection = first.connection
+    threading.Timer(0.05, first.close).start()
+
+    # waits for the connection to be returned
+    assert pool.connect().connection is connection
+    assert pool.size == 1
+    second.close()
+
+
+def test_max_lifetime_and_idle_timeout(coordinator):
+    pool = _pool(coordinator, max_lifetime=0)
+    conn = pool.connect()
+    first = conn.connection
+    conn.close()
+    assert pool.connect().connection is not first
+
+    pool = _pool(coordinator, min_size=1, max_size=3, idle_timeout=0)
+    kept, extra = pool.connect(), pool.connect()
+    extra.close()
+    kept.close()
+    assert pool.size == 2
+    # idle for longer than idle_timeout, only the connection above min_size is closed
+    pool.connect()
+    assert pool.size == 1
+
+
+def test_validation_query(coordinator):
+    pool = _pool(coordinator, validation_query="SELECT * FROM narrow LIMIT 1")
+    pool.connect().close()
+
+    pool = _pool(coordinator, validation_query="SELECT * FROM missing")
+    with pytest.raises(OperationalError, match="validation"):
+        pool.connect()
+    assert pool.size == 0
+
+
+def test_stale_warm_connection_is_replaced(coordinator):
+    pool = _pool(coordinator, min_size=1, validation_query="SELECT * FROM narrow LIMIT 1")
+    warm = pool._idle[0]
+    validate = pool._validate
+    # the connection created up front went stale, e.g. its coordinator restarted
+    pool._validate = lambda entry: entry is not warm and validate(entry)
+
+    with pool.connect() as conn:
+        assert conn.connection is not warm.connection
+    assert pool.size == 1
+
+
+def test_release_resets_connection(coordinator):
+    pool = _pool(coordinator)
+    conn = pool.connect()
+    conn._isolation_level = IsolationLevel.READ_COMMITTED
+    conn.close()
+
+    assert pool.connect().isolation_level == IsolationLevel.AUTOCOMMIT
+
+
+def test_release_resets_session(coordinator):
+    pool = _pool(coordinator, catalog="system", session_properties={"query_max_run_time": "1h"})
+    conn = pool.connect()
+    first = conn.connection
+    cur = conn.cursor()
+    cur.execute("SET SESSION join_distribution_type = 'BROADCAST'")
+    cur.fetchall()
+    conn.catalog = "other"
+    conn.session_properties["query_max_run_time"] = "2h"
+    conn.query_listeners.append(object())
+    conn.close()
+
+    conn = pool.connect()
+    assert conn.connection is first
+    assert conn.catalog == "system"
+    assert conn.query_listeners == []
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 1")
+    cur.fetchall()
+    query = coordinator.queries[cur._query.query_id]
+    assert query.session == {"query_max_run_time": "1h"}
+    # nor are the arguments of new connections changed
+    assert pool._connect_kwargs["session_properties"] == {"query_max_run_time": "1h"}
+
+
+def test_sqlalchemy_creator(coordinator):
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from sqlalchemy.pool import NullPool
+
+    from sqlalchemy.dialects import registry
+    registry.register("trino", "trino.sqlalchemy.dialect", "TrinoDialect")
+
+    pool = _pool(coordinator, max_size=1)
+    engine = sqlalchemy.create_engine("trino://", creator=pool.connect, poolclass=NullPool)
+
+    for _ in range(3):
+        with engine.connect() as connection:
+            rows = connection.execute(sqlalchemy.text("SELECT * FROM narrow LIMIT 5")).fetchall()
+            assert len(rows) == 5
+
+    assert pool.size == 1
+    assert pool.idle == 1
@@ -0,0 +1,91 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from unittest import mock
+
+import pytest
+
+import trino.dbapi
+from trino.bench.coordinator import FakeCoordinator
+from trino.client import ClientStats
+from trino.progress import ProgressListener
+
+
+@pytest.fixture
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _connect(coordinator, **kwargs):
+    return trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test", **kwargs)
+
+
+def _query(stats, finished=False):
+    return mock.Mock(stats=stats, finished=finished, query_id="q1", client_stats=ClientStats())
+
+
+def test_progress_callback(coordinator):
+    reports = []
+    cur = _connect(coordinator, progress_interval=0).cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 3500", progress=reports.append)
+    assert cur.progress.state == "QUEUED"
+    cur.fetchall()
+
+    # the queued response, 4 pages and the completion
+    assert len(reports) == 6
+    assert [report.processed_rows for report in reports[1:5]] == [1000, 2000, 3000, 3500]
+    last = reports[-1]
+    assert last.state == "FINISHED"
+    assert last.percentage == 100.0
+    assert last.eta == 0.0
+    assert last.rows_received == 3500
+    assert cur.progress is last
+
+
+def test_progress_callback_is_rate_limited(coordinator):
+    reports = []
+    cur = _connect(coordinator, progress_interval=60).cursor()
+    cur.execute("SELECT * FROM narrow LIMIT 3500", progress=reports.append)
+    cur.fetchall()
+
+    assert [report.state for report in reports] == ["QUEUED", "FINISHED"]
+
+
+def test_eta_and_rates():
+    listener = ProgressListener()
+    listener.on_page(_query({"state": "RUNNING", "processedRows": 0}), [])
+    query = _query({
+        "state": "RUNNING",
+        "progressPercentage": 25.0,
+        "elapsedTimeMillis": 10000,
+        "queuedTimeMillis": 2000,
+        "processedRows": 100,
+        "processedBytes": 1000,
+    })
+    listener.on_page(query, [])
+
+    progress = listener.progress
+    assert progress.eta == pytest.approx(24.0)
+    assert progress.elapsed == 10.0
+    assert progress.queued == 2.0
+    assert progress.rows_per_second > 0
+    assert progress.bytes_per_second > 0
+    assert progress.stalled < 1.0
+
+
+def test_failing_callback_is_logged():
+    def fail(progress):
+        raise ValueError("failed")
+
+    listener = ProgressListener(fail)
+    listener.on_completed(_query({"state": "FINISHED"}, finished=True))
+    assert listener.progress.state == "FINISHED"
@@ -0,0 +1,125 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+
+import pytest
+
+from trino.bench.coordinator import FakeCoordinator
+from trino.client import ClientSession, TrinoQuery, TrinoRequest
+from trino.dbapi import connect
+
+THREADS = 200
+
+
+@pytest.fixture(scope="module")
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+def _run_threads(target):
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def run(i):
+        try:
+            barrier.wait()
+            target(i)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_cursors_of_a_shared_connection(coordinator):
+    session_properties = {"query_priority": "1"}
+    conn = connect(coordinator.host, coordinator.port, "test", session_properties=session_properties)
+    results = {}
+
+    def run(i):
+        cur = conn.cursor()
+        cur.execute("SET SESSION thread_{} = '{}'".format(i, i))
+        cur.fetchall()
+        # tiny pages, each query fetches several pages while the other threads do
+        cur.execute("SELECT * FROM tiny_pages LIMIT {}".format(20 + i))
+        results[i] = (cur.fetchall(), coordinator.queries[cur._query.query_id].session)
+
+    _run_threads(run)
+
+    for i, (rows, session) in results.items():
+        assert len(rows) == 20 + i
+        assert session["query_priority"] == "1"
+        assert session["thread_{}".format(i)] == str(i)
+    # no update of a thread is lost
+    expected = {"thread_{}".format(i): str(i) for i in range(THREADS)}
+    expected["query_priority"] = "1"
+    assert conn._client_session.properties == expected
+    assert session_properties == {"query_priority": "1"}
+
+
+def test_set_session_shared_by_the_cursors_of_a_connection(coordinator):
+    conn = connect(coordinator.host, coordinator.port, "test")
+    first = conn.cursor()
+    second = conn.cursor()
+
+    first.execute("SET SESSION query_max_run_time = '2h'")
+    first.fetchall()
+    second.execute("SELECT * FROM narrow LIMIT 10")
+    second.fetchall()
+    assert coordinator.queries[second._query.query_id].session == {"query_max_run_time": "2h"}
+
+    second.execute("RESET SESSION query_max_run_time")
+    second.fetchall()
+    first.execute("SELECT * FROM narrow LIMIT 10")
+    first.fetchall()
+    assert coordinator.queries[first._query.query_id].session == {}
+
+
+def test_queries_of_a_shared_request(coordinator):
+    request = TrinoRequest(coordinator.host, coordinator.port, "test")
+    results = {}
+
+    def run(i):
+        query = TrinoQuery(request, "SELECT * FROM tiny_pages LIMIT {}".format(20 + i))
+        results[i] = (list(query.execute()), query.finished)
+
+    _run_threads(run)
+
+    for i, (rows, finished) in results.items():
+        assert len(rows) == 20 + i
+        assert finished
+
+
+def test_session_property_updates_are_not_lost(coordinator):
+    request = TrinoRequest(coordinator.host, coordinator.port, "test")
+
+    def run(i):
+        list(TrinoQuery(request, "SET SESSION property_{} = '{}'".format(i, i)).execute())
+
+    _run_threads(run)
+
+    assert request._client_session.properties == {"property_{}".format(i): str(i) for i in range(THREADS)}
+
+
+def test_session_properties_are_copied_on_write():
+    session = ClientSession("catalog", "schema", "source", "user", properties={"a": "1", "b": "2"})
+    snapshot = session.properties
+
+    session.update_properties(set_properties=[("c", "3")], clear_properties=["a"])
+
+    assert snapshot == {"a": "1", "b": "2"}
+    assert session.properties == {"b": "2", "c": "3"}
@@ -0,0 +1,87 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+import httpretty
+import pytest
+from httpretty import httprettified
+
+from trino import constants, tracing
+from trino.client import TrinoQuery, TrinoRequest
+
+sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+in_memory_span_exporter = pytest.importorskip("opentelemetry.sdk.trace.export.in_memory_span_exporter")
+span_export = pytest.importorskip("opentelemetry.sdk.trace.export")
+
+
+@pytest.fixture
+def span_exporter():
+    exporter = in_memory_span_exporter.InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(span_export.SimpleSpanProcessor(exporter))
+    tracing.enable(provider)
+    yield exporter
+    tracing.disable()
+
+
+def test_disabled_tracing_uses_no_op_span():
+    assert not tracing.is_enabled()
+    span = tracing.start_span("trino.test", {"key": "value"})
+
+    assert span is tracing.start_span("trino.other")
+    with span as current:
+        assert current is None
+        tracing.set_attribute("key", "value")
+        tracing.add_event("event")
+
+
+@httprettified
+def test_query_spans(span_exporter, sample_post_response_data, sample_get_response_data):
+    next_uri = f"http://{sample_post_response_data['nextUri']}"
+    httpretty.register_uri(
+        method=httpretty.POST,
+        uri=f"http://coordinator:8080{constants.URL_STATEMENT_PATH}",
+        body=json.dumps(dict(sample_post_response_data, nextUri=next_uri)))
+    get_body = json.dumps(dict(sample_get_response_data, nextUri=None))
+    httpretty.register_uri(method=httpretty.GET, uri=next_uri, body=get_body)
+
+    query = TrinoQuery(TrinoRequest(host="coordinator", port=8080, user="test"), "SELECT 1")
+    assert len(list(query.execute())) == 3
+
+    spans = {span.name: span for span in span_exporter.get_finished_spans()}
+    assert set(spans) == {"trino.query.execute", "trino.query.fetch", "trino.request.post", "trino.request.get"}
+    query_id = sample_post_response_data["id"]
+    assert spans["trino.query.execute"].attributes["db.statement"] == "SELECT 1"
+    assert spans["trino.query.execute"].attributes["trino.query_id"] == query_id
+    assert spans["trino.request.post"].parent.span_id == spans["trino.query.execute"].context.span_id
+    assert spans["trino.query.fetch"].attributes["trino.query_id"] == query_id
+    assert spans["trino.query.fetch"].attributes["trino.page.rows"] == 3
+    assert spans["trino.request.get"].parent.span_id == spans["trino.query.fetch"].context.span_id
+    assert spans["trino.request.get"].attributes["http.status_code"] == 200
+    assert spans["trino.request.get"].attributes["http.response_content_length"] == len(get_body)
+
+
+@httprettified
+def test_retry_events(span_exporter, monkeypatch):
+    httpretty.register_uri(
+        method=httpretty.GET,
+        uri="http://coordinator:8080/v1/statement/1",
+        responses=[httpretty.Response(body="", status=503), httpretty.Response(body="{}", status=200)])
+    monkeypatch.setattr("trino.exceptions.time.sleep", lambda delay: None)
+
+    TrinoRequest(host="coordinator", port=8080, user="test").get("http://coordinator:8080/v1/statement/1")
+
+    span, = span_exporter.get_finished_spans()
+    event, = span.events
+    assert event.name == "retry"
+    assert event.attributes["attempt"] == 1
+    assert event.attributes["http.status_code"] == 503
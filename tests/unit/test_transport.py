@@ -0,0 +1,117 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import socket
+
+import pytest
+import requests
+
+import trino.dbapi
+from trino.auth import OAuth2Authentication
+from trino.bench.coordinator import FakeCoordinator
+from trino.transport import RequestsTransport, Transport, TransportResponse, Urllib3Transport
+
+
+@pytest.fixture(scope="module")
+def coordinator():
+    with FakeCoordinator() as coordinator:
+        yield coordinator
+
+
+@pytest.mark.parametrize("transport_class", [RequestsTransport, Urllib3Transport])
+def test_queries_over_transport(coordinator, transport_class):
+    with transport_class() as transport:
+        conn = trino.dbapi.connect(host=coordinator.host, port=coordinator.port, user="test", http_session=transport)
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM narrow LIMIT 250")
+        assert len(cur.fetchall()) == 250
+
+        cur.execute("SET SESSION query_max_run_time = '1h'")
+        cur.fetchall()
+        assert cur._request._client_session.properties == {"query_max_run_time": "1h"}
+
+
+def test_urllib3_transport_streams_body(coordinator):
+    with Urllib3Transport() as transport:
+        response = transport.get(coordinator.url + "/v1/info", stream=True)
+        assert response.ok
+        body = b"".join(response.iter_content())
+        assert b'"starting"' in body
+
+
+def test_urllib3_transport_raises_requests_errors():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with Urllib3Transport() as transport:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            transport.get("http://127.0.0.1:{}/v1/info".format(port), timeout=1)
+
+
+class _OAuth2Transport(Transport):
+    """Transport answering like a coordinator requiring OAuth2 authentication."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send(self, request, timeout=None, allow_redirects=False, stream=False, **kwargs):
+        self.sent.append((request.method, request.url, request.headers.get("Authorization")))
+        if request.url == "https://coordinator/oauth2/token/1":
+            return TransportResponse(200, {}, request.url, request, b'{"token": "the-token"}', connection=self)
+        if request.headers.get("Authorization") == "Bearer the-token":
+            return TransportResponse(200, {}, request.url, request, b"{}", connection=self)
+        headers = {
+            "WWW-Authenticate": 'Bearer x_redirect_server="https://coordinator/oauth2/redirect", '
+                                'x_token_server="https://coordinator/oauth2/token/1"',
+        }
+        return TransportResponse(401, headers, request.url, request, b"", connection=self)
+
+
+def test_oauth2_authentication_over_transport():
+    redirects = []
+    transport = _OAuth2Transport()
+    auth = OAuth2Authentication(redirect_auth_url_handler=redirects.append)
+    auth._bearer._token_cache = trino.auth._OAuth2TokenInMemoryCache()
+    auth.set_http_session(transport)
+
+    response = transport.get("https://coordinator/v1/statement/1")
+
+    assert response.status_code == 200
+    assert redirects == ["https://coordinator/oauth2/redirect"]
+    assert transport.sent == [
+        ("GET", "https://coordinator/v1/statement/1", None),
+        ("GET", "https://coordinator/oauth2/token/1", None),
+        ("GET", "https://coordinator/v1/statement/1", "Bearer the-token"),
+    ]
+
+    # the token is then sent up front
+    transport.get("https://coordinator/v1/statement/2")
+    assert transport.sent[-1] == ("GET", "https://coordinator/v1/statement/2", "Bearer the-token")
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+def test_request_proxies_without_transport_proxy():
+    transport = _OAuth2Transport()
+
+    with pytest.raises(ValueError, match="no proxy"):
+        transport.get("https://coordinator/v1/info", proxies={"https": "socks5://proxy:1080"})
+    assert transport.sent == []
+
+    transport.get("https://coordinator/v1/info", proxies={})
+    transport._proxy = "socks5://proxy:1080"
+    transport.get("https://coordinator/v1/info", proxies={"https": "socks5://proxy:1080"})
+    assert len(transport.sent) == 2
@@ -15,16 +15,16 @@ import json
 import os
 import re
 import threading
-import webbrowser
 from typing import Optional, List, Callable
 from urllib.parse import urlparse
 
-from requests import Request
+from requests import PreparedRequest, Request
 from requests.auth import AuthBase, extract_cookies_to_jar
 from requests.utils import parse_dict_header
 import importlib
 
 import trino.logging
+from trino import tracing
 from trino.client import exceptions
 
 logger = trino.logging.get_logger(__name__)
@@ -186,6 +186,8 @@ class WebBrowserRedirectHandler(RedirectHandler):
     """
 
     def __call__(self, url: str) -> None:
+        import webbrowser
+
         webbrowser.open_new(url)
 
 
@@ -299,7 +301,8 @@ class _OAuth2TokenBearer(AuthBase):
         if acquired:
             try:
                 # Lock is acquired, attempt the OAuth2 flow
-                self._attempt_oauth(response, **kwargs)
+                with tracing.start_span("trino.oauth2.authenticate", {"http.url": response.request.url}):
+                    self._attempt_oauth(response, **kwargs)
                 self._inside_oauth_attempt_blocker.set()
             finally:
                 self._inside_oauth_attempt_lock.release()
@@ -345,8 +348,9 @@ class _OAuth2TokenBearer(AuthBase):
 
     def _retry_request(self, response, **kwargs):
         request = response.request.copy()
-        extract_cookies_to_jar(request._cookies, response.request, response.raw)
-        request.prepare_cookies(request._cookies)
+        if isinstance(request, PreparedRequest):
+            extract_cookies_to_jar(request._cookies, response.request, response.raw)
+            request.prepare_cookies(request._cookies)
 
         host = self._determine_host(response.request.url)
         request.headers['Authorization'] = "Bearer " + self._get_token_from_cache(host)
@@ -356,9 +360,14 @@ class _OAuth2TokenBearer(AuthBase):
         return retry_response
 
     def _get_token(self, token_server, response, **kwargs):
+        with tracing.start_span("trino.oauth2.get_token"):
+            return self._poll_token_server(token_server, response, **kwargs)
+
+    def _poll_token_server(self, token_server, response, **kwargs):
         attempts = 0
         while attempts < self.MAX_OAUTH_ATTEMPTS:
             attempts += 1
+            tracing.set_attribute("trino.oauth2.attempts", attempts)
             with response.connection.send(Request(method='GET', url=token_server).prepare(), **kwargs) as response:
                 if response.status_code == 200:
                     token_response = json.loads(response.text)
@@ -0,0 +1,22 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+Tools to measure the performance of the client without a Trino cluster.
+
+- :mod:`trino.bench.coordinator` implements a local stand-in coordinator
+  serving generated or recorded paginated results.
+- :mod:`trino.bench.replay` measures the throughput, memory and latency per
+  page of the client against it: ``python -m trino.bench.replay --help``.
+- :mod:`trino.bench.load` measures the latency of concurrent queries against
+  it or against a cluster: ``python -m trino.bench --help``.
+"""
@@ -0,0 +1,558 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module implements a local stand-in for a Trino coordinator. It speaks
+the statement protocol (POST ``/v1/statement``, GET ``nextUri``, DELETE
+``/v1/query/{id}``, GET ``/v1/info``) and serves paginated results of *scenarios*:
+
+- :class:`GeneratedScenario` generates rows of a given shape. The table
+  name of the query selects the scenario and ``LIMIT`` the number of rows,
+  e.g. ``SELECT * FROM wide LIMIT 100000``.
+- :class:`ReplayScenario` replays the responses of a real coordinator
+  recorded with :func:`record`.
+
+``SET SESSION`` and ``RESET SESSION`` update the session properties of the
+client, and every query keeps the session properties it was sent with.
+``START TRANSACTION`` returns a new transaction id, ``COMMIT`` and
+``ROLLBACK`` succeed, and every query keeps the transaction id it was sent
+with.
+
+Pages are encoded once per scenario so that serving them costs little CPU
+compared to the client being measured. Run it standalone with: ::
+
+    $ python -m trino.bench.coordinator --port 8080
+"""
+import argparse
+import collections
+import datetime
+import json
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import trino.logging
+from trino import constants
+
+__all__ = ["FakeCoordinator", "GeneratedScenario", "ReplayScenario", "SCENARIOS", "record"]
+
+logger = trino.logging.get_logger(__name__)
+
+DEFAULT_ROWS = 10000
+DEFAULT_HISTORY = 1000
+
+_TABLE_REGEX = re.compile(r"\bfrom\s+(\w+)", flags=re.IGNORECASE)
+_LIMIT_REGEX = re.compile(r"\blimit\s+(\d+)", flags=re.IGNORECASE)
+_STATEMENT_PATH_REGEX = re.compile(r"^/v1/statement/executing/([^/]+)/(\d+)$")
+_QUERY_PATH_REGEX = re.compile(r"^/v1/query/([^/]+)$")
+_SET_SESSION_REGEX = re.compile(r"^\s*set\s+session\s+([\w.]+)\s*=\s*'?([^']*)'?\s*$", flags=re.IGNORECASE)
+_RESET_SESSION_REGEX = re.compile(r"^\s*reset\s+session\s+([\w.]+)\s*$", flags=re.IGNORECASE)
+_TRANSACTION_REGEX = re.compile(r"^\s*(start\s+transaction|commit|rollback)\b", flags=re.IGNORECASE)
+
+
+def _type_signature(raw_type: str, *arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {"rawType": raw_type, "arguments": list(arguments)}
+
+
+def _type_argument(signature: Dict[str, Any]) -> Dict[str, Any]:
+    return {"kind": "TYPE", "value": signature}
+
+
+def _field_argument(name: str, signature: Dict[str, Any]) -> Dict[str, Any]:
+    return {"kind": "NAMED_TYPE", "value": {"fieldName": {"name": name}, "typeSignature": signature}}
+
+
+def _column(name: str, type: str, signature: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {"name": name, "type": type, "typeSignature": signature or _type_signature(type)}
+
+
+class GeneratedScenario(object):
+    """
+    Serve rows built by ``make_row(row_number)`` in pages of ``page_size``
+    rows. One page of rows is generated and encoded up front and served
+    again for every page of the result.
+
+    :param queued_pages: number of responses without data sent before the
+                         first page, as a coordinator does while the query
+                         is queued and planned.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        columns: List[Dict[str, Any]],
+        make_row: Callable[[int], List[Any]],
+        page_size: int = 1000,
+        queued_pages: int = 1,
+    ):
+        self.name = name
+        self.columns = columns
+        self.page_size = page_size
+        self.queued_pages = queued_pages
+        self._rows = [make_row(row_number) for row_number in range(page_size)]
+        self._columns = json.dumps(columns).encode("utf-8")
+        self._pages: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _data(self, rows: int) -> bytes:
+        with self._lock:
+            if rows not in self._pages:
+                self._pages[rows] = json.dumps(self._rows[:rows]).encode("utf-8")
+            return self._pages[rows]
+
+    def fragment(self, token: int, rows: int) -> Tuple[bytes, bool]:
+        """
+        Return the JSON members, other than ``id``, ``infoUri`` and ``nextUri``,
+        of the response to the request number ``token`` and whether it is the
+        last response of the query.
+        """
+        if token < self.queued_pages:
+            return b'"stats":' + _stats("QUEUED", 0, rows), False
+        start = (token - self.queued_pages) * self.page_size
+        count = max(0, min(self.page_size, rows - start))
+        last = start + count >= rows
+        stats = _stats("FINISHED" if last else "RUNNING", start + count, rows)
+        if count == 0:
+            return b'"columns":' + self._columns + b',"stats":' + stats, last
+        return b'"columns":' + self._columns + b',"data":' + self._data(count) + b',"stats":' + stats, last
+
+
+class ReplayScenario(object):
+    """Serve the responses of a coordinator recorded with :func:`record`."""
+
+    def __init__(self, name: str, responses: List[Dict[str, Any]]):
+        self.name = name
+        self._fragments = []
+        for response in responses:
+            members = {
+                key: value for key, value in response.items() if key not in ("id", "infoUri", "nextUri")
+            }
+            self._fragments.append(json.dumps(members).encode("utf-8")[1:-1])
+
+    @classmethod
+    def load(cls, name: str, path: str) -> "ReplayScenario":
+        with open(path, encoding="utf-8") as f:
+            return cls(name, [json.loads(line) for line in f if line.strip()])
+
+    def fragment(self, token: int, rows: int) -> Tuple[bytes, bool]:
+        token = min(token, len(self._fragments) - 1)
+        return self._fragments[token], token == len(self._fragments) - 1
+
+
+class _SessionStatement(object):
+    """Serve the single response of a statement such as ``SET SESSION`` or ``COMMIT``."""
+
+    def __init__(self, update_type: str):
+        self.name = update_type
+        self._fragment = '"updateType":"{}","stats":'.format(update_type).encode("utf-8") + _stats("FINISHED", 0, 0)
+
+    def fragment(self, token: int, rows: int) -> Tuple[bytes, bool]:
+        return self._fragment, True
+
+
+def _stats(state: str, processed_rows: int, rows: int) -> bytes:
+    return json.dumps({
+        "state": state,
+        "queued": state == "QUEUED",
+        "scheduled": state != "QUEUED",
+        "nodes": 1,
+        "processedRows": processed_rows,
+        "progressPercentage": 100.0 * processed_rows / rows if rows else 100.0,
+    }).encode("utf-8")
+
+
+def _narrow_row(i):
+    return [i, "name-%d" % i, i * 0.5]
+
+
+def _wide_row(i):
+    row = []
+    for column in range(50):
+        kind = column % 4
+        if kind == 0:
+            row.append(i * column)
+        elif kind == 1:
+            row.append("value-%d-%d" % (column, i))
+        elif kind == 2:
+            row.append(i / (column + 1))
+        else:
+            row.append(i % 2 == 0)
+    return row
+
+
+def _wide_columns():
+    types = ["bigint", "varchar", "double", "boolean"]
+    return [_column("c%d" % column, types[column % 4]) for column in range(50)]
+
+
+def _nested_row(i):
+    return [list(range(i % 10)), {"k%d" % k: k for k in range(i % 5)}, [i, "field-%d" % i]]
+
+
+_ROW_SIGNATURE = _type_signature(
+    "row",
+    _field_argument("x", _type_signature("bigint")),
+    _field_argument("y", _type_signature("varchar")),
+)
+
+_NESTED_COLUMNS = [
+    _column("a", "array(bigint)", _type_signature("array", _type_argument(_type_signature("bigint")))),
+    _column("m", "map(varchar, bigint)", _type_signature(
+        "map", _type_argument(_type_signature("varchar")), _type_argument(_type_signature("bigint")))),
+    _column("r", "row(x bigint, y varchar)", _ROW_SIGNATURE),
+]
+
+
+def _temporal_row(i):
+    value = datetime.datetime(2022, 1, 1) + datetime.timedelta(seconds=i * 37)
+    return [
+        value.strftime("%Y-%m-%d"),
+        value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + (" Europe/Brussels" if i % 2 else " +01:00"),
+        value.strftime("%H:%M:%S.%f")[:-3],
+        "%d.%02d" % (i, i % 100),
+    ]
+
+
+_TEMPORAL_COLUMNS = [
+    _column("d", "date"),
+    _column("ts", "timestamp(3)", _type_signature("timestamp")),
+    _column("tstz", "timestamp(3) with time zone", _type_signature("timestamp with time zone")),
+    _column("t", "time(3)", _type_signature("time")),
+    _column("n", "decimal(18, 2)", _type_signature("decimal")),
+]
+
+
+def _low_cardinality_row(i):
+    return ["country-%03d" % (i * 7 % 200), ("active", "inactive", "pending")[i % 3], i]
+
+
+_NARROW_COLUMNS = [_column("id", "bigint"), _column("name", "varchar"), _column("value", "double")]
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        GeneratedScenario("narrow", _NARROW_COLUMNS, _narrow_row),
+        GeneratedScenario("wide", _wide_columns(), _wide_row, page_size=200),
+        GeneratedScenario("nested", _NESTED_COLUMNS, _nested_row),
+        GeneratedScenario("temporal", _TEMPORAL_COLUMNS, _temporal_row),
+        GeneratedScenario("large_pages", _NARROW_COLUMNS, _narrow_row, page_size=20000),
+        GeneratedScenario("tiny_pages", _NARROW_COLUMNS, _narrow_row, page_size=10),
+        GeneratedScenario(
+            "low_cardinality",
+            [_column("country", "varchar"), _column("status", "varchar"), _column("id", "bigint")],
+            _low_cardinality_row,
+        ),
+    )
+}
+
+
+_SET_SESSION = _SessionStatement("SET SESSION")
+_RESET_SESSION = _SessionStatement("RESET SESSION")
+_TRANSACTION_STATEMENTS = {
+    "START TRANSACTION": _SessionStatement("START TRANSACTION"),
+    "COMMIT": _SessionStatement("COMMIT"),
+    "ROLLBACK": _SessionStatement("ROLLBACK"),
+}
+
+
+def _parse_session(header: Optional[str]) -> Dict[str, str]:
+    session = {}
+    for property in (header or "").split(","):
+        if "=" in property:
+            name, value = property.split("=", 1)
+            session[name.strip()] = urllib.parse.unquote(value.strip())
+    return session
+
+
+class _Query(object):
+    def __init__(self, id, scenario, rows, session=None, headers=None, transaction_id=None):
+        self.id = id
+        self.scenario = scenario
+        self.rows = rows
+        # session properties and transaction id sent by the client with the statement
+        self.session = session or {}
+        self.transaction_id = transaction_id
+        # headers of the first response
+        self.headers = headers or {}
+        self.cancelled = False
+        # the last page was served or the query was cancelled
+        self.finished = False
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send the headers and the body of a response in as few segments as possible
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != constants.URL_STATEMENT_PATH:
+            self._send(404)
+            return
+        self.server.coordinator.delay()
+        query = self.server.coordinator.create_query(
+            body.decode("utf-8"),
+            _parse_session(self.headers.get(constants.HEADER_SESSION)),
+            self.headers.get(constants.HEADER_TRANSACTION),
+        )
+        self._send(200, self.server.coordinator.response(query, 0), query.headers)
+
+    def do_GET(self):
+        if self.path == "/v1/info":
+            self._send(200, b'{"nodeVersion":{"version":"bench"},"coordinator":true,"starting":false}')
+            return
+        match = _STATEMENT_PATH_REGEX.match(self.path)
+        query = self.server.coordinator.get_query(match.group(1)) if match else None
+        if query is None:
+            self._send(404)
+            return
+        self.server.coordinator.delay()
+        self._send(200, self.server.coordinator.response(query, int(match.group(2))))
+
+    def do_DELETE(self):
+        match = _QUERY_PATH_REGEX.match(self.path) or _STATEMENT_PATH_REGEX.match(self.path)
+        query = self.server.coordinator.get_query(match.group(1)) if match else None
+        if query is not None:
+            query.cancelled = True
+            self.server.coordinator.finish(query)
+        self._send(204)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # accept the connections of many concurrent clients without resetting them
+    request_queue_size = 1024
+    coordinator: "FakeCoordinator"
+
+
+class FakeCoordinator(object):
+    """
+    Local stand-in coordinator serving ``scenarios`` over HTTP from a
+    background thread. Use it as a context manager: ::
+
+        >> with FakeCoordinator() as coordinator:
+        ..     conn = trino.dbapi.connect(host=coordinator.host, port=coordinator.port)
+
+    :param port: TCP port to listen to, 0 picks a free port.
+    :param scenarios: mapping of table names to scenarios, defaults to
+                      :data:`SCENARIOS`.
+    :param delay: seconds to wait before each response, simulating the
+                  latency of a remote coordinator.
+    :param history: number of finished queries kept in :attr:`queries`, the
+                    older ones are evicted so that long runs use bounded memory.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        scenarios: Optional[Dict[str, Any]] = None,
+        delay: float = 0.0,
+        history: int = DEFAULT_HISTORY,
+    ):
+        self._server = _Server((host, port), _RequestHandler)
+        self._server.coordinator = self
+        self._scenarios = dict(SCENARIOS if scenarios is None else scenarios)
+        self._delay = delay
+        self._history = history
+        # running queries and the last finished ones, in order of creation
+        self._queries: Dict[str, _Query] = {}
+        self._finished: Deque[str] = collections.deque()
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return "http://{}:{}".format(self.host, self.port)
+
+    @property
+    def queries(self) -> Dict[str, _Query]:
+        """Snapshot of the running queries and of the last ``history`` finished ones."""
+        with self._lock:
+            return dict(self._queries)
+
+    def add_scenario(self, scenario) -> None:
+        self._scenarios[scenario.name] = scenario
+
+    def delay(self) -> None:
+        if self._delay:
+            time.sleep(self._delay)
+
+    def create_query(self, sql: str, session: Optional[Dict[str, str]] = None,
+                     transaction_id: Optional[str] = None) -> _Query:
+        """
+        Create the query of ``sql``, ``session`` being the session properties
+        and ``transaction_id`` the transaction sent by the client. ``SET
+        SESSION``, ``RESET SESSION`` and ``START TRANSACTION`` respond with the
+        headers updating the session of the client.
+        """
+        headers = {}
+        set_session = _SET_SESSION_REGEX.match(sql)
+        reset_session = _RESET_SESSION_REGEX.match(sql)
+        transaction = _TRANSACTION_REGEX.match(sql)
+        if transaction:
+            statement = " ".join(transaction.group(1).upper().split())
+            scenario = _TRANSACTION_STATEMENTS[statement]
+            if statement == "START TRANSACTION":
+                headers[constants.HEADER_STARTED_TRANSACTION] = uuid.uuid4().hex
+        elif set_session:
+            scenario = _SET_SESSION
+            headers[constants.HEADER_SET_SESSION] = "{}={}".format(
+                set_session.group(1), urllib.parse.quote(set_session.group(2))
+            )
+        elif reset_session:
+            scenario = _RESET_SESSION
+            headers[constants.HEADER_CLEAR_SESSION] = reset_session.group(1)
+        else:
+            table = _TABLE_REGEX.search(sql)
+            scenario = self._scenarios.get(table.group(1)) if table else None
+        limit = _LIMIT_REGEX.search(sql)
+        with self._lock:
+            self._counter += 1
+            now = datetime.datetime.now(datetime.timezone.utc)
+            query_id = "{}_{:05d}_bench".format(now.strftime("%Y%m%d_%H%M%S"), self._counter)
+            query = _Query(
+                query_id, scenario, int(limit.group(1)) if limit else DEFAULT_ROWS, session, headers, transaction_id
+            )
+            self._queries[query_id] = query
+        return query
+
+    def get_query(self, query_id: str) -> Optional[_Query]:
+        return self._queries.get(query_id)
+
+    def finish(self, query: _Query) -> None:
+        """Mark ``query`` finished, evicting the oldest finished queries beyond ``history``."""
+        with self._lock:
+            if query.finished:
+                return
+            query.finished = True
+            self._finished.append(query.id)
+            while len(self._finished) > self._history:
+                self._queries.pop(self._finished.popleft(), None)
+
+    def response(self, query: _Query, token: int) -> bytes:
+        prefix = '{{"id":"{}","infoUri":"{}/ui/query.html?{}",'.format(query.id, self.url, query.id).encode("utf-8")
+        if query.scenario is None:
+            self.finish(query)
+            return prefix + _error("TABLE_NOT_FOUND", "USER_ERROR", "Table not found")
+        if query.cancelled:
+            self.finish(query)
+            return prefix + _error("USER_CANCELED", "USER_ERROR", "Query was canceled")
+        fragment, last = query.scenario.fragment(token, query.rows)
+        if last:
+            self.finish(query)
+            return prefix + fragment + b"}"
+        next_uri = "{}/v1/statement/executing/{}/{}".format(self.url, query.id, token + 1)
+        return prefix + b'"nextUri":"' + next_uri.encode("utf-8") + b'",' + fragment + b"}"
+
+    def start(self) -> "FakeCoordinator":
+        # a short poll interval makes stop() return quickly
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _error(error_name: str, error_type: str, message: str) -> bytes:
+    return json.dumps({
+        "error": {"errorCode": 1, "errorName": error_name, "errorType": error_type, "message": message},
+        "stats": {"state": "FAILED"},
+    }).encode("utf-8")[1:]
+
+
+def record(request, sql: str, path: str) -> int:
+    """
+    Run ``sql`` with the :class:`trino.client.TrinoRequest` ``request`` and
+    write every response of the coordinator as a line of ``path``, to be
+    replayed with :class:`ReplayScenario`. Return the number of responses.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        http_response = request.post(sql)
+        while True:
+            if not http_response.ok:
+                request.raise_response_error(http_response)
+            response = http_response.json()
+            f.write(json.dumps(response) + "\n")
+            count += 1
+            if "nextUri" not in response:
+                return count
+            http_response = request.get(response["nextUri"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in Trino coordinator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=constants.DEFAULT_PORT)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument(
+        "--replay", action="append", default=[], metavar="NAME=PATH",
+        help="serve the responses recorded in PATH for the table NAME",
+    )
+    args = parser.parse_args(argv)
+
+    coordinator = FakeCoordinator(args.host, args.port, delay=args.delay)
+    for replay in args.replay:
+        name, path = replay.split("=", 1)
+        coordinator.add_scenario(ReplayScenario.load(name, path))
+    # the port is printed so that a parent process can connect when --port is 0
+    print("listening on port {}".format(coordinator.port), flush=True)
+    try:
+        coordinator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
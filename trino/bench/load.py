@@ -0,0 +1,271 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module measures the client under many concurrent queries. It runs
+``queries`` queries on ``concurrency`` DB-API cursors and reports the
+distribution of, per query:
+
+- ``submit_ms``: time to send the statement and receive the first response.
+- ``first_row_ms``: time from the submission to the first row.
+- ``total_ms``: time to read the whole result.
+- ``poll_ms`` and ``polls``: time spent in, and number of, responses
+  without rows, as while the query is queued or planned.
+- ``cpu_ms``: CPU time of the client thread running the query.
+
+Queries run on threads or on processes. As the client is synchronous,
+asyncio applications run their queries on the threads of an executor,
+which the thread mode measures. Each thread or process keeps its
+connection, and with it its HTTP connections, across its queries. They are
+closed at the end of the run.
+
+Without ``--host`` the queries run against the local stand-in coordinator of
+:mod:`trino.bench.coordinator`: ::
+
+    $ python -m trino.bench --queries 1000 --concurrency 50 --mode thread --mode process
+    $ python -m trino.bench --host trino.example.com --user bench --sql "SELECT 1"
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import trino.dbapi
+from trino import constants
+from trino.bench.replay import _coordinator, _percentile
+from trino.client import QueryListener
+
+__all__ = ["MODES", "METRICS", "run_load", "run", "main"]
+
+MODES = ("thread", "process")
+METRICS = ("submit_ms", "first_row_ms", "total_ms", "poll_ms", "polls", "cpu_ms")
+
+DEFAULT_SQL = "SELECT * FROM narrow LIMIT 1000"
+
+
+class _PollListener(QueryListener):
+    """Record the time spent requesting and decoding the responses without rows."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.poll_time = 0.0
+        self._elapsed = 0.0
+
+    def on_page(self, query, rows):
+        stats = query.client_stats
+        elapsed = stats.http_time + stats.json_decode_time
+        if not rows:
+            self.poll_time += elapsed - self._elapsed
+        self._elapsed = elapsed
+
+
+# connection and listener of the current thread, reused by its queries
+_worker = threading.local()
+
+
+def _init_worker(connections: Optional[List[trino.dbapi.Connection]] = None) -> None:
+    """Initialize a thread of an executor, its connection is added to ``connections`` to be closed with it."""
+    _worker.target = None
+    _worker.connections = connections
+
+
+def _connection(target: Dict[str, Any]):
+    if getattr(_worker, "target", None) != target:
+        _worker.listener = _PollListener()
+        _worker.connection = trino.dbapi.connect(query_listeners=[_worker.listener], **target)
+        _worker.target = target
+        connections = getattr(_worker, "connections", None)
+        if connections is not None:
+            connections.append(_worker.connection)
+    return _worker.connection, _worker.listener
+
+
+def _close(connections: List[trino.dbapi.Connection]) -> None:
+    for connection in connections:
+        connection.close()
+        connection._http_session.close()
+
+
+def run_query(target: Dict[str, Any], sql: str) -> Dict[str, Any]:
+    """
+    Run ``sql`` with the connection of the current thread to ``target``, the
+    arguments of :func:`trino.dbapi.connect`, and return its measures.
+    """
+    connection, listener = _connection(target)
+    listener.reset()
+    cpu = time.thread_time()
+    start = time.perf_counter()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql)
+        submitted = time.perf_counter()
+        first_row = None
+        rows = 0
+        if cursor.fetchone() is not None:
+            first_row = time.perf_counter()
+            rows = 1
+            while True:
+                page = cursor.fetchmany(1000)
+                if not page:
+                    break
+                rows += len(page)
+    except Exception as err:
+        return {"error": "{}: {}".format(type(err).__name__, err)}
+    end = time.perf_counter()
+    stats = cursor.client_stats
+    measures = {
+        "rows": rows,
+        "submit_ms": (submitted - start) * 1000,
+        "total_ms": (end - start) * 1000,
+        "poll_ms": listener.poll_time * 1000,
+        "polls": stats.http_requests - stats.pages,
+        "cpu_ms": (time.thread_time() - cpu) * 1000,
+    }
+    if first_row is not None:
+        measures["first_row_ms"] = (first_row - submitted) * 1000
+    return measures
+
+
+def _histogram(values: List[float]) -> Dict[str, int]:
+    """Count ``values`` in buckets of powers of 2: ``"4"`` counts the values in ]2, 4]."""
+    buckets: Dict[int, int] = {}
+    for value in values:
+        bound = 2 ** max(0, math.ceil(math.log2(value))) if value > 0 else 0
+        buckets[bound] = buckets.get(bound, 0) + 1
+    return {str(bound): buckets[bound] for bound in sorted(buckets)}
+
+
+def _summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": _percentile(values, 50),
+        "p90": _percentile(values, 90),
+        "p99": _percentile(values, 99),
+        "max": max(values) if values else 0.0,
+        "histogram": _histogram(values),
+    }
+
+
+def run_load(target: Dict[str, Any], sql: str, queries: int, concurrency: int, mode: str = "thread") -> Dict[str, Any]:
+    """Run ``queries`` times ``sql`` on ``concurrency`` threads or processes and summarize their measures."""
+    if mode not in MODES:
+        raise ValueError("mode must be one of {}: {}".format(", ".join(MODES), mode))
+    start = time.perf_counter()
+    if mode == "thread":
+        connections: List[trino.dbapi.Connection] = []
+        try:
+            with concurrent.futures.ThreadPoolExecutor(concurrency, initializer=_init_worker,
+                                                       initargs=(connections,)) as executor:
+                results = list(executor.map(run_query, [target] * queries, [sql] * queries))
+        finally:
+            _close(connections)
+    else:
+        # the connections of a process are closed when it exits
+        with concurrent.futures.ProcessPoolExecutor(concurrency, initializer=_init_worker) as executor:
+            results = list(executor.map(run_query, [target] * queries, [sql] * queries))
+    seconds = time.perf_counter() - start
+
+    errors = [result["error"] for result in results if "error" in result]
+    succeeded = [result for result in results if "error" not in result]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "queries": queries,
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "seconds": seconds,
+        "queries_per_second": queries / seconds,
+        "rows": sum(result["rows"] for result in succeeded),
+        "metrics": {
+            metric: _summarize([result[metric] for result in succeeded if metric in result]) for metric in METRICS
+        },
+    }
+
+
+def run(modes: List[str], queries: int, concurrency: int, sql: str = DEFAULT_SQL,
+        target: Optional[Dict[str, Any]] = None, delay: float = 0.0, in_process: bool = False) -> List[Dict[str, Any]]:
+    """Run the load in every mode against ``target``, by default a local coordinator."""
+    if target is not None:
+        return [run_load(target, sql, queries, concurrency, mode) for mode in modes]
+    with _coordinator(in_process, delay, []) as (host, port):
+        target = {"host": host, "port": port, "user": "bench"}
+        return [run_load(target, sql, queries, concurrency, mode) for mode in modes]
+
+
+def _format(results: List[Dict[str, Any]], histograms: bool = True) -> str:
+    lines = []
+    for result in results:
+        lines.append("mode={mode} concurrency={concurrency} queries={queries} errors={errors} "
+                     "seconds={seconds:.2f} queries/s={queries_per_second:.1f}".format(**result))
+        for error in result["first_errors"]:
+            lines.append("  error: {}".format(error))
+        lines.append("  {:<14} {:>10} {:>10} {:>10} {:>10} {:>10}".format("", "mean", "p50", "p90", "p99", "max"))
+        for metric, summary in result["metrics"].items():
+            lines.append("  {:<14} {mean:>10.2f} {p50:>10.2f} {p90:>10.2f} {p99:>10.2f} {max:>10.2f}".format(
+                metric, **summary))
+        if histograms:
+            for metric in ("submit_ms", "first_row_ms", "total_ms"):
+                histogram = result["metrics"][metric]["histogram"]
+                if not histogram:
+                    continue
+                lines.append("  {} histogram".format(metric))
+                largest = max(histogram.values())
+                for bound, count in histogram.items():
+                    lines.append("    <= {:>7} {:>8} {}".format(bound, count, "#" * max(1, count * 40 // largest)))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the latency of the client under concurrent queries.")
+    parser.add_argument("--host", help="coordinator to query, default: a local stand-in coordinator")
+    parser.add_argument("--port", type=int, default=constants.DEFAULT_PORT)
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--catalog", default=constants.DEFAULT_CATALOG)
+    parser.add_argument("--schema", default=constants.DEFAULT_SCHEMA)
+    parser.add_argument("--http-scheme", choices=[constants.HTTP, constants.HTTPS], default=constants.HTTP)
+    parser.add_argument("--sql", default=DEFAULT_SQL)
+    parser.add_argument("--queries", type=int, default=100, help="queries per mode")
+    parser.add_argument("--concurrency", type=int, default=10, help="queries running at the same time")
+    parser.add_argument("--mode", action="append", choices=MODES, help="default: thread")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the local coordinator waits to respond")
+    parser.add_argument("--in-process", action="store_true", help="run the local coordinator in a thread")
+    parser.add_argument("--no-histograms", action="store_true")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    target = None
+    if args.host:
+        target = {
+            "host": args.host,
+            "port": args.port,
+            "user": args.user,
+            "catalog": args.catalog,
+            "schema": args.schema,
+            "http_scheme": args.http_scheme,
+        }
+    results = run(args.mode or ["thread"], args.queries, args.concurrency, args.sql, target, args.delay,
+                  args.in_process)
+    print(_format(results, not args.no_histograms))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module measures the throughput of the client against the stand-in
+coordinator of :mod:`trino.bench.coordinator`. For every scenario and fetch
+method it reports rows/s, MB/s, the latency per page and the peak memory
+allocated while fetching the result.
+
+The coordinator runs in a separate process by default so that serving pages
+does not compete with the client for the GIL. Record a baseline and compare
+later runs against it with: ::
+
+    $ python -m trino.bench.replay --rows 100000 --output baseline.json
+    $ python -m trino.bench.replay --rows 100000 --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import trino.dbapi
+from trino.bench.coordinator import SCENARIOS, FakeCoordinator, ReplayScenario
+from trino.client import ClientStats, QueryListener, TrinoQuery
+
+__all__ = ["METHODS", "run", "run_benchmark"]
+
+
+def _run_query(connection, sql, listener):
+    query = TrinoQuery(connection._create_request(), sql, listeners=[listener])
+    rows = 0
+    for _ in query.execute():
+        rows += 1
+    return rows, query.client_stats
+
+
+def _run_fetchall(connection, sql, listener):
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    return len(cursor.fetchall()), cursor.client_stats
+
+
+def _run_fetchmany(connection, sql, listener):
+    cursor = connection.cursor()
+    cursor.arraysize = 1000
+    cursor.execute(sql)
+    rows = 0
+    while True:
+        page = cursor.fetchmany()
+        if not page:
+            return rows, cursor.client_stats
+        rows += len(page)
+
+
+def _run_fetchone(connection, sql, listener):
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    rows = 0
+    while cursor.fetchone() is not None:
+        rows += 1
+    return rows, cursor.client_stats
+
+
+def _run_intern_strings(connection, sql, listener):
+    cursor = connection.cursor(intern_strings=True)
+    cursor.execute(sql)
+    return len(cursor.fetchall()), cursor.client_stats
+
+
+def _run_python_types(connection, sql, listener):
+    cursor = connection.cursor(experimental_python_types=True)
+    cursor.execute(sql)
+    return len(cursor.fetchall()), cursor.client_stats
+
+
+# name -> function(connection, sql, listener) returning the number of rows and the client stats
+METHODS: Dict[str, Callable[..., Tuple[int, ClientStats]]] = {
+    "query": _run_query,
+    "fetchall": _run_fetchall,
+    "fetchmany": _run_fetchmany,
+    "fetchone": _run_fetchone,
+    "intern_strings": _run_intern_strings,
+    "python_types": _run_python_types,
+}
+
+
+class _PageLatencyListener(QueryListener):
+    """Record the time spent requesting and decoding each response."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self._elapsed = 0.0
+
+    def on_page(self, query, rows):
+        stats = query.client_stats
+        elapsed = stats.http_time + stats.json_decode_time
+        self.latencies.append(elapsed - self._elapsed)
+        self._elapsed = elapsed
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percentile / 100.0 * (len(values) - 1))))]
+
+
+def run_benchmark(host: str, port: int, scenario: str, method: str, rows: int,
+                  repeat: int = 3, memory: bool = True) -> Dict[str, Any]:
+    """Run ``method`` on ``scenario`` ``repeat`` times and return the measures of the fastest run."""
+    sql = "SELECT * FROM {} LIMIT {}".format(scenario, rows)
+    best = None
+    for _ in range(repeat):
+        listener = _PageLatencyListener()
+        connection = trino.dbapi.connect(host=host, port=port, user="bench", query_listeners=[listener])
+        start = time.perf_counter()
+        count, stats = METHODS[method](connection, sql, listener)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best["seconds"]:
+            best = {
+                "scenario": scenario,
+                "method": method,
+                "rows": count,
+                "seconds": seconds,
+                "rows_per_second": count / seconds,
+                "mb_per_second": stats.bytes_received / seconds / 1e6,
+                "pages": stats.pages,
+                "page_latency_p50_ms": _percentile(listener.latencies, 50) * 1000,
+                "page_latency_p99_ms": _percentile(listener.latencies, 99) * 1000,
+                "client_stats": stats.to_dict(),
+            }
+    if memory:
+        # tracing allocations slows the client down, measure it in a separate run
+        connection = trino.dbapi.connect(host=host, port=port, user="bench")
+        tracemalloc.start()
+        try:
+            METHODS[method](connection, sql, _PageLatencyListener())
+            best["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return best
+
+
+@contextlib.contextmanager
+def _coordinator(in_process: bool, delay: float, replays: List[str]) -> Iterator[Tuple[str, int]]:
+    if in_process:
+        coordinator = FakeCoordinator(delay=delay)
+        for replay in replays:
+            name, path = replay.split("=", 1)
+            coordinator.add_scenario(ReplayScenario.load(name, path))
+        with coordinator:
+            yield coordinator.host, coordinator.port
+        return
+
+    args = [sys.executable, "-m", "trino.bench.coordinator", "--port", "0", "--delay", str(delay)]
+    for replay in replays:
+        args += ["--replay", replay]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        line = process.stdout.readline()
+        if not line.startswith("listening on port "):
+            raise RuntimeError("failed to start the coordinator: {!r}".format(line))
+        yield "127.0.0.1", int(line.rsplit(" ", 1)[1])
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(scenarios: List[str], methods: List[str], rows: int, repeat: int = 3, memory: bool = True,
+        in_process: bool = False, delay: float = 0.0, replays: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Run every method on every scenario against a local coordinator."""
+    results = []
+    with _coordinator(in_process, delay, replays or []) as (host, port):
+        for scenario in scenarios:
+            for method in methods:
+                results.append(run_benchmark(host, port, scenario, method, rows, repeat, memory))
+    return results
+
+
+def _format(results: List[Dict[str, Any]], baseline: Optional[List[Dict[str, Any]]]) -> str:
+    baseline_by_key = {(result["scenario"], result["method"]): result for result in baseline or []}
+    header = "{:<16} {:<15} {:>10} {:>12} {:>8} {:>9} {:>9} {:>9}".format(
+        "scenario", "method", "rows", "rows/s", "MB/s", "p50 ms", "p99 ms", "peak MB")
+    if baseline is not None:
+        header += " {:>9}".format("vs base")
+    lines = [header]
+    for result in results:
+        line = "{:<16} {:<15} {:>10} {:>12.0f} {:>8.1f} {:>9.2f} {:>9.2f} {:>9}".format(
+            result["scenario"],
+            result["method"],
+            result["rows"],
+            result["rows_per_second"],
+            result["mb_per_second"],
+            result["page_latency_p50_ms"],
+            result["page_latency_p99_ms"],
+            "{:.1f}".format(result["peak_memory_mb"]) if "peak_memory_mb" in result else "-",
+        )
+        if baseline is not None:
+            reference = baseline_by_key.get((result["scenario"], result["method"]))
+            line += " {:>9}".format(
+                "{:+.1%}".format(result["rows_per_second"] / reference["rows_per_second"] - 1) if reference else "-"
+            )
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the throughput of the client against a local coordinator.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all scenarios")
+    parser.add_argument("--method", action="append", choices=sorted(METHODS), help="default: all methods")
+    parser.add_argument("--rows", type=int, default=100000, help="rows per query")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest is reported")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the coordinator waits before responding")
+    parser.add_argument("--in-process", action="store_true", help="run the coordinator in a thread")
+    parser.add_argument(
+        "--replay", action="append", default=[], metavar="NAME=PATH",
+        help="also benchmark the responses recorded in PATH as the scenario NAME",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare the throughput with the results of a previous run")
+    args = parser.parse_args(argv)
+
+    scenarios = (args.scenario or sorted(SCENARIOS)) + [replay.split("=", 1)[0] for replay in args.replay]
+    results = run(scenarios, args.method or list(METHODS), args.rows, args.repeat, not args.no_memory,
+                  args.in_process, args.delay, args.replay)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(_format(results, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module implements an in-memory cache of query results, enabled by
+passing a :class:`ResultCache` to a connection: ::
+
+    >> cache = ResultCache(ttl=60, max_bytes=64 * 1024 * 1024)
+    >> conn = trino.dbapi.connect(host="localhost", port=8080, user="the-user", result_cache=cache)
+
+Only ``SELECT``, ``WITH``, ``VALUES``, ``TABLE``, ``SHOW`` and ``DESCRIBE``
+statements run outside of a transaction are cached. They are keyed by the
+coordinator, the SQL with its whitespace normalized, the parameters, the
+user, the principal authenticated by the connection, its HTTP headers and
+client tags, the catalog, the schema, the session properties, the extra
+credentials and the type of rows of the cursor. A cached query is executed
+to completion before its rows are returned.
+
+The principal is identified by a digest of the credentials of
+:class:`trino.auth.BasicAuthentication`, :class:`trino.auth.JWTAuthentication`,
+:class:`trino.auth.CertificateAuthentication` and
+:class:`trino.auth.KerberosAuthentication`. With other authentications, such
+as OAuth2, whose principal only the coordinator knows, results are only
+shared by the connections given the same authentication object.
+
+Identical queries executed concurrently are coalesced: one of them is sent
+to the coordinator and the others wait for its rows, or its error.
+
+Results are cached regardless of the functions they call, ``ttl`` bounds
+how stale the result of a query such as ``SELECT now()`` can be.
+
+:class:`DiskResultCache` stores the results in Arrow IPC files of a local
+directory instead, so that they outlive the process, for instance to rerun
+a notebook or a batch job without running its extractions again.
+"""
+import collections
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import trino.logging
+from trino.client import ClientStats, RowType, _named_row_class
+
+__all__ = ["CachedQuery", "DiskResultCache", "ResultCache"]
+
+logger = trino.logging.get_logger(__name__)
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 1024 * 1024 * 1024
+
+ARROW_FILE_SUFFIX = ".arrow"
+ARROW_METADATA_KEY = b"trino"
+
+CACHEABLE_STATEMENTS = ("SELECT", "WITH", "VALUES", "TABLE", "SHOW", "DESCRIBE")
+
+# quoted literals and identifiers are kept as is, other runs of whitespace become a space
+_WHITESPACE_REGEX = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+_FIRST_KEYWORD_REGEX = re.compile(r"^[\s(]*(\w+)")
+
+
+def normalize_sql(sql: str) -> str:
+    """Return ``sql`` with runs of whitespace out of quotes and trailing semicolons replaced."""
+    sql = _WHITESPACE_REGEX.sub(lambda match: match.group(1) or " ", sql)
+    return sql.strip().rstrip(";").rstrip()
+
+
+def _auth_identity(auth: Any) -> Any:
+    """Return the credentials identifying the principal authenticated by ``auth``."""
+    if auth is None:
+        return None
+    # imported on use, as trino.auth is not imported with trino.dbapi
+    import trino.auth
+    if isinstance(auth, trino.auth.BasicAuthentication):
+        return "basic", auth._username, auth._password
+    if isinstance(auth, trino.auth.JWTAuthentication):
+        return "jwt", auth.token
+    if isinstance(auth, trino.auth.CertificateAuthentication):
+        return "certificate", auth._cert, auth._key
+    if isinstance(auth, trino.auth.KerberosAuthentication):
+        return "kerberos", auth._principal, auth._service_name, auth._hostname_override
+    try:
+        # an id of the object, unlike id() never reused by another one
+        return type(auth).__name__, vars(auth).setdefault("_result_cache_id", uuid.uuid4().hex)
+    except TypeError:
+        # no __dict__
+        return type(auth).__name__, id(auth)
+
+
+def _principal_digest(request: Any) -> str:
+    """
+    Return a digest of the principal authenticated by ``request``, of its
+    extra credentials and of its HTTP headers. Keys, and the files of
+    :class:`DiskResultCache`, keep the digest instead of secrets.
+    """
+    session = request._client_session
+    identity = (
+        _auth_identity(request._auth),
+        tuple(session.extra_credential or ()),
+        sorted(session.headers.items()),
+    )
+    return hashlib.sha256(repr(identity).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(sql: str) -> bool:
+    match = _FIRST_KEYWORD_REGEX.match(sql)
+    return match is not None and match.group(1).upper() in CACHEABLE_STATEMENTS
+
+
+class CacheEntry(object):
+    """Result of a completed query, ``size`` being the size of its JSON responses."""
+
+    def __init__(
+        self,
+        rows: Iterable[Any],
+        row_type: RowType,
+        query_id: Optional[str],
+        columns: Optional[List[Dict[str, Any]]],
+        stats: Dict[str, Any],
+        warnings: List[Dict[str, Any]],
+        info_uri: Optional[str],
+        size: int,
+        shared: bool = True,
+    ):
+        self.rows = rows
+        self.row_type = row_type
+        self.query_id = query_id
+        self.columns = columns
+        self.stats = stats
+        self.warnings = warnings
+        self.info_uri = info_uri
+        self.size = size
+        # rows shared by the readers of the entry, as opposed to built for each reader
+        self.shared = shared
+        self.expires = 0.0
+
+
+class CachedQuery(object):
+    """
+    Query whose rows are served from a :class:`CacheEntry`, with the
+    attributes of :class:`trino.client.TrinoQuery` read by a cursor.
+    """
+
+    def __init__(self, entry: CacheEntry, client_stats: Optional[ClientStats] = None):
+        self.query_id = entry.query_id
+        self.columns = entry.columns
+        self.stats = entry.stats
+        self.warnings = entry.warnings
+        self.info_uri = entry.info_uri
+        self.update_type = None
+        self.client_stats = client_stats if client_stats is not None else ClientStats()
+        self.finished = True
+        self.cancelled = False
+        self.truncated = False
+        rows = entry.rows
+        if entry.shared and entry.row_type is RowType.LIST:
+            # lists may be modified by the caller, do not share them with the cache
+            rows = [list(row) for row in rows]
+        self.result = iter(rows)
+
+    def cancel(self) -> None:
+        pass
+
+
+class _Flight(object):
+    """Execution of a query other threads executing the same query wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache(object):
+    """
+    Least recently used cache of query results, safe to share between
+    connections and threads.
+
+    :param ttl: seconds a result is served from the cache.
+    :param max_bytes: maximum size of the cached results, approximated by the
+                      size of the JSON responses of their queries. Results
+                      larger than ``max_bytes`` are not cached.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._entries: "collections.OrderedDict[Hashable, CacheEntry]" = collections.OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def size(self) -> int:
+        """Size of the cached results in bytes."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(cursor: Any, sql: str, params: Optional[Any] = None) -> Tuple[Any, ...]:
+        """Return the key of ``sql`` executed with ``params`` by ``cursor``."""
+        request = cursor._request
+        session = request._client_session
+        return (
+            request.get_url(""),
+            normalize_sql(sql),
+            repr(tuple(params)) if params else None,
+            session.user,
+            _principal_digest(request),
+            tuple(session.client_tags or ()),
+            session.catalog,
+            session.schema,
+            tuple(sorted(session.properties.items())),
+            (cursor._row_type, cursor._experimental_pyton_types, cursor._intern_strings),
+        )
+
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry of ``key`` from a storage read without holding the lock, e.g. files."""
+        return None
+
+    def _get(self, key: Hashable, now: float) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        self._size -= self._entries.pop(key).size
+
+    def _put(self, key: Hashable, entry: CacheEntry) -> None:
+        if entry.size > self._max_bytes:
+            logger.debug("result of %s bytes is larger than the cache", entry.size)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry.expires = time.monotonic() + self._ttl
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def get_or_run(self, key: Hashable, run: Callable[[], CacheEntry]) -> Tuple[CacheEntry, bool]:
+        """
+        Return the cached entry of ``key`` or the entry returned by ``run``,
+        and whether ``run`` was called by this thread. ``run`` is called by
+        one thread at a time for a given key, the others wait for its entry.
+        """
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                entry = self._get(key, time.monotonic())
+            if entry is not None:
+                self.hits += 1
+                return entry, False
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry, False
+
+        try:
+            flight.entry = run()
+            self._put(key, flight.entry)
+            return flight.entry, True
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, cursor: Any, sql: str, params: Optional[Any] = None) -> None:
+        """Remove the result of ``sql`` executed with ``params`` by ``cursor``."""
+        key = self.key(cursor, sql, params)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class _ArrowRows(object):
+    """Rows of an Arrow table, built again each time they are iterated."""
+
+    def __init__(self, table, json_columns: List[int], row_type: RowType, columns: List[Dict[str, Any]]):
+        self._table = table
+        self._json_columns = json_columns
+        self._row_type = row_type
+        self._names = tuple(column["name"] for column in columns)
+
+    def __iter__(self):
+        values = [column.to_pylist() for column in self._table.columns]
+        for position in self._json_columns:
+            values[position] = [None if value is None else json.loads(value) for value in values[position]]
+        if self._row_type is RowType.TUPLE:
+            return zip(*values)
+        if self._row_type is RowType.NAMED:
+            row_class = _named_row_class(self._names)
+            return map(row_class, zip(*values))
+        return map(list, zip(*values))
+
+
+class DiskResultCache(ResultCache):
+    """
+    Cache of query results stored as Arrow IPC files in ``directory``, read
+    back through a memory map. It may be shared by several processes.
+    Requires ``pyarrow``, installed with ``pip install trino[arrow]``.
+
+    :param directory: directory of the cache files, created if missing.
+    :param ttl: seconds a result is served from the cache, ``None`` to keep
+                results until they are evicted or invalidated.
+    :param max_bytes: maximum size of the cache files. The least recently
+                      used files are removed beyond it.
+
+    Values of scalar types are stored as Arrow columns. Columns of arrays,
+    maps or rows are stored as JSON. Results with values of other types are
+    not cached.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = None, max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError:
+            raise RuntimeError("unable to import pyarrow")
+        super().__init__(ttl=ttl, max_bytes=max_bytes)
+        self._pyarrow = pyarrow
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """Return the ``(last use, size, path)`` of the cache files, least recently used first."""
+        files = []
+        for name in os.listdir(self._directory):
+            if not name.endswith(ARROW_FILE_SUFFIX):
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # removed by another process
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return sorted(files)
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def __len__(self) -> int:
+        return len(self._files())
+
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        """Return the digest of ``key`` naming its file, the only form of the key written to disk."""
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self._directory, self._digest(key) + ARROW_FILE_SUFFIX)
+
+    def _get(self, key: Hashable, now: float) -> Optional[CacheEntry]:
+        # entries are read by _load, out of the lock
+        return None
+
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            source = self._pyarrow.memory_map(path)
+            table = self._pyarrow.ipc.open_file(source).read_all()
+        except (FileNotFoundError, self._pyarrow.ArrowInvalid):
+            return None
+        metadata = json.loads(table.schema.metadata[ARROW_METADATA_KEY])
+        if metadata["key"] != self._digest(key):
+            return None
+        if self._ttl is not None and metadata["created"] + self._ttl <= time.time():
+            self._unlink(path)
+            return None
+        # the modification time of a file is its last use
+        os.utime(path)
+        row_type = RowType(metadata["row_type"])
+        columns = metadata["columns"]
+        return CacheEntry(
+            _ArrowRows(table, metadata["json_columns"], row_type, columns),
+            row_type,
+            metadata["query_id"],
+            columns,
+            metadata["stats"],
+            metadata["warnings"],
+            metadata["info_uri"],
+            os.path.getsize(path),
+            shared=False,
+        )
+
+    def _table(self, key: Hashable, entry: CacheEntry):
+        """Return the Arrow table of ``entry``, ``None`` if a value has no Arrow type."""
+        pyarrow = self._pyarrow
+        rows = list(entry.rows)
+        count = len(entry.columns or ())
+        arrays = []
+        json_columns = []
+        for position in range(count):
+            values = [row[position] for row in rows]
+            if any(isinstance(value, (list, tuple, dict)) for value in values):
+                json_columns.append(position)
+                values = [None if value is None else json.dumps(value) for value in values]
+            arrays.append(pyarrow.array(values))
+        metadata = {
+            "key": self._digest(key),
+            "created": time.time(),
+            "row_type": entry.row_type.value,
+            "json_columns": json_columns,
+            "query_id": entry.query_id,
+            "columns": entry.columns,
+            "stats": entry.stats,
+            "warnings": entry.warnings,
+            "info_uri": entry.info_uri,
+        }
+        names = ["c{}".format(position) for position in range(count)]
+        return pyarrow.Table.from_arrays(arrays, names, metadata={ARROW_METADATA_KEY: json.dumps(metadata)})
+
+    def _put(self, key: Hashable, entry: CacheEntry) -> None:
+        pyarrow = self._pyarrow
+        try:
+            table = self._table(key, entry)
+        except (pyarrow.ArrowException, TypeError, ValueError) as err:
+            logger.debug("result cannot be stored as Arrow: %s", err)
+            return
+        path = self._path(key)
+        # write to a temporary file renamed once complete, readers never see a partial file
+        fd, temporary_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            if os.path.getsize(temporary_path) > self._max_bytes:
+                logger.debug("result larger than the cache")
+                os.unlink(temporary_path)
+                return
+            os.replace(temporary_path, path)
+        except BaseException:
+            self._unlink(temporary_path)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        files = self._files()
+        size = sum(size for _, size, _ in files)
+        for _, file_size, path in files:
+            if size <= self._max_bytes:
+                break
+            self._unlink(path)
+            size -= file_size
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, cursor: Any, sql: str, params: Optional[Any] = None) -> None:
+        self._unlink(self._path(self.key(cursor, sql, params)))
+
+    def clear(self) -> None:
+        for _, _, path in self._files():
+            self._unlink(path)
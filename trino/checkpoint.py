@@ -0,0 +1,125 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module implements stores of result checkpoints, to continue reading the
+result of a query after the process reading it crashed: ::
+
+    >> store = FileCheckpointStore("/var/lib/exports/checkpoints")
+    >> conn = trino.dbapi.connect(host="localhost", port=8080, user="the-user", checkpoint_store=store)
+    >> cur = conn.resume("orders")
+    >> if cur is None:
+    ..     cur = conn.cursor()
+    ..     cur.execute("SELECT * FROM orders", checkpoint_key="orders")
+
+Before requesting the next page of the result, a cursor saves a
+:class:`trino.client.QueryHandle` of the query under its key: the
+``nextUri`` of the page and the number of rows returned before it, in
+:attr:`trino.client.QueryHandle.rownumber`. The checkpoint is deleted when
+the whole result has been read.
+
+A row is taken as processed when the next one is requested, as when
+iterating a cursor. Rows fetched by ``fetchmany`` but not processed yet when
+the process crashes are returned again.
+"""
+import abc
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+import trino.logging
+from trino.client import QueryHandle
+
+logger = trino.logging.get_logger(__name__)
+
+__all__ = ["CheckpointStore", "MemoryCheckpointStore", "FileCheckpointStore"]
+
+
+class CheckpointStore(metaclass=abc.ABCMeta):
+    """Store of the checkpoints of query results, by key."""
+
+    @abc.abstractmethod
+    def save(self, key: str, handle: QueryHandle) -> None:
+        pass
+
+    @abc.abstractmethod
+    def load(self, key: str) -> Optional[QueryHandle]:
+        """Return the checkpoint saved under ``key``, ``None`` if there is none."""
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Checkpoints of the current process, for tests and threads restarted after a failure."""
+
+    def __init__(self):
+        self._checkpoints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def save(self, key: str, handle: QueryHandle) -> None:
+        with self._lock:
+            self._checkpoints[key] = handle.to_json()
+
+    def load(self, key: str) -> Optional[QueryHandle]:
+        with self._lock:
+            value = self._checkpoints.get(key)
+        return QueryHandle.from_json(value) if value is not None else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._checkpoints.pop(key, None)
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Checkpoints saved as JSON files of ``directory``, one per key. A file is
+    replaced atomically, a crash while saving leaves the previous checkpoint.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if not key or os.sep in key or (os.altsep and os.altsep in key) or key in (".", ".."):
+            raise ValueError("invalid checkpoint key: {!r}".format(key))
+        return os.path.join(self.directory, key + ".json")
+
+    def save(self, key: str, handle: QueryHandle) -> None:
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".checkpoint-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(handle.to_dict(), file)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        logger.debug("checkpoint %s saved at row %s", key, handle.rownumber)
+
+    def load(self, key: str) -> Optional[QueryHandle]:
+        try:
+            with open(self._path(key)) as file:
+                return QueryHandle.from_dict(json.load(file))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
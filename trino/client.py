@@ -34,21 +34,27 @@ The main interface is :class:`TrinoQuery`: ::
 """
 
 import copy
+import functools
+import json
 import os
 import re
+import threading
+import time
 import urllib.parse
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Tuple, Union
+from enum import Enum, unique
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-import pytz
 import requests
 
 import trino.logging
-from trino import constants, exceptions
+from trino import constants, exceptions, tracing
 from trino.transaction import NO_TRANSACTION
 
-__all__ = ["TrinoQuery", "TrinoRequest", "PROXIES"]
+__all__ = [
+    "TrinoQuery", "TrinoRequest", "RowType", "NamedRow", "ClientStats", "QueryListener", "QueryHandle", "PROXIES"
+]
 
 logger = trino.logging.get_logger(__name__)
 
@@ -65,8 +71,106 @@ INF = float("inf")
 NEGATIVE_INF = float("-inf")
 NAN = float("nan")
 
+# Maximum number of distinct time zone names kept by ``_get_timezone``.
+TIMEZONE_CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=TIMEZONE_CACHE_SIZE)
+def _get_timezone(name: str):
+    """Return the ``tzinfo`` for an IANA time zone name, e.g. ``Europe/Brussels``."""
+    try:
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    except ImportError:  # Python < 3.9
+        from backports.zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(name)
+    except ZoneInfoNotFoundError as e:
+        raise ValueError(f"unknown time zone '{name}'") from e
+
+
+# Maximum number of distinct values interned per column when ``intern_strings``
+# is enabled. Columns with more distinct values are considered high cardinality
+# and are no longer interned. The table of a column is kept for the whole
+# result, so this bounds its memory to a few hundred KB per column, while codes,
+# statuses or countries fit well below it. Compare with
+# ``python -m trino.bench.replay --scenario low_cardinality --scenario large_pages
+# --method fetchall --method intern_strings``: the values of ``large_pages`` go
+# over the limit, and are decoded as without interning.
+MAX_INTERNED_STRINGS_PER_COLUMN = 4096
+
+# Raw types of the columns whose values are interned when ``intern_strings`` is enabled.
+INTERNED_RAW_TYPES = ("varchar", "char")
+
+# Maximum number of distinct column lists kept by ``_named_row_class``.
+NAMED_ROW_CLASS_CACHE_SIZE = 128
+
+
+@unique
+class RowType(Enum):
+    """
+    Python type of the rows returned by :class:`TrinoResult`.
+
+    - ``LIST``: a ``list`` per row, as decoded from the JSON response.
+    - ``TUPLE``: a ``tuple`` per row. Tuples store their values inline and
+      are not over-allocated, which saves about a third of the memory of
+      a row of a few columns compared to a list.
+    - ``NAMED``: a :class:`NamedRow` per row. It has the same memory
+      footprint as a tuple and also gives access to values by column name.
+    """
+    LIST = "list"
+    TUPLE = "tuple"
+    NAMED = "named"
+
+
+class NamedRow(tuple):
+    """
+    Row of a query result whose values are accessible by index and by
+    column name, e.g. ``row[0]`` or ``row.node_id``. Column names that are
+    not valid identifiers are accessible with ``getattr(row, "count(*)")``.
+
+    Subclasses are generated once per list of columns by
+    :func:`_named_row_class`. No per row attributes are stored.
+    """
+    __slots__ = ()
+
+    _fields: Tuple[str, ...] = ()
+    _positions: Dict[str, int] = {}
+
+    def __getattr__(self, name):
+        try:
+            return self[self._positions[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return "Row({})".format(", ".join("{}={!r}".format(name, value) for name, value in zip(self._fields, self)))
+
+
+@functools.lru_cache(maxsize=NAMED_ROW_CLASS_CACHE_SIZE)
+def _named_row_class(fields: Tuple[str, ...]):
+    # the first column wins when several columns have the same name
+    positions = {name: position for position, name in reversed(list(enumerate(fields)))}
+    return type("Row", (NamedRow,), {"__slots__": (), "_fields": fields, "_positions": positions})
+
 
 class ClientSession(object):
+    """
+    Session of the requests of a connection or a transaction.
+
+    A session may be shared by the requests of several cursors, e.g. the
+    cursors of a connection, the properties set by the queries of one cursor
+    are then sent by the others.
+
+    ``properties`` are copied on write: an update replaces the dict with a
+    new one instead of modifying it, so that threads sending requests read a
+    consistent snapshot without locking. Do not modify the dict returned by
+    ``properties``, use :meth:`update_properties`.
+    """
+
     def __init__(
         self,
         catalog,
@@ -83,9 +187,9 @@ class ClientSession(object):
         self.schema = schema
         self.source = source
         self.user = user
-        if properties is None:
-            properties = {}
-        self._properties = properties
+        # copy to not share the dict of the caller with other sessions
+        self._properties = dict(properties or {})
+        self._properties_lock = threading.Lock()
         self._headers = headers or {}
         self.transaction_id = transaction_id
         self.extra_credential = extra_credential
@@ -95,6 +199,28 @@ class ClientSession(object):
     def properties(self):
         return self._properties
 
+    def update_properties(self, set_properties=None, clear_properties=None):
+        """
+        Set the ``(name, value)`` pairs of ``set_properties`` and remove the
+        names of ``clear_properties``.
+        """
+        # writers are serialized to not lose concurrent updates, readers never wait
+        with self._properties_lock:
+            properties = dict(self._properties)
+            for name in clear_properties or ():
+                properties.pop(name, None)
+            properties.update(set_properties or ())
+            self._properties = properties
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_properties_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._properties_lock = threading.Lock()
+
     @property
     def headers(self):
         return self._headers
@@ -164,6 +290,10 @@ class TrinoRequest(object):
                                session. Please refer to the output of
                                ``SHOW SESSION`` to check the available
                                properties.
+    :param http_session: ``requests.Session`` or
+                         :class:`trino.transport.Transport` sending the HTTP
+                         requests. A ``requests.Session`` is created if it
+                         is ``None``.
     :param http_headers: HTTP headers to post/get in the HTTP requests
     :param http_scheme: "http" or "https"
     :param auth: class that manages user authentication. ``None`` means no
@@ -175,6 +305,17 @@ class TrinoRequest(object):
     :request_timeout: How long (in seconds) to wait for the server to send
                       data before giving up, as a float or a
                       ``(connect timeout, read timeout)`` tuple.
+    :param retry_budget: :class:`trino.exceptions.RetryBudget` limiting the
+                         retries of every request sharing it, for instance
+                         the requests of a connection.
+    :param endpoints: :class:`trino.endpoints.EndpointSelector` choosing the
+                      coordinator of each statement among several ones,
+                      ``host`` and ``port`` are then only used if the
+                      selector has no endpoint for a URL.
+    :param client_session: :class:`ClientSession` shared with other requests,
+                           replacing the one built from ``user``,
+                           ``session_properties`` and the other arguments
+                           of the session.
 
     The client initiates a query by sending an HTTP POST to the
     coordinator. It then gets a response back from the coordinator with:
@@ -200,6 +341,11 @@ class TrinoRequest(object):
     As most of these errors are transient, the question the caller should set
     retries with respect to when they want to notify the application that uses
     the client.
+
+    A request holds no state of the queries it sends, several threads may
+    run queries with the same request. The state of a query, including the
+    URI of its next page, is held by :class:`TrinoQuery`. Requests created
+    with the same ``client_session`` share its session properties.
     """
 
     http = requests
@@ -209,6 +355,18 @@ class TrinoRequest(object):
         http.Timeout,
     )
 
+    # GET of a nextUri and DELETE are idempotent, they are also retried when
+    # the connection drops while reading the body or a proxy fails with 502
+    IDEMPOTENT_HTTP_EXCEPTIONS = HTTP_EXCEPTIONS + (
+        http.exceptions.ChunkedEncodingError,
+        http.exceptions.ContentDecodingError,
+    )
+
+    # POST of a statement is retried only on errors the coordinator responds
+    # with before creating the query
+    RETRY_STATUS_CODES = (503, 504)
+    IDEMPOTENT_RETRY_STATUS_CODES = (502, 503, 504)
+
     def __init__(
         self,
         host: str,
@@ -229,23 +387,27 @@ class TrinoRequest(object):
         request_timeout: Union[float, Tuple[float, float]] = constants.DEFAULT_REQUEST_TIMEOUT,
         handle_retry=exceptions.RetryWithExponentialBackoff(),
         verify: bool = True,
-        client_tags: Optional[List[str]] = None
+        client_tags: Optional[List[str]] = None,
+        retry_budget: Optional[exceptions.RetryBudget] = None,
+        endpoints: Optional[Any] = None,
+        client_session: Optional[ClientSession] = None,
     ) -> None:
-        self._client_session = ClientSession(
-            catalog,
-            schema,
-            source,
-            user,
-            session_properties,
-            http_headers,
-            transaction_id,
-            extra_credential,
-            client_tags
-        )
+        if client_session is None:
+            client_session = ClientSession(
+                catalog,
+                schema,
+                source,
+                user,
+                session_properties,
+                http_headers,
+                transaction_id,
+                extra_credential,
+                client_tags
+            )
+        self._client_session = client_session
 
         self._host = host
         self._port = port
-        self._next_uri: Optional[str] = None
 
         if http_scheme is None:
             if self._port == constants.DEFAULT_TLS_PORT:
@@ -260,6 +422,8 @@ class TrinoRequest(object):
         else:
             self._http_session = self.http.Session()
             self._http_session.verify = verify
+        # every request also sends the headers explicitly, the session may be
+        # shared by the requests of other threads and updated meanwhile
         self._http_session.headers.update(self.http_headers)
         self._exceptions = self.HTTP_EXCEPTIONS
         self._auth = auth
@@ -272,8 +436,35 @@ class TrinoRequest(object):
         self._redirect_handler = redirect_handler
         self._request_timeout = request_timeout
         self._handle_retry = handle_retry
+        self._retry_budget = retry_budget
+        self._endpoints = endpoints
+        # coordinator every statement is sent to, as the statements of a transaction
+        self._endpoint = None
         self.max_attempts = max_attempts
 
+    def child(self) -> "TrinoRequest":
+        """
+        Return a request sharing the HTTP session, the authentication, the
+        retry policy and the endpoints of this request, with a copy of its
+        client session. Session properties set by the queries of the child
+        do not change the ones of this request.
+        """
+        child = copy.copy(self)
+        # properties are copied on write, a shallow copy isolates them
+        child._client_session = copy.copy(self._client_session)
+        return child
+
+    def bound_child(self) -> "TrinoRequest":
+        """
+        Return a :meth:`child` sending all its statements to the same
+        coordinator, selected now, as the statements of a transaction must
+        be. Without endpoints, this is the ``host`` of the request anyway.
+        """
+        child = self.child()
+        if self._endpoints is not None:
+            child._endpoint = self._endpoints.select()
+        return child
+
     @property
     def transaction_id(self):
         return self._client_session.transaction_id
@@ -330,27 +521,89 @@ class TrinoRequest(object):
     @max_attempts.setter
     def max_attempts(self, value) -> None:
         self._max_attempts = value
-        if value == 1:  # No retry
-            self._get = self._http_session.get
-            self._post = self._http_session.post
-            self._delete = self._http_session.delete
-            return
-
         with_retry = exceptions.retry_with(
             self._handle_retry,
             exceptions=self._exceptions,
             conditions=(
                 # need retry when there is no exception but the status code is 503 or 504
-                lambda response: getattr(response, "status_code", None)
-                in (503, 504),
+                lambda response: getattr(response, "status_code", None) in self.RETRY_STATUS_CODES,
             ),
             max_attempts=self._max_attempts,
+            budget=self._retry_budget,
         )
-        self._get = with_retry(self._http_session.get)
-        self._post = with_retry(self._http_session.post)
-        self._delete = with_retry(self._http_session.delete)
-
-    def get_url(self, path) -> str:
+        with_idempotent_retry = exceptions.retry_with(
+            self._handle_retry,
+            exceptions=self._exceptions + self.IDEMPOTENT_HTTP_EXCEPTIONS,
+            conditions=(
+                lambda response: getattr(response, "status_code", None) in self.IDEMPOTENT_RETRY_STATUS_CODES,
+            ),
+            max_attempts=self._max_attempts,
+            budget=self._retry_budget,
+        )
+        if self._endpoints is None:
+            self._get = with_idempotent_retry(self._http_session.get)
+            self._post = with_retry(self._http_session.post)
+            self._delete = with_idempotent_retry(self._http_session.delete)
+            return
+        # every attempt is tracked, a retried statement goes to the coordinator selected for the attempt
+        self._get = with_idempotent_retry(self._track_endpoint(self._http_session.get))
+        self._post = with_retry(self._route_statement(self._track_endpoint(self._http_session.post)))
+        self._delete = with_idempotent_retry(self._track_endpoint(self._http_session.delete))
+
+    def _track_endpoint(self, send):
+        """Record the latency and the health of the endpoint of each request sent with ``send``."""
+        @functools.wraps(send)
+        def track(url, **kwargs):
+            endpoint = self._endpoints.endpoint_for(url)
+            if endpoint is None:
+                return send(url, **kwargs)
+            self._endpoints.begin(endpoint)
+            start = time.monotonic()
+            try:
+                http_response = send(url, **kwargs)
+            except self._exceptions:
+                self._endpoints.end(endpoint, time.monotonic() - start, healthy=False)
+                raise
+            status_code = getattr(http_response, "status_code", None)
+            healthy = status_code not in self.IDEMPOTENT_RETRY_STATUS_CODES
+            self._endpoints.end(endpoint, time.monotonic() - start, healthy)
+            return http_response
+
+        return track
+
+    def _route_statement(self, send):
+        """
+        Send statements to ``endpoint`` if given, otherwise to a coordinator
+        selected by the endpoints among the ones not ``tried`` yet by the
+        previous attempts.
+        """
+        @functools.wraps(send)
+        def route(url, endpoint=None, tried=None, **kwargs):
+            if endpoint is None and url == self.statement_url:
+                if tried is None:
+                    tried = []
+                endpoint = self._endpoints.select(exclude=tried)
+                if endpoint is None:
+                    # every coordinator failed once, try them again
+                    del tried[:]
+                    endpoint = self._endpoints.select()
+                tried.append(endpoint)
+            if endpoint is not None:
+                url = endpoint.get_url(constants.URL_STATEMENT_PATH)
+            return send(url, **kwargs)
+
+        return route
+
+    def get_url(self, path, next_uri=None) -> str:
+        """
+        Return the URL of ``path``, on the coordinator of ``next_uri`` if it
+        is given, as the requests of a query must go to the coordinator
+        running it.
+        """
+        if next_uri is not None:
+            parts = urllib.parse.urlsplit(next_uri)
+            if parts.scheme and parts.netloc:
+                return "{}://{}{}".format(parts.scheme, parts.netloc, path)
         return "{protocol}://{host}:{port}{path}".format(
             protocol=self._http_scheme, host=self._host, port=self._port, path=path
         )
@@ -359,11 +612,20 @@ class TrinoRequest(object):
     def statement_url(self) -> str:
         return self.get_url(constants.URL_STATEMENT_PATH)
 
-    @property
-    def next_uri(self) -> Optional[str]:
-        return self._next_uri
+    def post(self, sql, additional_http_headers=None, retry_budget=None, retry_stats=None, cancelled=None):
+        """
+        Send ``sql`` to the coordinator. ``retry_budget`` and ``retry_stats``
+        are the :class:`trino.exceptions.RetryBudget` and
+        :class:`trino.exceptions.RetryStats` of the query, if any. Setting the
+        :class:`threading.Event` ``cancelled`` stops retrying.
+        """
+        with tracing.start_span("trino.request.post", {"http.method": "POST", "http.url": self.statement_url}):
+            http_response = self._post_statement(sql, additional_http_headers, retry_budget, retry_stats, cancelled)
+            self._trace_response(http_response)
+            return http_response
 
-    def post(self, sql, additional_http_headers=None):
+    def _post_statement(self, sql, additional_http_headers=None, retry_budget=None, retry_stats=None,
+                        cancelled=None):
         data = sql.encode("utf-8")
         # Deep copy of the http_headers dict since they may be modified for this
         # request by the provided additional_http_headers
@@ -372,6 +634,10 @@ class TrinoRequest(object):
         # Update the request headers with the additional_http_headers
         http_headers.update(additional_http_headers or {})
 
+        routing = {}
+        if self._endpoints is not None:
+            # the coordinators tried by the attempts, a retry goes to another one
+            routing = {"endpoint": self._endpoint, "tried": []}
         http_response = self._post(
             self.statement_url,
             data=data,
@@ -379,6 +645,10 @@ class TrinoRequest(object):
             timeout=self._request_timeout,
             allow_redirects=self._redirect_handler is None,
             proxies=PROXIES,
+            retry_budget=retry_budget,
+            retry_stats=retry_stats,
+            cancelled=cancelled,
+            **routing,
         )
         if self._redirect_handler is not None:
             while http_response is not None and http_response.is_redirect:
@@ -392,19 +662,52 @@ class TrinoRequest(object):
                     timeout=self._request_timeout,
                     allow_redirects=False,
                     proxies=PROXIES,
+                    retry_budget=retry_budget,
+                    retry_stats=retry_stats,
+                    cancelled=cancelled,
                 )
         return http_response
 
-    def get(self, url):
-        return self._get(
-            url,
-            headers=self.http_headers,
-            timeout=self._request_timeout,
-            proxies=PROXIES,
-        )
+    def get(self, url, retry_budget=None, retry_stats=None, cancelled=None):
+        """
+        Get ``url``, a ``nextUri``. As the same ``nextUri`` returns the same
+        page again, it is retried on more errors than :meth:`post`.
+        """
+        with tracing.start_span("trino.request.get", {"http.method": "GET", "http.url": url}):
+            http_response = self._get(
+                url,
+                headers=self.http_headers,
+                timeout=self._request_timeout,
+                proxies=PROXIES,
+                retry_budget=retry_budget,
+                retry_stats=retry_stats,
+                cancelled=cancelled,
+            )
+            self._trace_response(http_response)
+            return http_response
+
+    def delete(self, url, retry_budget=None, retry_stats=None, cancelled=None):
+        with tracing.start_span("trino.request.delete", {"http.method": "DELETE", "http.url": url}):
+            http_response = self._delete(
+                url,
+                headers=self.http_headers,
+                timeout=self._request_timeout,
+                proxies=PROXIES,
+                retry_budget=retry_budget,
+                retry_stats=retry_stats,
+                cancelled=cancelled,
+            )
+            self._trace_response(http_response)
+            return http_response
 
-    def delete(self, url):
-        return self._delete(url, timeout=self._request_timeout, proxies=PROXIES)
+    @staticmethod
+    def _trace_response(http_response):
+        if not tracing.is_enabled() or http_response is None:
+            return
+        tracing.set_attribute("http.status_code", getattr(http_response, "status_code", None))
+        content = getattr(http_response, "content", None)
+        if isinstance(content, bytes):
+            tracing.set_attribute("http.response_content_length", len(content))
 
     def _process_error(self, error, query_id):
         error_type = error["errorType"]
@@ -439,26 +742,21 @@ class TrinoRequest(object):
         if "error" in response:
             raise self._process_error(response["error"], response.get("id"))
 
+        clear_session = None
         if constants.HEADER_CLEAR_SESSION in http_response.headers:
-            for prop in get_header_values(
-                http_response.headers, constants.HEADER_CLEAR_SESSION
-            ):
-                self._client_session.properties.pop(prop, None)
-
+            clear_session = get_header_values(http_response.headers, constants.HEADER_CLEAR_SESSION)
+        set_session = None
         if constants.HEADER_SET_SESSION in http_response.headers:
-            for key, value in get_session_property_values(
-                http_response.headers, constants.HEADER_SET_SESSION
-            ):
-                self._client_session.properties[key] = value
-
-        self._next_uri = response.get("nextUri")
+            set_session = get_session_property_values(http_response.headers, constants.HEADER_SET_SESSION)
+        if clear_session or set_session:
+            self._client_session.update_properties(set_session, clear_session)
 
         return TrinoStatus(
             id=response["id"],
             stats=response["stats"],
             warnings=response.get("warnings", []),
             info_uri=response["infoUri"],
-            next_uri=self._next_uri,
+            next_uri=response.get("nextUri"),
             update_type=response.get("updateType"),
             rows=response.get("data", []),
             columns=response.get("columns"),
@@ -479,6 +777,93 @@ class TrinoRequest(object):
             raise ValueError(f"only ASCII characters are allowed in extra credential '{key}'")
 
 
+class ClientStats(object):
+    """
+    Client side counters of a query, complementary to the ``stats`` sent by
+    the coordinator. Times are in seconds.
+
+    - ``http_requests``: number of HTTP round-trips to the coordinator.
+    - ``bytes_received``: size of the response bodies.
+    - ``http_time``: time spent sending requests and receiving responses,
+      including retries.
+    - ``json_decode_time``: time spent decoding and processing responses.
+    - ``mapping_time``: time spent interning, mapping to Python types and
+      building rows.
+    - ``consumer_time``: time spent waiting on the consumer of the rows
+      between the time a page is ready and the time the next one is
+      requested.
+    - ``pages`` and ``rows``: number of responses with rows and number of
+      rows received.
+    - ``retry_stats``: :class:`trino.exceptions.RetryStats` of the requests.
+    """
+
+    def __init__(self):
+        self.http_requests = 0
+        self.bytes_received = 0
+        self.http_time = 0.0
+        self.json_decode_time = 0.0
+        self.mapping_time = 0.0
+        self.consumer_time = 0.0
+        self.pages = 0
+        self.rows = 0
+        self.retry_stats = exceptions.RetryStats()
+
+    @property
+    def rows_per_page(self) -> float:
+        return self.rows / self.pages if self.pages else 0.0
+
+    def record_response(self, http_response, http_time: float) -> None:
+        self.http_requests += 1
+        self.http_time += http_time
+        content = getattr(http_response, "content", None)
+        if isinstance(content, bytes):
+            self.bytes_received += len(content)
+
+    def record_page(self, rows: int, json_decode_time: float) -> None:
+        self.json_decode_time += json_decode_time
+        if rows:
+            self.pages += 1
+            self.rows += rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "httpRequests": self.http_requests,
+            "bytesReceived": self.bytes_received,
+            "httpTime": self.http_time,
+            "jsonDecodeTime": self.json_decode_time,
+            "mappingTime": self.mapping_time,
+            "consumerTime": self.consumer_time,
+            "pages": self.pages,
+            "rows": self.rows,
+            "retries": self.retry_stats.retries,
+            "retryTime": self.retry_stats.retry_time,
+        }
+
+    def __repr__(self):
+        return "ClientStats({})".format(", ".join("{}={}".format(k, v) for k, v in self.to_dict().items()))
+
+
+class QueryListener(object):
+    """
+    Receives the client side events of queries, e.g. to export
+    :class:`ClientStats` to a metrics system. Inherit from this class and
+    override the methods of interest. Listeners are called synchronously
+    from the thread running the query and should return quickly.
+    """
+
+    def on_page(self, query: "TrinoQuery", rows: List[List[Any]]) -> None:
+        """Called after each response of the coordinator is processed."""
+        pass
+
+    def on_completed(self, query: "TrinoQuery") -> None:
+        """Called once all the rows of the query have been consumed."""
+        pass
+
+    def on_failed(self, query: "TrinoQuery", error: Exception) -> None:
+        """Called when sending a request or processing a response failed."""
+        pass
+
+
 class TrinoResult(object):
     """
     Represent the result of a Trino query as an iterator on rows.
@@ -487,33 +872,111 @@ class TrinoResult(object):
     https://docs.python.org/3/library/stdtypes.html#generator-types
     """
 
-    def __init__(self, query, rows=None, experimental_python_types: bool = False):
+    def __init__(
+        self,
+        query,
+        rows=None,
+        experimental_python_types: bool = False,
+        row_type: Union[RowType, str] = RowType.LIST,
+        intern_strings: bool = False,
+        max_rows: Optional[int] = None,
+    ):
         self._query = query
         self._rows = rows or []
         self._rownumber = 0
+        self._max_rows = max_rows
         self._experimental_python_types = experimental_python_types
+        self._row_type = RowType(row_type)
+        self._row_factory = None
+        self._intern_strings = intern_strings
+        # column position -> {value: value}, built from the columns of the first page with rows
+        self._string_dictionaries: Optional[Dict[int, Dict[str, str]]] = None
 
     @property
     def rownumber(self) -> int:
         return self._rownumber
 
-    def __iter__(self):
+    @property
+    def row_type(self) -> RowType:
+        return self._row_type
+
+    def _get_row_factory(self):
+        """Return the callable building a row from its values, ``None`` to keep lists."""
+        if self._row_factory is None and self._row_type is not RowType.LIST:
+            if self._row_type is RowType.TUPLE:
+                self._row_factory = tuple
+            else:
+                self._row_factory = _named_row_class(tuple(column["name"] for column in self._query.columns))
+        return self._row_factory
+
+    def _intern_page(self, rows: List[List[Any]]) -> None:
+        """
+        Replace in place the values of the string columns of ``rows`` by a
+        single shared ``str`` object per distinct value. A column stops being
+        interned once it holds more than ``MAX_INTERNED_STRINGS_PER_COLUMN``
+        distinct values.
+        """
+        if self._string_dictionaries is None:
+            self._string_dictionaries = {
+                position: {}
+                for position, column in enumerate(self._query.columns)
+                if column["typeSignature"]["rawType"] in INTERNED_RAW_TYPES
+            }
+        for position, dictionary in list(self._string_dictionaries.items()):
+            setdefault = dictionary.setdefault
+            for row in rows:
+                value = row[position]
+                if value is not None:
+                    row[position] = setdefault(value, value)
+            if len(dictionary) > MAX_INTERNED_STRINGS_PER_COLUMN:
+                del self._string_dictionaries[position]
+
+    def _convert_page(self, rows: List[List[Any]], map_types: bool) -> List[Any]:
+        """Intern, map to Python types and build the rows of a page as configured."""
+        if self._intern_strings:
+            self._intern_page(rows)
+        row_factory = self._get_row_factory()
+        if map_types:
+            columns = self._query.columns
+            if row_factory is None:
+                return [self._map_to_python_types(row, columns) for row in rows]
+            return [row_factory(map(self._map_to_python_type, zip(row, columns))) for row in rows]
+        if row_factory is None:
+            return rows
+        return [row_factory(row) for row in rows]
+
+    def _pages(self):
         # Initial fetch from the first POST request
-        for row in self._rows:
-            self._rownumber += 1
-            yield row
+        yield self._rows, False
         self._rows = None
 
         # Subsequent fetches from GET requests until next_uri is empty.
         while not self._query.finished:
-            rows = self._query.fetch()
+            # the rows returned so far have been processed
+            self._query._save_checkpoint(self._rownumber)
+            yield self._query.fetch(), self._experimental_python_types
+
+    def __iter__(self):
+        client_stats = self._query.client_stats
+        max_rows = self._max_rows
+        for rows, map_types in self._pages():
+            if max_rows is not None and self._rownumber + len(rows) >= max_rows:
+                rows = self._query._truncate(rows, max_rows - self._rownumber)
+            # columns are known as soon as a page has rows
+            if rows:
+                start = time.perf_counter()
+                rows = self._convert_page(rows, map_types)
+                client_stats.mapping_time += time.perf_counter() - start
+            page_ready = time.perf_counter()
             for row in rows:
                 self._rownumber += 1
                 logger.debug("row %s", row)
-                if not self._experimental_python_types:
-                    yield row
-                else:
-                    yield self._map_to_python_types(row, self._query.columns)
+                yield row
+            client_stats.consumer_time += time.perf_counter() - page_ready
+            if max_rows is not None and self._rownumber >= max_rows:
+                break
+        self._query._delete_checkpoint()
+        self._query._notify_completed()
 
     @property
     def response_headers(self):
@@ -570,7 +1033,7 @@ class TrinoResult(object):
                 dt, tz = value.rsplit(' ', 1)
                 if tz.startswith('+') or tz.startswith('-'):
                     return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f %z")
-                return datetime.strptime(dt, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=pytz.timezone(tz))
+                return datetime.strptime(dt, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=_get_timezone(tz))
             elif "timestamp" in raw_type:
                 return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f")
             elif "time with time zone" in raw_type:
@@ -594,14 +1057,103 @@ class TrinoResult(object):
         return list(map(self._map_to_python_type, zip(row, columns)))
 
 
+class QueryHandle(object):
+    """
+    State needed to continue fetching the result of a running query from
+    another :class:`TrinoQuery`, possibly in another process.
+
+    A handle is serialised with :meth:`to_dict` or :meth:`to_json`. It holds
+    the ``nextUri`` of the query, the rows received but not returned yet and
+    the session of the query without credentials: the requests of the
+    attached query are authenticated by the connection attaching it.
+    ``rownumber`` is the number of rows of the result returned before the
+    ones of the handle.
+
+    The coordinator abandons a query whose ``nextUri`` is not requested for
+    a while (``query.client.timeout``, 5 minutes by default), a handle must
+    be attached before.
+    """
+
+    _FIELDS = ("query_id", "next_uri", "info_uri", "columns", "rows", "update_type", "session", "rownumber")
+
+    def __init__(
+        self,
+        query_id: str,
+        next_uri: Optional[str],
+        info_uri: Optional[str] = None,
+        columns: Optional[List[Dict[str, Any]]] = None,
+        rows: Optional[List[List[Any]]] = None,
+        update_type: Optional[str] = None,
+        session: Optional[Dict[str, Any]] = None,
+        rownumber: Optional[int] = None,
+    ):
+        self.query_id = query_id
+        self.next_uri = next_uri
+        self.info_uri = info_uri
+        self.columns = columns
+        self.rows = rows or []
+        self.update_type = update_type
+        self.session = session or {}
+        self.rownumber = rownumber or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._FIELDS}
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "QueryHandle":
+        return cls(**{field: values.get(field) for field in cls._FIELDS})
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, value: str) -> "QueryHandle":
+        return cls.from_dict(json.loads(value))
+
+    def __repr__(self):
+        return "QueryHandle(query_id={!r}, next_uri={!r}, rownumber={!r})".format(
+            self.query_id, self.next_uri, self.rownumber
+        )
+
+
+def _session_state(client_session: ClientSession) -> Dict[str, Any]:
+    return {
+        "user": client_session.user,
+        "catalog": client_session.catalog,
+        "schema": client_session.schema,
+        "source": client_session.source,
+        "properties": dict(client_session.properties),
+        "client_tags": client_session.client_tags,
+    }
+
+
 class TrinoQuery(object):
-    """Represent the execution of a SQL statement by Trino."""
+    """
+    Represent the execution of a SQL statement by Trino.
+
+    :param max_retries: maximum number of HTTP requests sent again during the
+                        query, ``None`` for no limit other than the
+                        ``max_attempts`` of each request.
+    :param max_rows: maximum number of rows of the result. The query is
+                     cancelled as soon as they are received and
+                     :attr:`truncated` is then set.
+    :param checkpoint_store: :class:`trino.checkpoint.CheckpointStore` the
+                             position of the result is saved to under
+                             ``checkpoint_key`` before each page is fetched.
+    """
 
     def __init__(
             self,
             request: TrinoRequest,
             sql: str,
             experimental_python_types: bool = False,
+            row_type: Union[RowType, str] = RowType.LIST,
+            intern_strings: bool = False,
+            listeners: Optional[List[QueryListener]] = None,
+            max_retries: Optional[int] = None,
+            max_rows: Optional[int] = None,
+            checkpoint_store=None,
+            checkpoint_key: Optional[str] = None,
     ) -> None:
         self.query_id: Optional[str] = None
 
@@ -612,11 +1164,27 @@ class TrinoQuery(object):
         self._finished = False
         self._cancelled = False
         self._request = request
+        self._next_uri: Optional[str] = None
         self._update_type = None
         self._sql = sql
-        self._result = TrinoResult(self, experimental_python_types=experimental_python_types)
+        self._result = TrinoResult(self, experimental_python_types=experimental_python_types, row_type=row_type,
+                                   intern_strings=intern_strings, max_rows=max_rows)
         self._response_headers = None
         self._experimental_python_types = experimental_python_types
+        self._row_type = row_type
+        self._intern_strings = intern_strings
+        self._client_stats = ClientStats()
+        self._listeners = listeners or []
+        self._retry_budget = exceptions.RetryBudget(max_retries)
+        # set by cancel(), possibly from another thread, to stop retrying requests
+        self._cancel_event = threading.Event()
+        self._max_rows = max_rows
+        self._truncated = False
+        self._checkpoint_store = checkpoint_store
+        self._checkpoint_key = checkpoint_key
+        # called with the query when it is garbage collected before it is
+        # finished, set by the DB-API cursors to cancel it
+        self.on_abandoned: Optional[Callable[["TrinoQuery"], None]] = None
 
     @property
     def columns(self):
@@ -631,6 +1199,10 @@ class TrinoQuery(object):
     def stats(self):
         return self._stats
 
+    @property
+    def client_stats(self) -> ClientStats:
+        return self._client_stats
+
     @property
     def update_type(self):
         return self._update_type
@@ -647,6 +1219,24 @@ class TrinoQuery(object):
     def info_uri(self):
         return self._info_uri
 
+    @property
+    def max_rows(self) -> Optional[int]:
+        return self._max_rows
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the query was stopped after ``max_rows`` rows, before its end."""
+        return self._truncated
+
+    def _truncate(self, rows: List[Any], count: int) -> List[Any]:
+        """Return the first ``count`` of ``rows``, the last ones to return, and stop the query."""
+        if len(rows) > count or not self.finished:
+            self._truncated = True
+            if not self.finished:
+                logger.debug("cancelling query %s after %s rows", self.query_id, self._max_rows)
+                self._cancel_quietly()
+        return rows[:count]
+
     def execute(self, additional_http_headers=None) -> TrinoResult:
         """Initiate a Trino query by sending the SQL statement
 
@@ -656,19 +1246,105 @@ class TrinoQuery(object):
         call fetch() until finished is true.
         """
         if self.cancelled:
-            raise exceptions.TrinoUserError("Query has been cancelled", self.query_id)
+            raise self._cancelled_error()
+
+        with tracing.start_span("trino.query.execute", {"db.system": "trino", "db.statement": self._sql}):
+            response, status = self._send(lambda: self._request.post(
+                self._sql, additional_http_headers, self._retry_budget, self._client_stats.retry_stats,
+                self._cancel_event,
+            ))
+            self._info_uri = status.info_uri
+            self.query_id = status.id
+            tracing.set_attribute("trino.query_id", self.query_id)
+            self._stats.update({"queryId": self.query_id})
+            self._warnings = getattr(status, "warnings", [])
+            self._next_uri = status.next_uri
+            if status.next_uri is None:
+                self._finished = True
+            self._result = TrinoResult(self, status.rows, self._experimental_python_types, self._row_type,
+                                       self._intern_strings, self._max_rows)
+            return self._result
+
+    def detach(self) -> QueryHandle:
+        """
+        Return a :class:`QueryHandle` to continue fetching the result with
+        :meth:`attach`. This query must not be used afterwards; it is no
+        longer cancelled when garbage collected.
+        """
+        if self.query_id is None:
+            raise ValueError("query has not been executed")
+        if self._result.rownumber:
+            raise ValueError("rows of query {} have already been fetched".format(self.query_id))
+        self.on_abandoned = None
+        return self._handle(list(self._result._rows), 0)
+
+    def _handle(self, rows: List[List[Any]], rownumber: int) -> QueryHandle:
+        return QueryHandle(
+            self.query_id,
+            self._next_uri,
+            self._info_uri,
+            self._columns,
+            rows,
+            self._update_type,
+            _session_state(self._request._client_session),
+            rownumber,
+        )
 
-        response = self._request.post(self._sql, additional_http_headers)
-        status = self._request.process(response)
-        self._info_uri = status.info_uri
-        self.query_id = status.id
-        self._stats.update({"queryId": self.query_id})
-        self._update_state(status)
-        self._warnings = getattr(status, "warnings", [])
-        if status.next_uri is None:
-            self._finished = True
-        self._result = TrinoResult(self, status.rows, self._experimental_python_types)
-        return self._result
+    def _save_checkpoint(self, rownumber: int) -> None:
+        """Save the position of the result, the next page being returned after ``rownumber`` rows."""
+        if self._checkpoint_store is not None and self._next_uri is not None:
+            self._checkpoint_store.save(self._checkpoint_key, self._handle([], rownumber))
+
+    def _delete_checkpoint(self) -> None:
+        if self._checkpoint_store is not None:
+            self._checkpoint_store.delete(self._checkpoint_key)
+
+    @classmethod
+    def attach(
+            cls,
+            request: TrinoRequest,
+            handle: QueryHandle,
+            experimental_python_types: bool = False,
+            row_type: Union[RowType, str] = RowType.LIST,
+            intern_strings: bool = False,
+            listeners: Optional[List[QueryListener]] = None,
+            max_retries: Optional[int] = None,
+            checkpoint_store=None,
+            checkpoint_key: Optional[str] = None,
+    ) -> "TrinoQuery":
+        """
+        Return a query continuing the result of ``handle``, its :attr:`result`
+        returns the rows not returned yet. ``request`` is not modified, the
+        session of the handle is applied to a child of it.
+        """
+        request = request.child()
+        client_session = request._client_session
+        for name, value in handle.session.items():
+            if name == "properties":
+                client_session.update_properties(set_properties=value, clear_properties=client_session.properties)
+            else:
+                setattr(client_session, name, value)
+        query = cls(
+            request,
+            sql=None,
+            experimental_python_types=experimental_python_types,
+            row_type=row_type,
+            intern_strings=intern_strings,
+            listeners=listeners,
+            max_retries=max_retries,
+            checkpoint_store=checkpoint_store,
+            checkpoint_key=checkpoint_key,
+        )
+        query.query_id = handle.query_id
+        query._stats.update({"queryId": handle.query_id})
+        query._next_uri = handle.next_uri
+        query._info_uri = handle.info_uri
+        query._columns = handle.columns
+        query._update_type = handle.update_type
+        query._finished = handle.next_uri is None
+        query._result = TrinoResult(query, list(handle.rows), experimental_python_types, row_type, intern_strings)
+        query._result._rownumber = handle.rownumber
+        return query
 
     def _update_state(self, status):
         self._stats.update(status.stats)
@@ -676,32 +1352,90 @@ class TrinoQuery(object):
         if status.columns:
             self._columns = status.columns
 
+    def _send(self, send_request):
+        """Send a request with ``send_request`` and process its response, recording client stats."""
+        try:
+            start = time.perf_counter()
+            response = send_request()
+            received = time.perf_counter()
+            self._client_stats.record_response(response, received - start)
+            status = self._request.process(response)
+            self._client_stats.record_page(len(status.rows), time.perf_counter() - received)
+        except Exception as err:
+            if self._cancel_event.is_set() and not isinstance(err, exceptions.TrinoQueryError):
+                # the query was cancelled while its requests were retried
+                err = self._cancelled_error()
+            err.retry_stats = self._client_stats.retry_stats
+            for listener in self._listeners:
+                listener.on_failed(self, err)
+            raise err
+        # the query id is not known before the first response is processed
+        if self.query_id is None:
+            self.query_id = status.id
+        # listeners see the stats of this response
+        self._update_state(status)
+        for listener in self._listeners:
+            listener.on_page(self, status.rows)
+        return response, status
+
+    def _cancelled_error(self) -> exceptions.TrinoUserError:
+        error = {"errorName": "USER_CANCELED", "errorType": "USER_ERROR", "message": "Query has been cancelled"}
+        return exceptions.TrinoUserError(error, self.query_id)
+
+    def _notify_completed(self) -> None:
+        for listener in self._listeners:
+            listener.on_completed(self)
+
     def fetch(self) -> List[List[Any]]:
         """Continue fetching data for the current query_id"""
-        response = self._request.get(self._request.next_uri)
-        status = self._request.process(response)
-        self._update_state(status)
-        logger.debug(status)
-        self._response_headers = response.headers
-        if status.next_uri is None:
-            self._finished = True
-        return status.rows
+        with tracing.start_span("trino.query.fetch", {"trino.query_id": self.query_id}):
+            # a failed GET is sent again to the same nextUri, resuming the
+            # result where it stopped
+            response, status = self._send(lambda: self._request.get(
+                self._next_uri, self._retry_budget, self._client_stats.retry_stats, self._cancel_event
+            ))
+            logger.debug(status)
+            self._response_headers = response.headers
+            self._next_uri = status.next_uri
+            if status.next_uri is None:
+                self._finished = True
+            tracing.set_attribute("trino.page.rows", len(status.rows))
+            tracing.set_attribute("trino.query.pages", self._client_stats.pages)
+            return status.rows
 
     def cancel(self) -> None:
-        """Cancel the current query"""
+        """
+        Cancel the current query. Requests of the query being retried by
+        another thread stop waiting and fail.
+        """
+        self._cancel_event.set()
         if self.query_id is None or self.finished:
             return
 
-        url = self._request.get_url("/v1/query/{}".format(self.query_id))
+        url = self._request.get_url("/v1/query/{}".format(self.query_id), self._next_uri)
         logger.debug("cancelling query: %s", self.query_id)
-        response = self._request.delete(url)
-        logger.info(response)
-        if response.status_code == requests.codes.no_content:
-            self._cancelled = True
-            logger.debug("query cancelled: %s", self.query_id)
-            return
-
-        self._request.raise_response_error(response)
+        with tracing.start_span("trino.query.cancel", {"trino.query_id": self.query_id}):
+            response = self._request.delete(url, self._retry_budget, self._client_stats.retry_stats)
+            logger.info(response)
+            if response.status_code == requests.codes.no_content:
+                self._cancelled = True
+                logger.debug("query cancelled: %s", self.query_id)
+                return
+
+            self._request.raise_response_error(response)
+
+    def _cancel_quietly(self) -> None:
+        """Cancel the query, logging errors instead of raising them."""
+        try:
+            self.cancel()
+        except Exception as err:
+            logger.warning("failed to cancel query %s: %s", self.query_id, err)
+
+    def __del__(self):
+        on_abandoned = getattr(self, "on_abandoned", None)
+        if on_abandoned is not None and self.query_id is not None and not self.finished and not self.cancelled:
+            logger.debug("query %s abandoned", self.query_id)
+            on_abandoned(self)
 
     def is_finished(self) -> bool:
         import warnings
@@ -21,6 +21,9 @@ DEFAULT_SCHEMA: Optional[str] = None
 DEFAULT_AUTH: Optional[Any] = None
 DEFAULT_MAX_ATTEMPTS = 3
 DEFAULT_REQUEST_TIMEOUT: float = 30.0
+DEFAULT_CANCEL_TIMEOUT: float = 10.0
+DEFAULT_RETRY_WINDOW: float = 60.0
+DEFAULT_PROGRESS_INTERVAL: float = 1.0
 
 HTTP = "http"
 HTTPS = "https"
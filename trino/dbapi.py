@@ -15,20 +15,28 @@ This module implements the Python DBAPI 2.0 as described in
 https://www.python.org/dev/peps/pep-0249/ .
 
 Fetch methods returns rows as a list of lists on purpose to let the caller
-decide to convert then to a list of tuples.
+decide to convert then to a list of tuples. Use the ``row_type`` argument of
+:py:meth:`Connection.cursor` to get tuples or named rows instead.
 """
 from decimal import Decimal
 from typing import Any, List, Optional  # NOQA for mypy types
 
-import copy
 import uuid
 import datetime
 import math
+import threading
+import time
+import weakref
 
-from trino import constants
+from trino import constants, tracing
 import trino.exceptions
+import trino.cache
 import trino.client
+import trino.endpoints
 import trino.logging
+import trino.progress
+from trino.client import RowType
+from trino.endpoints import LoadBalancing
 from trino.transaction import Transaction, IsolationLevel, NO_TRANSACTION
 from trino.exceptions import (
     Warning,
@@ -88,6 +96,32 @@ class Connection(object):
     statement, can also be cancelled. Transactions are not supported by this
     client implementation yet.
 
+    A connection may be shared by several threads, each thread using its own
+    cursors. Outside of a transaction, the cursors share the session of the
+    connection: the session properties set by the queries of a cursor are
+    sent by the other cursors. They are copied on write and the state of
+    each query is held by the query itself.
+
+    ``host`` may be a list of ``host``, ``host:port`` or ``(host, port)``
+    coordinators. New queries are then sent to the healthy coordinators
+    according to ``load_balancing``, see :mod:`trino.endpoints`.
+
+    ``result_cache``, a :class:`trino.cache.ResultCache` possibly shared by
+    several connections, caches the results of the queries of the cursors.
+
+    Closing the connection cancels the queries of its cursors that are still
+    running, waiting at most ``cancel_timeout`` seconds for the coordinator.
+    So does leaving a ``with`` block. The query of a result garbage collected
+    before it is finished is cancelled when a cursor of the connection next
+    executes a query, or when the connection is closed.
+
+    ``checkpoint_store``, a :class:`trino.checkpoint.CheckpointStore`, saves
+    the position of the results of the queries executed with a
+    ``checkpoint_key``, to continue reading them with :meth:`resume`.
+
+    The ``progress`` callbacks given to :meth:`Cursor.execute` are called at
+    most once per ``progress_interval`` seconds.
+
     """
 
     def __init__(
@@ -109,8 +143,26 @@ class Connection(object):
         isolation_level=IsolationLevel.AUTOCOMMIT,
         verify=True,
         http_session=None,
-        client_tags=None
+        client_tags=None,
+        query_listeners=None,
+        max_retries=None,
+        query_max_retries=None,
+        retry_budget=None,
+        retry_window=constants.DEFAULT_RETRY_WINDOW,
+        load_balancing=LoadBalancing.ROUND_ROBIN,
+        ejection_time=trino.endpoints.DEFAULT_EJECTION_TIME,
+        result_cache=None,
+        cancel_timeout=constants.DEFAULT_CANCEL_TIMEOUT,
+        checkpoint_store=None,
+        progress_interval=constants.DEFAULT_PROGRESS_INTERVAL,
     ):
+        if isinstance(host, (list, tuple)):
+            endpoints = trino.endpoints.parse_endpoints(host, port, http_scheme)
+            self._endpoints = trino.endpoints.EndpointSelector(endpoints, load_balancing, ejection_time)
+            # requests fall back to the first coordinator for URLs of no endpoint
+            host, port = endpoints[0].host, endpoints[0].port
+        else:
+            self._endpoints = None
         self.host = host
         self.port = port
         self.user = user
@@ -132,10 +184,51 @@ class Connection(object):
         self.max_attempts = max_attempts
         self.request_timeout = request_timeout
         self.client_tags = client_tags
+        # list of trino.client.QueryListener notified of the queries run by the cursors
+        self.query_listeners = query_listeners or []
+        # retries of the HTTP requests of all the queries per retry_window seconds and of each
+        # query, None for no limit. The budget of the connection is refilled over the window so
+        # that a long-lived connection keeps retrying. retry_budget, e.g. a
+        # trino.exceptions.TokenBucketRetryBudget, may be shared by connections
+        if retry_budget is None:
+            if max_retries is None:
+                retry_budget = trino.exceptions.RetryBudget()
+            else:
+                retry_budget = trino.exceptions.TokenBucketRetryBudget(max_retries, max_retries / retry_window)
+        self._retry_budget = retry_budget
+        self.query_max_retries = query_max_retries
+        self.result_cache = result_cache
+        self.cancel_timeout = cancel_timeout
+        self.checkpoint_store = checkpoint_store
+        self.progress_interval = progress_interval
+        # queries of the cursors, the unfinished ones are cancelled on close
+        self._queries = weakref.WeakSet()
+        self._queries_lock = threading.Lock()
+        # unfinished queries garbage collected, cancelled on the next execute or on close
+        self._abandoned_queries = []
+
+        # session of the requests outside of a transaction, shared by the cursors
+        self._client_session = self._new_client_session()
 
         self._isolation_level = isolation_level
         self._request = None
         self._transaction = None
+        # serializes starting the transaction shared by the cursors of several threads
+        self._transaction_lock = threading.Lock()
+
+    def _new_client_session(self):
+        """Return a session of the attributes of the connection, without the updates of its queries."""
+        return trino.client.ClientSession(
+            self.catalog,
+            self.schema,
+            self.source,
+            self.user,
+            self.session_properties,
+            self.http_headers,
+            NO_TRANSACTION,
+            self.extra_credential,
+            self.client_tags,
+        )
 
     @property
     def isolation_level(self):
@@ -145,6 +238,14 @@ class Connection(object):
     def transaction(self):
         return self._transaction
 
+    @property
+    def retry_budget(self):
+        return self._retry_budget
+
+    @property
+    def endpoints(self):
+        return self._endpoints
+
     def __enter__(self):
         return self
 
@@ -153,16 +254,63 @@ class Connection(object):
             self.commit()
         except Exception:
             self.rollback()
-        else:
+        finally:
             self.close()
 
     def close(self):
-        """Trino does not have anything to close"""
-        # TODO cancel outstanding queries?
-        pass
+        """Cancel the queries of the cursors that are still running."""
+        self._cancel_queries()
+
+    def _track_query(self, query):
+        query.on_abandoned = self._abandoned_queries.append
+        with self._queries_lock:
+            self._queries.add(query)
+
+    def _untrack_query(self, query):
+        query.on_abandoned = None
+        with self._queries_lock:
+            self._queries.discard(query)
+
+    def _pop_abandoned_queries(self):
+        # garbage collection may append queries meanwhile, from any thread
+        queries = []
+        while self._abandoned_queries:
+            queries.append(self._abandoned_queries.pop())
+        return queries
+
+    def _cancel_abandoned_queries(self):
+        if self._abandoned_queries:
+            self._cancel_queries(self._pop_abandoned_queries())
+
+    def _cancel_queries(self, queries=None):
+        """
+        Cancel ``queries``, by default all the queries of the cursors, that
+        are still running. They are cancelled concurrently, waiting at most
+        ``cancel_timeout`` seconds.
+        """
+        if queries is None:
+            with self._queries_lock:
+                queries = list(self._queries)
+                self._queries = weakref.WeakSet()
+            queries += self._pop_abandoned_queries()
+        queries = [
+            query for query in queries
+            if query.query_id is not None and not query.finished and not query.cancelled
+        ]
+        threads = [threading.Thread(target=query._cancel_quietly, daemon=True) for query in queries]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + self.cancel_timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        pending = sum(thread.is_alive() for thread in threads)
+        if pending:
+            logger.warning("%s queries not cancelled after %s seconds", pending, self.cancel_timeout)
 
     def start_transaction(self):
-        self._transaction = Transaction(self._create_request())
+        # the transaction id is set on a copy of the session of the connection, and
+        # the statements of the transaction all go to the coordinator running it
+        self._transaction = Transaction(self._create_request().bound_child())
         self._transaction.begin()
         return self._transaction
 
@@ -196,20 +344,64 @@ class Connection(object):
             self.redirect_handler,
             self.max_attempts,
             self.request_timeout,
-            client_tags=self.client_tags
+            client_tags=self.client_tags,
+            retry_budget=self._retry_budget,
+            endpoints=self._endpoints,
+            client_session=self._client_session,
         )
 
-    def cursor(self, experimental_python_types=False):
-        """Return a new :py:class:`Cursor` object using the connection."""
+    def cursor(self, experimental_python_types=False, row_type=RowType.LIST, intern_strings=False):
+        """Return a new :py:class:`Cursor` object using the connection.
+
+        :param row_type: Python type of the fetched rows, see
+            :py:class:`trino.client.RowType`.
+        :param intern_strings: share a single ``str`` object between equal
+            values of ``varchar`` and ``char`` columns. This reduces memory
+            for low cardinality columns such as codes or statuses.
+        """
         if self.isolation_level != IsolationLevel.AUTOCOMMIT:
-            if self.transaction is None:
-                self.start_transaction()
-            request = self.transaction._request
+            with self._transaction_lock:
+                if self.transaction is None:
+                    self.start_transaction()
+                request = self.transaction._request
         elif self.transaction is not None:
             request = self.transaction._request
         else:
             request = self._create_request()
-        return Cursor(self, request, experimental_python_types)
+        return Cursor(self, request, experimental_python_types, row_type, intern_strings)
+
+    def submit(self, operation, params=None):
+        """
+        Execute a query and return a :py:class:`trino.client.QueryHandle` to
+        fetch its result with :meth:`attach`, possibly from another process.
+        The query is no longer cancelled when the connection is closed.
+        """
+        return self.cursor().submit(operation, params)
+
+    def attach(self, handle, experimental_python_types=False, row_type=RowType.LIST, intern_strings=False):
+        """
+        Return a :py:class:`Cursor` fetching the result of the query of
+        ``handle``, returned by :meth:`submit` of this or another connection.
+        """
+        cursor = self.cursor(experimental_python_types, row_type, intern_strings)
+        cursor._attach(handle)
+        return cursor
+
+    def resume(self, checkpoint_key, experimental_python_types=False, row_type=RowType.LIST, intern_strings=False):
+        """
+        Return a :py:class:`Cursor` continuing the result of the query
+        executed with ``checkpoint_key`` from its last checkpoint, ``None``
+        if there is none. The query must still be running on the coordinator.
+        :py:attr:`Cursor.rownumber` is the number of rows returned before.
+        """
+        if self.checkpoint_store is None:
+            raise ValueError("the connection has no checkpoint_store")
+        handle = self.checkpoint_store.load(checkpoint_key)
+        if handle is None:
+            return None
+        cursor = self.cursor(experimental_python_types, row_type, intern_strings)
+        cursor._attach(handle, checkpoint_key)
+        return cursor
 
 
 class Cursor(object):
@@ -220,7 +412,14 @@ class Cursor(object):
 
     """
 
-    def __init__(self, connection, request, experimental_python_types: bool = False):
+    def __init__(
+        self,
+        connection,
+        request,
+        experimental_python_types: bool = False,
+        row_type: RowType = RowType.LIST,
+        intern_strings: bool = False,
+    ):
         if not isinstance(connection, Connection):
             raise ValueError(
                 "connection must be a Connection object: {}".format(type(connection))
@@ -231,11 +430,20 @@ class Cursor(object):
         self.arraysize = 1
         self._iterator = None
         self._query = None
+        self._progress_listener = None
         self._experimental_pyton_types = experimental_python_types
+        self._row_type = RowType(row_type)
+        self._intern_strings = intern_strings
 
     def __iter__(self):
         return self._iterator
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @property
     def connection(self):
         return self._connection
@@ -280,12 +488,44 @@ class Cursor(object):
             return self._query.stats
         return None
 
+    @property
+    def client_stats(self):
+        """Client side counters of the last query, see :py:class:`trino.client.ClientStats`."""
+        if self._query is not None:
+            return self._query.client_stats
+        return None
+
     @property
     def warnings(self):
         if self._query is not None:
             return self._query.warnings
         return None
 
+    @property
+    def progress(self):
+        """
+        Latest :py:class:`trino.progress.QueryProgress` of the query, ``None``
+        before its first response or for results of the cache. It may be read
+        from another thread while this one waits for the coordinator.
+        """
+        if self._progress_listener is not None:
+            return self._progress_listener.progress
+        return None
+
+    @property
+    def rownumber(self):
+        """Index of the next row of the result, ``None`` if unknown."""
+        if self._query is not None:
+            return getattr(self._query.result, "rownumber", None)
+        return None
+
+    @property
+    def truncated(self):
+        """Whether the last query was stopped after the ``max_rows`` given to :meth:`execute`."""
+        if self._query is not None:
+            return self._query.truncated
+        return False
+
     def setinputsizes(self, sizes):
         raise trino.exceptions.NotSupportedError
 
@@ -313,34 +553,56 @@ class Cursor(object):
             operation=operation
         )
 
-        # Send prepare statement. Copy the _request object to avoid poluting the
-        # one that is going to be used to execute the actual operation.
-        query = trino.client.TrinoQuery(copy.deepcopy(self._request), sql=sql,
-                                        experimental_python_types=self._experimental_pyton_types)
-        result = query.execute()
+        with tracing.start_span("trino.cursor.prepare", {"trino.statement_name": statement_name}):
+            # Send prepare statement with a child of the _request object to avoid poluting the
+            # one that is going to be used to execute the actual operation.
+            query = trino.client.TrinoQuery(self._request.child(), sql=sql,
+                                            experimental_python_types=self._experimental_pyton_types)
+            result = query.execute()
 
-        # Iterate until the 'X-Trino-Added-Prepare' header is found or
-        # until there are no more results
-        for _ in result:
-            response_headers = result.response_headers
+            # Iterate until the 'X-Trino-Added-Prepare' header is found or
+            # until there are no more results
+            for _ in result:
+                response_headers = result.response_headers
 
-            if constants.HEADER_ADDED_PREPARE in response_headers:
-                return response_headers[constants.HEADER_ADDED_PREPARE]
+                if constants.HEADER_ADDED_PREPARE in response_headers:
+                    return response_headers[constants.HEADER_ADDED_PREPARE]
 
-        raise trino.exceptions.FailedToObtainAddedPrepareHeader
+            raise trino.exceptions.FailedToObtainAddedPrepareHeader
 
     def _get_added_prepare_statement_trino_query(
         self,
         statement_name,
-        params
+        params,
+        max_rows=None,
+        checkpoint_key=None,
+        progress=None,
     ):
         sql = 'EXECUTE ' + statement_name + ' USING ' + ','.join(map(self._format_prepared_param, params))
 
-        # No need to deepcopy _request here because this is the actual request
+        # No need for a child of _request here because this is the actual request
         # operation
-        return trino.client.TrinoQuery(self._request, sql=sql, experimental_python_types=self._experimental_pyton_types)
-
-    def _format_prepared_param(self, param):
+        return trino.client.TrinoQuery(self._request, sql=sql, experimental_python_types=self._experimental_pyton_types,
+                                       row_type=self._row_type, intern_strings=self._intern_strings,
+                                       listeners=self._listeners(progress),
+                                       max_retries=self._connection.query_max_retries,
+                                       max_rows=max_rows,
+                                       **self._checkpoint(checkpoint_key))
+
+    def _listeners(self, progress=None):
+        """Return the listeners of a new query, following its progress."""
+        self._progress_listener = trino.progress.ProgressListener(progress, self._connection.progress_interval)
+        return self._connection.query_listeners + [self._progress_listener]
+
+    def _checkpoint(self, checkpoint_key):
+        if checkpoint_key is None:
+            return {}
+        if self._connection.checkpoint_store is None:
+            raise ValueError("checkpoint_key requires a connection with a checkpoint_store")
+        return {"checkpoint_store": self._connection.checkpoint_store, "checkpoint_key": checkpoint_key}
+
+    @staticmethod
+    def _format_prepared_param(param):
         """
         Formats parameters to be passed in an
         EXECUTE statement.
@@ -376,7 +638,9 @@ class Cursor(object):
 
         if isinstance(param, datetime.datetime) and param.tzinfo is not None:
             datetime_str = param.strftime("%Y-%m-%d %H:%M:%S.%f")
-            # named timezones
+            # named timezones, ``key`` for zoneinfo and ``zone`` for pytz
+            if hasattr(param.tzinfo, 'key'):
+                return "TIMESTAMP '%s %s'" % (datetime_str, param.tzinfo.key)
             if hasattr(param.tzinfo, 'zone'):
                 return "TIMESTAMP '%s %s'" % (datetime_str, param.tzinfo.zone)
             # offset-based timezones
@@ -392,17 +656,17 @@ class Cursor(object):
             return "DATE '%s'" % date_str
 
         if isinstance(param, list):
-            return "ARRAY[%s]" % ','.join(map(self._format_prepared_param, param))
+            return "ARRAY[%s]" % ','.join(map(Cursor._format_prepared_param, param))
 
         if isinstance(param, tuple):
-            return "ROW(%s)" % ','.join(map(self._format_prepared_param, param))
+            return "ROW(%s)" % ','.join(map(Cursor._format_prepared_param, param))
 
         if isinstance(param, dict):
             keys = list(param.keys())
             values = [param[key] for key in keys]
             return "MAP({}, {})".format(
-                self._format_prepared_param(keys),
-                self._format_prepared_param(values)
+                Cursor._format_prepared_param(keys),
+                Cursor._format_prepared_param(values)
             )
 
         if isinstance(param, uuid.UUID):
@@ -416,30 +680,32 @@ class Cursor(object):
     def _deallocate_prepare_statement(self, added_prepare_header, statement_name):
         sql = 'DEALLOCATE PREPARE ' + statement_name
 
-        # Send deallocate statement. Copy the _request object to avoid poluting the
-        # one that is going to be used to execute the actual operation.
-        query = trino.client.TrinoQuery(copy.deepcopy(self._request), sql=sql,
-                                        experimental_python_types=self._experimental_pyton_types)
-        result = query.execute(
-            additional_http_headers={
-                constants.HEADER_PREPARED_STATEMENT: added_prepare_header
-            }
-        )
+        with tracing.start_span("trino.cursor.deallocate", {"trino.statement_name": statement_name}):
+            # Send deallocate statement with a child of the _request object to avoid poluting the
+            # one that is going to be used to execute the actual operation.
+            query = trino.client.TrinoQuery(self._request.child(), sql=sql,
+                                            experimental_python_types=self._experimental_pyton_types)
+            result = query.execute(
+                additional_http_headers={
+                    constants.HEADER_PREPARED_STATEMENT: added_prepare_header
+                }
+            )
 
-        # Iterate until the 'X-Trino-Deallocated-Prepare' header is found or
-        # until there are no more results
-        for _ in result:
-            response_headers = result.response_headers
+            # Iterate until the 'X-Trino-Deallocated-Prepare' header is found or
+            # until there are no more results
+            for _ in result:
+                response_headers = result.response_headers
 
-            if constants.HEADER_DEALLOCATED_PREPARE in response_headers:
-                return response_headers[constants.HEADER_DEALLOCATED_PREPARE]
+                if constants.HEADER_DEALLOCATED_PREPARE in response_headers:
+                    return response_headers[constants.HEADER_DEALLOCATED_PREPARE]
 
-        raise trino.exceptions.FailedToObtainDeallocatedPrepareHeader
+            raise trino.exceptions.FailedToObtainDeallocatedPrepareHeader
 
     def _generate_unique_statement_name(self):
         return 'st_' + uuid.uuid4().hex.replace('-', '')
 
-    def execute(self, operation, params=None):
+    def _execute(self, operation, params, max_rows=None, checkpoint_key=None, progress=None):
+        self._connection._cancel_abandoned_queries()
         if params:
             assert isinstance(params, (list, tuple)), (
                 'params must be a list or tuple containing the query '
@@ -456,8 +722,9 @@ class Cursor(object):
                 # Send execute statement and assign the return value to `results`
                 # as it will be returned by the function
                 self._query = self._get_added_prepare_statement_trino_query(
-                    statement_name, params
+                    statement_name, params, max_rows, checkpoint_key, progress
                 )
+                self._connection._track_query(self._query)
                 result = self._query.execute(
                     additional_http_headers={
                         constants.HEADER_PREPARED_STATEMENT: added_prepare_header
@@ -471,11 +738,94 @@ class Cursor(object):
 
         else:
             self._query = trino.client.TrinoQuery(self._request, sql=operation,
-                                                  experimental_python_types=self._experimental_pyton_types)
+                                                  experimental_python_types=self._experimental_pyton_types,
+                                                  row_type=self._row_type,
+                                                  intern_strings=self._intern_strings,
+                                                  listeners=self._listeners(progress),
+                                                  max_retries=self._connection.query_max_retries,
+                                                  max_rows=max_rows,
+                                                  **self._checkpoint(checkpoint_key))
+            self._connection._track_query(self._query)
             result = self._query.execute()
-        self._iterator = iter(result)
         return result
 
+    def _execute_cached(self, operation, params, progress=None):
+        """Execute a query to completion and return the cache entry of its rows."""
+        rows = list(self._execute(operation, params, progress=progress))
+        query = self._query
+        return trino.cache.CacheEntry(
+            rows,
+            self._row_type,
+            query.query_id,
+            query.columns,
+            query.stats,
+            query.warnings,
+            query.info_uri,
+            query.client_stats.bytes_received,
+        )
+
+    def execute(self, operation, params=None, max_rows=None, checkpoint_key=None, progress=None):
+        """
+        Execute a query, see PEP-0249.
+
+        With ``max_rows``, the query is cancelled as soon as that many rows
+        are received and :attr:`truncated` tells whether rows were left out.
+        With ``checkpoint_key``, the position of the result is saved to the
+        ``checkpoint_store`` of the connection, see :meth:`Connection.resume`.
+        Such queries are never served from or stored in the result cache.
+        ``progress`` is called with the :py:class:`trino.progress.QueryProgress`
+        of the query as its responses are processed, see :attr:`progress`.
+        """
+        with tracing.start_span("trino.cursor.execute", {"db.system": "trino", "db.statement": operation}):
+            self._progress_listener = None
+            cache = self._connection.result_cache
+            if (
+                cache is not None
+                and max_rows is None
+                and checkpoint_key is None
+                and self._connection.transaction is None
+                and trino.cache.is_cacheable(operation)
+            ):
+                key = cache.key(self, operation, params)
+                entry, executed = cache.get_or_run(key, lambda: self._execute_cached(operation, params, progress))
+                client_stats = self._query.client_stats if executed else None
+                tracing.set_attribute("trino.cache_hit", not executed)
+                self._query = trino.cache.CachedQuery(entry, client_stats)
+                result = self._query.result
+            else:
+                result = self._execute(operation, params, max_rows, checkpoint_key, progress)
+            self._iterator = iter(result)
+            return result
+
+    def submit(self, operation, params=None):
+        """
+        Execute a query without fetching its result and return a
+        :py:class:`trino.client.QueryHandle` to attach it with
+        :meth:`Connection.attach`. The result cache is not used.
+        """
+        with tracing.start_span("trino.cursor.submit", {"db.system": "trino", "db.statement": operation}):
+            self._execute(operation, params)
+            query = self._query
+            handle = query.detach()
+            self._connection._untrack_query(query)
+            self._query = None
+            self._iterator = None
+            return handle
+
+    def _attach(self, handle, checkpoint_key=None):
+        self._query = trino.client.TrinoQuery.attach(
+            self._request,
+            handle,
+            experimental_python_types=self._experimental_pyton_types,
+            row_type=self._row_type,
+            intern_strings=self._intern_strings,
+            listeners=self._listeners(),
+            max_retries=self._connection.query_max_retries,
+            **self._checkpoint(checkpoint_key),
+        )
+        self._connection._track_query(self._query)
+        self._iterator = iter(self._query.result)
+
     def executemany(self, operation, seq_of_params):
         """
         PEP-0249: Prepare a database operation (query or command) and then
@@ -567,7 +917,9 @@ class Cursor(object):
         self._query.cancel()
 
     def close(self):
-        self._connection.close()
+        """Cancel the query of the cursor if it is still running."""
+        if self._query is not None:
+            self._connection._cancel_queries([self._query])
 
 
 Date = datetime.date
@@ -0,0 +1,215 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module selects the coordinator new queries are sent to when a
+connection is given several hosts. Only the POST of a statement is routed:
+the ``nextUri`` of a query and its cancellation go to the coordinator that
+runs it. A retried statement goes to a coordinator not tried yet for it. The
+statements of a transaction, up to its ``COMMIT`` or ``ROLLBACK``, all go
+to the coordinator selected when it starts.
+
+A coordinator failing ``max_failures`` requests in a row, with a connection
+error or a 502, 503 or 504 response, is ejected for ``ejection_time``
+seconds. It then receives queries again, or earlier if
+:meth:`EndpointSelector.check_health` finds it healthy. When every
+coordinator is ejected, the one ejected first is used.
+"""
+import random
+import threading
+import time
+import urllib.parse
+from enum import Enum, unique
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import trino.logging
+from trino import constants
+
+__all__ = ["Endpoint", "EndpointSelector", "LoadBalancing", "parse_endpoints"]
+
+logger = trino.logging.get_logger(__name__)
+
+DEFAULT_EJECTION_TIME = 30.0
+DEFAULT_MAX_FAILURES = 1
+# weight of the latest request in the moving average of the latency
+LATENCY_SMOOTHING = 0.2
+
+
+@unique
+class LoadBalancing(Enum):
+    """
+    Policy choosing the coordinator of a new query among the healthy ones.
+
+    - ``ROUND_ROBIN``: each coordinator in turn.
+    - ``LEAST_OUTSTANDING``: the coordinator with the fewest requests in
+      flight. A running query keeps one request in flight while its result
+      is fetched.
+    - ``LATENCY_WEIGHTED``: a random coordinator, with a probability
+      inversely proportional to its average latency.
+    """
+
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"
+    LATENCY_WEIGHTED = "latency_weighted"
+
+
+class Endpoint(object):
+    """A coordinator and the health observed by the client."""
+
+    def __init__(self, host: str, port: int, http_scheme: str = constants.HTTP):
+        self.host = host
+        self.port = port
+        self.http_scheme = http_scheme
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejected_until: Optional[float] = None
+
+    @property
+    def netloc(self) -> str:
+        return "{}:{}".format(self.host, self.port)
+
+    def get_url(self, path: str) -> str:
+        return "{}://{}{}".format(self.http_scheme, self.netloc, path)
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until is not None and now < self.ejected_until
+
+    def __repr__(self):
+        return "Endpoint({}, outstanding={}, latency={}, failures={}, ejected_until={})".format(
+            self.netloc, self.outstanding, self.latency, self.failures, self.ejected_until
+        )
+
+
+def _bracket(host: str) -> str:
+    # IPv6 addresses are bracketed in URLs, as in the netloc of the nextUri of queries
+    return "[{}]".format(host) if ":" in host and not host.startswith("[") else host
+
+
+def parse_endpoints(
+    hosts: Sequence[Union[str, Tuple[str, int]]], default_port: int, http_scheme: str
+) -> List[Endpoint]:
+    """
+    Parse ``host``, ``host:port`` or ``(host, port)`` items. IPv6 addresses
+    are given as ``[::1]:8080``, or without a port as ``::1`` or ``[::1]``.
+    """
+    endpoints = []
+    for host in hosts:
+        if isinstance(host, tuple):
+            host, port = host
+        elif host.startswith("["):
+            address, separator, port = host[1:].partition("]")
+            if not separator or (port and not port.startswith(":")):
+                raise ValueError("invalid endpoint: {}".format(host))
+            host, port = address, port[1:] or default_port
+        elif host.count(":") == 1:
+            host, port = host.rsplit(":", 1)
+        else:
+            port = default_port
+        endpoints.append(Endpoint(_bracket(host), int(port), http_scheme))
+    return endpoints
+
+
+class EndpointSelector(object):
+    """
+    Select the coordinator of new queries and track the health of every
+    coordinator from the outcome of the requests sent to it. It is shared by
+    the requests of a connection and safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        load_balancing: Union[LoadBalancing, str] = LoadBalancing.ROUND_ROBIN,
+        ejection_time: float = DEFAULT_EJECTION_TIME,
+        max_failures: int = DEFAULT_MAX_FAILURES,
+    ):
+        if not endpoints:
+            raise ValueError("at least one endpoint is required")
+        self._endpoints = endpoints
+        self._by_netloc = {endpoint.netloc: endpoint for endpoint in endpoints}
+        self._load_balancing = LoadBalancing(load_balancing)
+        self._ejection_time = ejection_time
+        self._max_failures = max_failures
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return self._endpoints
+
+    def endpoint_for(self, url: str) -> Optional[Endpoint]:
+        """Return the endpoint ``url`` is sent to, if it is one of the endpoints."""
+        return self._by_netloc.get(urllib.parse.urlsplit(url).netloc)
+
+    def select(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """
+        Return the endpoint to send a new query to, other than the ``exclude``
+        endpoints already tried, or ``None`` if they were all tried.
+        """
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints if endpoint not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            healthy = [endpoint for endpoint in candidates if not endpoint.is_ejected(now)]
+            if not healthy:
+                # fail open, the coordinator ejected first is the most likely to be back
+                return min(candidates, key=lambda endpoint: endpoint.ejected_until)
+            if self._load_balancing == LoadBalancing.LEAST_OUTSTANDING:
+                return min(healthy, key=lambda endpoint: endpoint.outstanding)
+            if self._load_balancing == LoadBalancing.LATENCY_WEIGHTED:
+                # endpoints without latency yet are tried as if they were the fastest
+                latencies = [endpoint.latency for endpoint in healthy if endpoint.latency]
+                fastest = min(latencies) if latencies else 1.0
+                weights = [1.0 / (endpoint.latency or fastest) for endpoint in healthy]
+                return random.choices(healthy, weights)[0]
+            self._next += 1
+            return healthy[self._next % len(healthy)]
+
+    def begin(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.outstanding += 1
+
+    def end(self, endpoint: Endpoint, latency: float, healthy: bool) -> None:
+        """Record the outcome of a request sent to ``endpoint``."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if healthy:
+                endpoint.failures = 0
+                endpoint.ejected_until = None
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self._max_failures:
+                endpoint.ejected_until = time.monotonic() + self._ejection_time
+                logger.warning("ejecting coordinator %s for %s seconds", endpoint.netloc, self._ejection_time)
+
+    def check_health(self, http_session: Any, timeout: float = constants.DEFAULT_REQUEST_TIMEOUT) -> None:
+        """
+        Request ``/v1/info`` of every endpoint with ``http_session`` and eject
+        the ones that fail or are still starting, readmit the others.
+        """
+        for endpoint in self._endpoints:
+            start = time.monotonic()
+            try:
+                response = http_session.get(endpoint.get_url("/v1/info"), timeout=timeout)
+                healthy = response.ok and not response.json().get("starting", False)
+            except Exception as err:
+                logger.debug("health check of %s failed: %s", endpoint.netloc, err)
+                healthy = False
+            with self._lock:
+                endpoint.outstanding += 1
+            self.end(endpoint, time.monotonic() - start, healthy)
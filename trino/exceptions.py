@@ -17,10 +17,14 @@ defined in pep-0249.
 
 
 import functools
+import inspect
 import random
+import threading
 import time
+from typing import Any, Dict, Optional
 
 import trino.logging
+from trino import tracing
 
 logger = trino.logging.get_logger(__name__)
 
@@ -116,27 +120,257 @@ class TrinoUserError(TrinoQueryError):
     pass
 
 
-def retry_with(handle_retry, exceptions, conditions, max_attempts):
+class RetryStats(object):
+    """
+    Retries of the HTTP requests of a query. Exceptions raised after retrying
+    carry them as their ``retry_stats`` attribute.
+
+    - ``retries``: number of requests sent again.
+    - ``retry_time``: seconds spent waiting before sending them.
+    - ``causes``: number of retries by exception type or status code.
+    """
+
+    def __init__(self):
+        self.retries = 0
+        self.retry_time = 0.0
+        self.causes: Dict[str, int] = {}
+
+    def record_retry(self, cause: str, retry_time: float) -> None:
+        self.retries += 1
+        self.retry_time += retry_time
+        self.causes[cause] = self.causes.get(cause, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"retries": self.retries, "retryTime": self.retry_time, "causes": dict(self.causes)}
+
+    def __repr__(self):
+        return "RetryStats(retries={}, retry_time={}, causes={})".format(self.retries, self.retry_time, self.causes)
+
+
+class RetryBudget(object):
+    """
+    Maximum number of retries shared by the requests of a query or of a
+    connection. ``None`` allows any number of retries, each request being
+    still limited by ``max_attempts``.
+    """
+
+    def __init__(self, max_retries: Optional[int] = None):
+        self._max_retries = max_retries
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_retries(self) -> Optional[int]:
+        return self._max_retries
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self._max_retries is None:
+            return None
+        return max(0, self._max_retries - self._used)
+
+    def acquire(self) -> bool:
+        """Take a retry from the budget, return ``False`` if it is exhausted."""
+        with self._lock:
+            if self._max_retries is not None and self._used >= self._max_retries:
+                return False
+            self._used += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._used -= 1
+
+    def __copy__(self):
+        # a budget is shared, copies of the requests using it keep using it
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class TokenBucketRetryBudget(RetryBudget):
+    """
+    Retry budget refilled over time: it allows bursts of up to ``capacity``
+    retries, then ``rate`` retries per second. Sharing one bucket between the
+    requests of a connection, or between connections, stops clients from
+    overwhelming an overloaded coordinator with retries.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        super().__init__()
+        self._capacity = float(capacity)
+        self._rate = float(rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            self._refill()
+            return int(self._tokens)
+
+    def acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self._used += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._tokens = min(self._capacity, self._tokens + 1)
+            self._used -= 1
+
+
+def _acquire_retry(budgets) -> bool:
+    acquired = []
+    for budget in budgets:
+        if budget is None:
+            continue
+        if not budget.acquire():
+            for taken in acquired:
+                taken.release()
+            return False
+        acquired.append(budget)
+    return True
+
+
+def _retry_cause(result, error, conditions) -> Optional[str]:
+    """Return why the call must be retried, or ``None`` if it succeeded."""
+    if error is not None:
+        return type(error).__name__
+    if any(guard(result) for guard in conditions):
+        return str(getattr(result, "status_code", None))
+    return None
+
+
+def _trace_retry(attempt, result, error) -> None:
+    tracing.add_event("retry", {
+        "attempt": attempt,
+        "http.status_code": getattr(result, "status_code", None) if error is None else None,
+        "exception.type": type(error).__name__ if error is not None else None,
+    })
+
+
+def _accepts_cancelled(method) -> bool:
+    try:
+        return "cancelled" in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def retry_with(handle_retry, exceptions, conditions, max_attempts, budget=None):
+    """
+    Decorate ``func`` to call it again, up to ``max_attempts`` times, when it
+    raises one of ``exceptions`` or its result matches one of ``conditions``.
+
+    ``budget`` is a :class:`RetryBudget` shared by every call, for instance
+    by the requests of a connection. The decorated function also accepts the
+    keyword arguments ``retry_budget``, a budget of the caller such as a
+    query, ``retry_stats``, the :class:`RetryStats` to record the retries in,
+    and ``cancelled``, a :class:`threading.Event` that stops retrying and
+    interrupts the wait before the next attempt once set. They are not
+    passed to ``func``.
+    """
+    interruptible = _accepts_cancelled(handle_retry.retry)
+
     def wrapper(func):
         @functools.wraps(func)
-        def decorated(*args, **kwargs):
-            error = None
-            result = None
+        def decorated(*args, retry_budget=None, retry_stats=None, cancelled=None, **kwargs):
+            if retry_stats is None:
+                retry_stats = RetryStats()
             for attempt in range(1, max_attempts + 1):
+                error = None
+                result = None
                 try:
                     result = func(*args, **kwargs)
-                    if any(guard(result) for guard in conditions):
-                        handle_retry.retry(func, args, kwargs, None, attempt)
-                        continue
+                except Exception as err:
+                    if not any(isinstance(err, exc) for exc in exceptions):
+                        raise
+                    error = err
+                cause = _retry_cause(result, error, conditions)
+                if cause is None:
                     return result
+                if attempt == max_attempts or (cancelled is not None and cancelled.is_set()):
+                    break
+                if not _acquire_retry((retry_budget, budget)):
+                    break
+                _trace_retry(attempt, result, error)
+                start = time.monotonic()
+                if interruptible:
+                    handle_retry.retry(func, args, kwargs, error, attempt, cancelled=cancelled)
+                else:
+                    handle_retry.retry(func, args, kwargs, error, attempt)
+                retry_stats.record_retry(cause, time.monotonic() - start)
+                if cancelled is not None and cancelled.is_set():
+                    break
+            logger.info("failed after %s attempts", attempt)
+            if error is not None:
+                error.retry_stats = retry_stats
+                raise error
+            return result
+
+        return decorated
+
+    return wrapper
+
+
+def retry_with_async(handle_retry, exceptions, conditions, max_attempts, budget=None):
+    """
+    Variant of :func:`retry_with` decorating a coroutine function. It waits
+    with ``handle_retry.retry_async`` without blocking the event loop, and
+    ``cancelled`` is an :class:`asyncio.Event`.
+    """
+    def wrapper(func):
+        @functools.wraps(func)
+        async def decorated(*args, retry_budget=None, retry_stats=None, cancelled=None, **kwargs):
+            if retry_stats is None:
+                retry_stats = RetryStats()
+            for attempt in range(1, max_attempts + 1):
+                error = None
+                result = None
+                try:
+                    result = await func(*args, **kwargs)
                 except Exception as err:
+                    if not any(isinstance(err, exc) for exc in exceptions):
+                        raise
                     error = err
-                    if any(isinstance(err, exc) for exc in exceptions):
-                        handle_retry.retry(func, args, kwargs, err, attempt)
-                        continue
+                cause = _retry_cause(result, error, conditions)
+                if cause is None:
+                    return result
+                if attempt == max_attempts or (cancelled is not None and cancelled.is_set()):
+                    break
+                if not _acquire_retry((retry_budget, budget)):
+                    break
+                _trace_retry(attempt, result, error)
+                start = time.monotonic()
+                await handle_retry.retry_async(func, args, kwargs, error, attempt, cancelled=cancelled)
+                retry_stats.record_retry(cause, time.monotonic() - start)
+                if cancelled is not None and cancelled.is_set():
                     break
             logger.info("failed after %s attempts", attempt)
             if error is not None:
+                error.retry_stats = retry_stats
                 raise error
             return result
 
@@ -163,14 +397,35 @@ class DelayExponential(object):
 
 
 class RetryWithExponentialBackoff(object):
+    """
+    Wait an exponentially growing delay before each retry. The wait ends
+    early when the ``cancelled`` event is set, for instance when the query is
+    cancelled from another thread.
+    """
+
     def __init__(
         self, base=0.1, exponent=2, jitter=True, max_delay=2 * 3600  # 100ms  # 2 hours
     ):
         self._get_delay = DelayExponential(base, exponent, jitter, max_delay)
 
-    def retry(self, func, args, kwargs, err, attempt):
+    def retry(self, func, args, kwargs, err, attempt, cancelled=None):
+        delay = self._get_delay(attempt)
+        if cancelled is None:
+            time.sleep(delay)
+        else:
+            cancelled.wait(delay)
+
+    async def retry_async(self, func, args, kwargs, err, attempt, cancelled=None):
+        import asyncio
+
         delay = self._get_delay(attempt)
-        time.sleep(delay)
+        if cancelled is None:
+            await asyncio.sleep(delay)
+            return
+        try:
+            await asyncio.wait_for(cancelled.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
 
 
 # PEP 249
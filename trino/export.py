@@ -0,0 +1,355 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module streams the result of a query to a CSV, JSON Lines or Parquet
+file without building the rows of the DB-API: ::
+
+    >> conn = trino.dbapi.connect(host="localhost", port=8080, user="the-user")
+    >> export(conn, "SELECT * FROM orders", "orders.csv", "csv")
+
+or from the command line: ::
+
+    $ python -m trino.export --host localhost --user the-user --format jsonl \\
+        --output orders.jsonl "SELECT * FROM orders"
+
+Pages are fetched, encoded and written by three threads connected by bounded
+queues, so that the next page is requested while the previous one is
+encoded and written. Only ``queue_size`` pages per stage are held in memory.
+
+Values are written as received from the coordinator: the text of dates,
+times, timestamps and decimals is kept, arrays, maps and rows are written as
+JSON in CSV files. Parquet files, written with ``pyarrow``, have a row group
+per page; integer, floating point and boolean columns are typed, the other
+ones are strings.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import trino.dbapi
+import trino.logging
+from trino import constants
+from trino.client import TrinoQuery
+
+logger = trino.logging.get_logger(__name__)
+
+__all__ = ["FORMATS", "export", "main"]
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+_NESTED_TYPES = ("array", "map", "row")
+_FLOATING_TYPES = ("real", "double")
+_INTEGER_TYPES = ("tinyint", "smallint", "integer", "bigint")
+
+# marks the end of the pages in the queues
+_END = object()
+
+
+def _raw_type(column: Dict[str, Any]) -> str:
+    return column["type"].split("(", 1)[0]
+
+
+def _to_json(value):
+    return json.dumps(value, separators=(",", ":")) if value is not None else None
+
+
+class _CsvEncoder(object):
+    def __init__(self, columns: List[Dict[str, Any]], header: bool):
+        self._nested = [i for i, column in enumerate(columns) if _raw_type(column) in _NESTED_TYPES]
+        # statements without columns, e.g. DDL, have no header
+        self._header = [column["name"] for column in columns] if header and columns else None
+
+    def encode(self, rows: List[List[Any]]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if self._header is not None:
+            writer.writerow(self._header)
+            self._header = None
+        if self._nested:
+            for row in rows:
+                for i in self._nested:
+                    row[i] = _to_json(row[i])
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def close(self) -> bytes:
+        return self.encode([]) if self._header is not None else b""
+
+
+class _JsonLinesEncoder(object):
+    def __init__(self, columns: List[Dict[str, Any]], header: bool):
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        # '{"name":' then ',"name":' before the values, no dict is built per row
+        self._prefixes = [
+            ("," if i else "{") + self._encode(column["name"]) + ":" for i, column in enumerate(columns)
+        ]
+
+    def encode(self, rows: List[List[Any]]) -> bytes:
+        prefixes = self._prefixes
+        encode = self._encode
+        if not prefixes:
+            lines = ["{}"] * len(rows)
+        else:
+            lines = ["".join([prefix + encode(value) for prefix, value in zip(prefixes, row)]) + "}" for row in rows]
+        lines.append("")
+        return "\n".join(lines).encode("utf-8")
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ParquetEncoder(object):
+    """Encode pages as ``pyarrow`` tables, written by :class:`_ParquetWriter`."""
+
+    def __init__(self, columns: List[Dict[str, Any]], header: bool):
+        try:
+            import pyarrow
+        except ImportError:
+            raise RuntimeError("unable to import pyarrow")
+        self._pyarrow = pyarrow
+        fields = []
+        self._converters: List[Optional[Callable[[Any], Any]]] = []
+        for column in columns:
+            raw_type = _raw_type(column)
+            converter = None
+            if raw_type in _INTEGER_TYPES:
+                arrow_type = pyarrow.int64()
+            elif raw_type in _FLOATING_TYPES:
+                arrow_type = pyarrow.float64()
+                # NaN and infinities are sent as strings
+                converter = _to_float
+            elif raw_type == "boolean":
+                arrow_type = pyarrow.bool_()
+            else:
+                arrow_type = pyarrow.string()
+                if raw_type in _NESTED_TYPES:
+                    converter = _to_json
+            fields.append(pyarrow.field(column["name"], arrow_type))
+            self._converters.append(converter)
+        self.schema = pyarrow.schema(fields)
+
+    def encode(self, rows: List[List[Any]]):
+        arrays = []
+        for i, (field, converter) in enumerate(zip(self.schema, self._converters)):
+            values = [row[i] for row in rows]
+            if converter is not None:
+                values = [converter(value) for value in values]
+            arrays.append(self._pyarrow.array(values, type=field.type))
+        return self._pyarrow.Table.from_arrays(arrays, schema=self.schema)
+
+    def close(self):
+        # creates the file of an empty result
+        return self.schema.empty_table()
+
+
+def _to_float(value):
+    return float(value) if isinstance(value, str) else value
+
+
+class _BytesWriter(object):
+    def __init__(self, output):
+        self._file = output
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self._file.write(data)
+
+    def close(self) -> None:
+        self._file.flush()
+
+
+class _ParquetWriter(object):
+    """Write tables to a Parquet file created with the schema of the first one."""
+
+    def __init__(self, output):
+        self._output = output
+        self._writer = None
+
+    def write(self, table) -> None:
+        if self._writer is None:
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(self._output, table.schema)
+        if table.num_rows:
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+_ENCODERS = {"csv": _CsvEncoder, "jsonl": _JsonLinesEncoder, "parquet": _ParquetEncoder}
+_WRITERS = {"csv": _BytesWriter, "jsonl": _BytesWriter, "parquet": _ParquetWriter}
+
+
+class _Stopped(Exception):
+    """Raised by the queues of the stages once the export is stopped."""
+
+
+class _Stage(threading.Thread):
+    """Thread putting the items produced by ``run`` in a bounded queue, and the error it raises."""
+
+    def __init__(self, name: str, run: Callable[[Callable[[Any], None]], None], queue_size: int,
+                 stopped: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self.queue: "queue.Queue[Any]" = queue.Queue(queue_size)
+        self._run = run
+        self._stopped = stopped
+
+    def put(self, item: Any) -> None:
+        """Wait for the next stage to take ``item``, raise :class:`_Stopped` if the export stops meanwhile."""
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _Stopped()
+
+    def run(self) -> None:
+        try:
+            self._run(self.put)
+            item = _END
+        except _Stopped:
+            return
+        except BaseException as err:
+            item = err
+        try:
+            self.put(item)
+        except _Stopped:
+            pass
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                # the stage stopped without putting _END
+                if self._stopped.is_set():
+                    raise _Stopped()
+                continue
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def export(connection, sql: str, output, format: str = "csv", header: bool = True, queue_size: int = 4) -> int:
+    """
+    Write the result of ``sql`` to ``output``, a path or a binary file, and
+    return the number of rows written.
+
+    :param connection: :class:`trino.dbapi.Connection` the query is sent with.
+    :param format: one of :data:`FORMATS`.
+    :param header: write the names of the columns as the first line of CSV files.
+    :param queue_size: pages held between two threads of the pipeline.
+    """
+    if format not in FORMATS:
+        raise ValueError("format must be one of {}: {}".format(", ".join(FORMATS), format))
+
+    query = TrinoQuery(connection._create_request(), sql)
+    stopped = threading.Event()
+    columns: List[Dict[str, Any]] = []
+    rows = 0
+
+    def fetch(put):
+        result = query.execute()
+        # fetches pages until the columns are known, their rows are kept by the result
+        columns.extend(query.columns or [])
+        put(result._rows)
+        while not query.finished and not stopped.is_set():
+            put(query.fetch())
+
+    def encode(put):
+        nonlocal rows
+        encoder = None
+        for page in fetcher:
+            if encoder is None:
+                encoder = _ENCODERS[format](columns, header)
+            rows += len(page)
+            put(encoder.encode(page))
+        if encoder is not None:
+            put(encoder.close())
+
+    fetcher = _Stage("trino-export-fetch", fetch, queue_size, stopped)
+    encoder = _Stage("trino-export-encode", encode, queue_size, stopped)
+    path = None
+    if isinstance(output, str):
+        path = output
+        output = open(path, "wb")
+    writer = _WRITERS[format](output)
+    try:
+        fetcher.start()
+        encoder.start()
+        for data in encoder:
+            writer.write(data)
+        writer.close()
+    except BaseException:
+        stopped.set()
+        query._cancel_quietly()
+        if path is not None:
+            # do not leave a partial file
+            output.close()
+            _unlink(path)
+        raise
+    finally:
+        stopped.set()
+        if path is not None:
+            output.close()
+    logger.debug("exported %s rows of query %s", rows, query.query_id)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the result of a query to a CSV, JSON Lines or Parquet file.")
+    parser.add_argument("sql", help="query to export, - to read it from stdin")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=constants.DEFAULT_PORT)
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--catalog", default=constants.DEFAULT_CATALOG)
+    parser.add_argument("--schema", default=constants.DEFAULT_SCHEMA)
+    parser.add_argument("--http-scheme", choices=[constants.HTTP, constants.HTTPS], default=constants.HTTP)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default="-", help="file to write, - for stdout")
+    parser.add_argument("--no-header", action="store_true", help="do not write the names of the columns to CSV files")
+    args = parser.parse_args(argv)
+
+    sql = sys.stdin.read() if args.sql == "-" else args.sql
+    output = sys.stdout.buffer if args.output == "-" else args.output
+    with trino.dbapi.connect(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        catalog=args.catalog,
+        schema=args.schema,
+        http_scheme=args.http_scheme,
+    ) as connection:
+        rows = export(connection, sql, output, args.format, header=not args.no_header)
+    print("{} rows exported".format(rows), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module implements an HTTP/2 transport on top of ``httpx``. Install it
+with ``pip install trino[http2]`` and pass it as the HTTP session of a
+connection: ::
+
+    >> from trino.http2 import Http2Session
+    >> conn = trino.dbapi.connect(host="localhost", port=443, http_scheme="https",
+    ..                            http_session=Http2Session())
+
+With HTTP/2, the requests polling the ``nextUri`` of many concurrent queries
+are multiplexed as streams over a few TCP connections per coordinator,
+instead of holding one connection and one TLS handshake each. HTTP/2 is
+negotiated with TLS, plain HTTP falls back to HTTP/1.1.
+
+:class:`Http2Session` is a :class:`trino.transport.Transport`. Authentication
+objects setting headers, such as :class:`trino.auth.BasicAuthentication`,
+:class:`trino.auth.JWTAuthentication` and
+:class:`trino.auth.OAuth2Authentication`, and client certificates are
+supported. Kerberos authentication relies on ``requests`` and is not.
+"""
+import threading
+from typing import Any, Optional
+
+import requests
+
+import trino.logging
+from trino.transport import Transport, TransportResponse
+
+__all__ = ["Http2Session"]
+
+logger = trino.logging.get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+def _translate_error(err, httpx):
+    """Return the ``requests`` exception equivalent to the ``httpx`` exception ``err``."""
+    if isinstance(err, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(err))
+    if isinstance(err, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(str(err))
+    if isinstance(err, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(str(err))
+    if isinstance(err, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(err))
+    return err
+
+
+class Http2Session(Transport):
+    """
+    Transport sending requests with an ``httpx.Client``.
+
+    :param max_connections: maximum number of TCP connections, each one
+                            multiplexing many requests with HTTP/2.
+    :param proxy: URL of a proxy.
+    :param client_kwargs: other arguments of ``httpx.Client``.
+
+    The client is created on the first request, after the authentication
+    objects of the connection have set ``auth``, ``cert`` and ``verify``.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        proxy: Optional[str] = None,
+        **client_kwargs: Any,
+    ):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("unable to import httpx")
+        super().__init__()
+        self._httpx = httpx
+        self._max_connections = max_connections
+        self._proxy = proxy
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self):
+        client = self._client
+        if client is not None:
+            return client
+        # the first requests of several threads create a single client
+        with self._client_lock:
+            if self._client is not None:
+                return self._client
+            kwargs = dict(
+                http2=True,
+                verify=self.verify,
+                trust_env=self.trust_env,
+                limits=self._httpx.Limits(max_connections=self._max_connections),
+                proxy=self._proxy,
+            )
+            if self.cert is not None:
+                kwargs["cert"] = self.cert
+            kwargs.update(self._client_kwargs)
+            self._client = self._httpx.Client(**kwargs)
+            return self._client
+
+    def send(self, request, timeout=None, allow_redirects=False, stream=False, **kwargs):
+        if isinstance(timeout, tuple):
+            timeout = self._httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            response = self._get_client().request(
+                request.method,
+                request.url,
+                content=request.body,
+                headers=dict(request.headers),
+                timeout=timeout,
+                follow_redirects=allow_redirects,
+            )
+            # read the body here so that errors while reading it are translated too
+            content = response.read()
+        except self._httpx.HTTPError as err:
+            raise _translate_error(err, self._httpx) from err
+        return TransportResponse(
+            response.status_code,
+            response.headers,
+            str(response.url),
+            request=request,
+            content=content,
+            connection=self,
+        )
+
+    def close(self) -> None:
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
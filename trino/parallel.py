@@ -0,0 +1,242 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module reads the result of a query with several concurrent queries,
+each reading a partition of the result through its own ``nextUri`` chain: ::
+
+    >> conn = trino.dbapi.connect(host="localhost", port=8080, user="the-user")
+    >> table = read(conn, "SELECT * FROM orders", partition_by="orderkey", partitions=8)
+
+With ``method="range"``, the partitions are ranges of values of the
+``partition_by`` column, a number, a decimal, a date or a timestamp. Its
+minimum and maximum are queried first unless ``bounds`` are given, and the
+rows where it is ``NULL`` belong to the first partition. With
+``method="hash"``, the rows are partitioned by a hash of the column cast to
+``varchar``: a number, a string, a boolean, a date, a time or a timestamp,
+not a ``varbinary``, an array, a map or a row. Every partition then scans the
+whole input of the query.
+
+The partitions run on ``executor``, by default a thread per partition. To
+run them in other processes, pass a ``concurrent.futures.ProcessPoolExecutor``
+and the arguments of :func:`trino.dbapi.connect` as ``connection``. The
+result is a ``pyarrow.Table``, a ``pandas.DataFrame`` or a list of rows,
+with the rows of the partitions in order.
+
+When a partition fails, the queries of the other ones are cancelled before
+the error is raised, except those running in other processes.
+"""
+import concurrent.futures
+import datetime
+import threading
+from typing import Any, List, Optional, Tuple
+
+import trino.dbapi
+import trino.logging
+
+logger = trino.logging.get_logger(__name__)
+
+__all__ = ["METHODS", "OUTPUTS", "read", "partition_queries"]
+
+METHODS = ("range", "hash")
+OUTPUTS = ("arrow", "pandas", "rows")
+
+# rows read between two checks of the reads to stop
+_FETCH_SIZE = 1000
+
+# SQL literal of a value, as the parameters of cursors
+_literal = trino.dbapi.Cursor._format_prepared_param
+
+
+def _quote_identifier(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _subquery(sql: str) -> str:
+    return "({}) AS partitioned".format(sql.strip().rstrip(";"))
+
+
+def _split(low: Any, high: Any, partitions: int) -> List[Any]:
+    """Return the values splitting ``[low, high]`` in ``partitions`` ranges, without duplicates."""
+    if isinstance(low, int):
+        # high is one of the values to split
+        span = high - low + 1
+    elif isinstance(low, datetime.date) and not isinstance(low, datetime.datetime):
+        span = high - low + datetime.timedelta(days=1)
+    else:
+        span = None
+    bounds = []
+    for i in range(1, partitions):
+        bound = low + span * i // partitions if span is not None else low + (high - low) * i / partitions
+        if bound > low and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+    return bounds
+
+
+def partition_queries(sql: str, partition_by: str, partitions: int, method: str = "range",
+                      bounds: Optional[Tuple[Any, Any]] = None) -> List[str]:
+    """
+    Return the queries reading the partitions of the result of ``sql``. The
+    ``range`` method requires the ``(minimum, maximum)`` of the column as
+    ``bounds``; fewer partitions are returned if the range is too small.
+    """
+    if method not in METHODS:
+        raise ValueError("method must be one of {}: {}".format(", ".join(METHODS), method))
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1: {}".format(partitions))
+    column = _quote_identifier(partition_by)
+    select = "SELECT * FROM {} WHERE ".format(_subquery(sql))
+
+    if method == "hash":
+        # the sign bit is cleared for mod to return the bucket
+        bucket = "mod(bitwise_and(from_big_endian_64(xxhash64(to_utf8(coalesce(CAST({} AS varchar), '')))), {}), {})"
+        bucket = bucket.format(column, 2 ** 63 - 1, partitions)
+        return [select + "{} = {}".format(bucket, i) for i in range(partitions)]
+
+    if bounds is None:
+        raise ValueError("the range method requires bounds")
+    low, high = bounds
+    if low is None:
+        # no values, or only NULL values
+        return [sql]
+    splits = [_literal(value) for value in _split(low, high, partitions)]
+    if not splits:
+        return [sql]
+    queries = ["{}{} < {} OR {} IS NULL".format(select, column, splits[0], column)]
+    for lower, upper in zip(splits, splits[1:]):
+        queries.append("{}{} >= {} AND {} < {}".format(select, column, lower, column, upper))
+    queries.append("{}{} >= {}".format(select, column, splits[-1]))
+    return queries
+
+
+def _query_bounds(connection, sql: str, partition_by: str) -> Tuple[Any, Any]:
+    column = _quote_identifier(partition_by)
+    rows = _fetch(connection, "SELECT min({0}), max({0}) FROM {1}".format(column, _subquery(sql)))[1]
+    return rows[0][0], rows[0][1]
+
+
+def _fetch(connection, sql: str, stopped: Optional[threading.Event] = None) -> Tuple[List[str], List[List[Any]]]:
+    """
+    Return the names of the columns and the rows of ``sql``. The query is
+    cancelled when ``stopped`` is set, and the rows read so far are returned.
+    """
+    if isinstance(connection, dict):
+        with trino.dbapi.connect(**connection) as conn:
+            return _fetch(conn, sql, stopped)
+    if not isinstance(connection, trino.dbapi.Connection):
+        # a trino.pool.ConnectionPool
+        with connection.connect() as conn:
+            return _fetch(conn, sql, stopped)
+    cursor = connection.cursor(experimental_python_types=True)
+    if stopped is not None and stopped.is_set():
+        return [], []
+    cursor.execute(sql)
+    rows: List[List[Any]] = []
+    while True:
+        if stopped is not None and stopped.is_set():
+            cursor._query._cancel_quietly()
+            break
+        page = cursor.fetchmany(_FETCH_SIZE)
+        if not page:
+            break
+        rows.extend(page)
+    return [column[0] for column in cursor.description], rows
+
+
+def _read_partition(connection, sql: str, output: str, stopped: Optional[threading.Event] = None):
+    names, rows = _fetch(connection, sql, stopped)
+    if output == "rows":
+        return rows
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("unable to import pyarrow")
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    return pyarrow.Table.from_arrays([pyarrow.array(list(values)) for values in columns], names=names)
+
+
+def _concat_tables(tables):
+    import pyarrow
+    try:
+        # the columns of a partition without rows have the null type
+        return pyarrow.concat_tables(tables, promote_options="permissive")
+    except TypeError:
+        # pyarrow < 14
+        return pyarrow.concat_tables(tables, promote=True)
+
+
+def read(
+    connection,
+    sql: str,
+    partition_by: str,
+    partitions: int = 4,
+    method: str = "range",
+    bounds: Optional[Tuple[Any, Any]] = None,
+    output: str = "arrow",
+    executor: Optional[concurrent.futures.Executor] = None,
+):
+    """
+    Read the result of ``sql`` with ``partitions`` concurrent queries.
+
+    :param connection: :class:`trino.dbapi.Connection` or
+                       :class:`trino.pool.ConnectionPool` the queries are sent
+                       with, or the arguments of :func:`trino.dbapi.connect`.
+    :param partition_by: name of the column of the result the rows are
+                         partitioned by.
+    :param method: ``range`` or ``hash``, see :mod:`trino.parallel`.
+    :param bounds: ``(minimum, maximum)`` of ``partition_by`` for the
+                   ``range`` method, queried if not given.
+    :param output: ``arrow``, ``pandas`` or ``rows``.
+    :param executor: executor running the partitions, shared by several
+                     reads. A thread per partition by default.
+    """
+    if output not in OUTPUTS:
+        raise ValueError("output must be one of {}: {}".format(", ".join(OUTPUTS), output))
+    if method == "range" and bounds is None:
+        bounds = _query_bounds(connection, sql, partition_by)
+    queries = partition_queries(sql, partition_by, partitions, method, bounds)
+    logger.debug("reading %s partitions of %s", len(queries), sql)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(len(queries), thread_name_prefix="trino-parallel")
+    # the partitions running in other processes cannot be stopped
+    stopped = None if isinstance(executor, concurrent.futures.ProcessPoolExecutor) else threading.Event()
+    futures = [executor.submit(_read_partition, connection, query, "rows" if output == "rows" else "arrow", stopped)
+               for query in queries]
+    try:
+        done, pending = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        if pending:
+            # raises the error of the first failed partition
+            next(future for future in futures if future in done and future.exception() is not None).result()
+        results = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        if stopped is not None:
+            # wait for the running partitions to cancel their queries
+            stopped.set()
+            concurrent.futures.wait(futures)
+        raise
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+    if output == "rows":
+        return [row for rows in results for row in rows]
+    table = _concat_tables(results)
+    if output == "arrow":
+        return table
+    try:
+        return table.to_pandas()
+    except ImportError:
+        raise RuntimeError("unable to import pandas")
@@ -0,0 +1,283 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module implements a pool of DB-API connections. Every connection of a
+pool shares one ``requests.Session``, keeping its TCP and TLS connections to
+the coordinator alive between checkouts, and one authentication object,
+keeping its token: ::
+
+    >> pool = ConnectionPool(host="localhost", port=8080, user="the-user", max_size=20)
+    >> with pool.connect() as conn:
+    ..     cur = conn.cursor()
+    ..     cur.execute("SELECT 1")
+
+``pool.connect`` can be given to SQLAlchemy as the ``creator`` of an engine,
+with ``poolclass=NullPool`` to not pool the connections twice.
+"""
+import collections
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import trino.client
+import trino.dbapi
+import trino.logging
+from trino.exceptions import OperationalError
+
+__all__ = ["ConnectionPool", "PooledConnection"]
+
+logger = trino.logging.get_logger(__name__)
+
+
+def _copy(value: Any) -> Any:
+    # lists and dicts, e.g. query_listeners or http_headers, may be modified in place
+    return type(value)(value) if type(value) in (list, dict) else value
+
+
+def _attributes(connection: trino.dbapi.Connection) -> Dict[str, Any]:
+    """Return copies of the public attributes of ``connection``."""
+    return {name: _copy(value) for name, value in vars(connection).items() if not name.startswith("_")}
+
+
+class _Entry(object):
+    def __init__(self, connection: trino.dbapi.Connection):
+        self.connection = connection
+        self.created = time.monotonic()
+        self.last_used = self.created
+        # attributes of the connection as created, restored when it is returned
+        self.attributes = _attributes(connection)
+
+    def reset(self) -> None:
+        """Undo the changes of the borrower to the attributes and the session of the connection."""
+        connection = self.connection
+        for name in list(vars(connection)):
+            if not name.startswith("_") and name not in self.attributes:
+                delattr(connection, name)
+        for name, value in self.attributes.items():
+            setattr(connection, name, _copy(value))
+        # drops the session properties set by queries, e.g. SET SESSION
+        connection._client_session = connection._new_client_session()
+
+
+class PooledConnection(object):
+    """
+    Connection checked out from a :class:`ConnectionPool`. It behaves like a
+    :class:`trino.dbapi.Connection` except that :meth:`close` returns the
+    connection to the pool. The attributes set on the connection, and the
+    session properties set by its queries, are then reset.
+    """
+
+    def __init__(self, pool: "ConnectionPool", entry: _Entry):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_entry", entry)
+
+    @property
+    def connection(self) -> trino.dbapi.Connection:
+        if self._entry is None:
+            raise OperationalError("connection returned to the pool")
+        return self._entry.connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.connection, name, value)
+
+    def close(self) -> None:
+        entry = self._entry
+        if entry is None:
+            return
+        object.__setattr__(self, "_entry", None)
+        self._pool._release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+        finally:
+            self.close()
+
+
+class ConnectionPool(object):
+    """
+    Pool of :class:`trino.dbapi.Connection` created with ``connect_kwargs``.
+
+    :param min_size: number of connections created up front and kept open
+                     regardless of ``idle_timeout``.
+    :param max_size: maximum number of connections checked out at once.
+    :param max_lifetime: seconds after which a connection is closed instead
+                         of being checked out again, ``None`` for no limit.
+    :param idle_timeout: seconds after which an idle connection is closed,
+                         ``None`` for no limit.
+    :param timeout: seconds :meth:`connect` waits for a connection to be
+                    returned when ``max_size`` connections are checked out,
+                    ``None`` to wait forever.
+    :param validation_query: statement run on a connection before it is
+                             checked out, for instance ``SELECT 1``. A
+                             connection failing it is discarded.
+    """
+
+    def __init__(
+        self,
+        min_size: int = 0,
+        max_size: int = 10,
+        max_lifetime: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        timeout: Optional[float] = 30.0,
+        validation_query: Optional[str] = None,
+        **connect_kwargs: Any,
+    ):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("expected 0 <= min_size <= max_size and max_size >= 1")
+        self._min_size = min_size
+        self._max_size = max_size
+        self._max_lifetime = max_lifetime
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._validation_query = validation_query
+        if connect_kwargs.get("http_session") is None:
+            connect_kwargs["http_session"] = self._create_http_session(connect_kwargs.get("verify", True))
+        self._connect_kwargs = connect_kwargs
+        # idle connections, the most recently used last so that they are reused first
+        self._idle: Deque[_Entry] = collections.deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append(self._create())
+
+    def _create_http_session(self, verify):
+        import requests.adapters
+
+        http_session = trino.client.TrinoRequest.http.Session()
+        http_session.verify = verify
+        # keep a TCP connection per connection of the pool
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self._max_size)
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+        return http_session
+
+    @property
+    def http_session(self):
+        return self._connect_kwargs["http_session"]
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle or checked out."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def _create(self) -> _Entry:
+        self._size += 1
+        try:
+            # copies, as borrowers may modify the lists and dicts of their connection
+            kwargs = {name: _copy(value) for name, value in self._connect_kwargs.items()}
+            return _Entry(trino.dbapi.Connection(**kwargs))
+        except Exception:
+            self._size -= 1
+            raise
+
+    def _discard(self, entry: _Entry) -> None:
+        self._size -= 1
+        try:
+            entry.connection.close()
+        except Exception as err:
+            logger.debug("failed to close a pooled connection: %s", err)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        if self._max_lifetime is not None and now - entry.created >= self._max_lifetime:
+            return True
+        return (
+            self._idle_timeout is not None
+            and now - entry.last_used >= self._idle_timeout
+            and self._size > self._min_size
+        )
+
+    def _validate(self, entry: _Entry) -> bool:
+        if self._validation_query is None:
+            return True
+        try:
+            cursor = entry.connection.cursor()
+            cursor.execute(self._validation_query)
+            cursor.fetchall()
+            return True
+        except Exception as err:
+            logger.warning("discarding a pooled connection failing validation: %s", err)
+            return False
+
+    def connect(self) -> PooledConnection:
+        """Check out a connection, creating one if none is idle."""
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        while True:
+            entry, fresh = self._checkout(deadline)
+            if self._validate(entry):
+                return PooledConnection(self, entry)
+            with self._condition:
+                self._discard(entry)
+                self._condition.notify()
+            if fresh:
+                # a new connection failing too, do not try again until the coordinator is back
+                raise OperationalError("validation of a new connection failed")
+
+    def _checkout(self, deadline: Optional[float]) -> Tuple[_Entry, bool]:
+        """Return an idle or a new connection, and whether it was created by this call."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise OperationalError("connection pool is closed")
+                now = time.monotonic()
+                while self._idle:
+                    entry = self._idle.pop()
+                    if not self._expired(entry, now):
+                        return entry, False
+                    self._discard(entry)
+                if self._size < self._max_size:
+                    return self._create(), True
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise OperationalError("no connection available in the pool after {}s".format(self._timeout))
+                self._condition.wait(remaining)
+
+    def _release(self, entry: _Entry) -> None:
+        connection = entry.connection
+        # queries left running by the borrower are not needed by the next one
+        connection._cancel_queries()
+        try:
+            if connection.transaction is not None:
+                connection.rollback()
+        except Exception as err:
+            logger.warning("failed to roll back the transaction of a pooled connection: %s", err)
+        connection._isolation_level = self._connect_kwargs.get("isolation_level", trino.dbapi.IsolationLevel.AUTOCOMMIT)
+        entry.reset()
+        with self._condition:
+            entry.last_used = time.monotonic()
+            if self._closed or connection.transaction is not None:
+                self._discard(entry)
+            else:
+                self._idle.append(entry)
+            self._condition.notify()
+
+    def close(self) -> None:
+        """Close the idle connections, connections checked out are closed when returned."""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._condition.notify_all()
@@ -0,0 +1,181 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module reports the progress of queries from the ``stats`` the
+coordinator sends with every response: ::
+
+    >> def report(progress):
+    ..     print(progress.state, progress.percentage, progress.rows_per_second, progress.eta)
+    >> cur.execute("SELECT * FROM orders", progress=report)
+
+The progress is updated whenever a response is processed, also while
+waiting for the columns of a query or while a query is queued, as the
+coordinator then responds about once per second. The callback is called at
+most once per ``interval`` seconds, and once more when the result has been
+read.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import trino.logging
+from trino.client import QueryListener
+
+logger = trino.logging.get_logger(__name__)
+
+__all__ = ["QueryProgress", "ProgressListener"]
+
+
+class QueryProgress(object):
+    """
+    Snapshot of the progress of a query. Times are in seconds, ``None`` when
+    unknown.
+
+    - ``state``: state of the query on the coordinator, e.g. ``QUEUED``,
+      ``RUNNING`` or ``FINISHED``.
+    - ``percentage``: progress estimated by the coordinator, only known
+      for some queries.
+    - ``processed_rows`` and ``processed_bytes``: input read by the cluster.
+    - ``rows_received``: rows of the result received by the client.
+    - ``elapsed`` and ``queued``: time since the query was created and time
+      spent queued.
+    - ``rows_per_second`` and ``bytes_per_second``: input read per second
+      since the previous update, or since the query started running.
+    - ``eta``: time to completion extrapolated from ``percentage``.
+    - ``stalled``: time since ``processed_rows`` last increased.
+    """
+
+    def __init__(
+        self,
+        query_id: Optional[str],
+        state: Optional[str],
+        percentage: Optional[float],
+        processed_rows: int,
+        processed_bytes: int,
+        rows_received: int,
+        elapsed: float,
+        queued: float,
+        rows_per_second: float,
+        bytes_per_second: float,
+        eta: Optional[float],
+        stalled: float,
+    ):
+        self.query_id = query_id
+        self.state = state
+        self.percentage = percentage
+        self.processed_rows = processed_rows
+        self.processed_bytes = processed_bytes
+        self.rows_received = rows_received
+        self.elapsed = elapsed
+        self.queued = queued
+        self.rows_per_second = rows_per_second
+        self.bytes_per_second = bytes_per_second
+        self.eta = eta
+        self.stalled = stalled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return "QueryProgress({})".format(", ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()))
+
+
+class ProgressListener(QueryListener):
+    """
+    Compute the :class:`QueryProgress` of a query from its responses and
+    pass it to ``callback`` at most once per ``interval`` seconds. A
+    listener follows a single query; the latest progress is :attr:`progress`.
+    """
+
+    def __init__(self, callback: Optional[Callable[[QueryProgress], None]] = None, interval: float = 1.0):
+        self.callback = callback
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._progress: Optional[QueryProgress] = None
+        self._started = time.monotonic()
+        self._reported: Optional[float] = None
+        # (time, processed rows, processed bytes) of the previous update, for the rates
+        self._sample = (self._started, 0, 0)
+        self._changed = self._started
+
+    @property
+    def progress(self) -> Optional[QueryProgress]:
+        return self._progress
+
+    def _update(self, query) -> QueryProgress:
+        stats = query.stats
+        now = time.monotonic()
+        processed_rows = stats.get("processedRows") or 0
+        processed_bytes = stats.get("processedBytes") or 0
+        if "elapsedTimeMillis" in stats:
+            elapsed = stats["elapsedTimeMillis"] / 1000.0
+        else:
+            elapsed = now - self._started
+        queued = (stats.get("queuedTimeMillis") or 0) / 1000.0
+        percentage = stats.get("progressPercentage")
+
+        sample_time, sample_rows, sample_bytes = self._sample
+        if processed_rows > sample_rows:
+            self._changed = now
+        seconds = now - sample_time
+        if seconds > 0 and processed_rows >= sample_rows:
+            rows_per_second = (processed_rows - sample_rows) / seconds
+            bytes_per_second = max(0, processed_bytes - sample_bytes) / seconds
+        else:
+            running = max(elapsed - queued, 0.0)
+            rows_per_second = processed_rows / running if running else 0.0
+            bytes_per_second = processed_bytes / running if running else 0.0
+        self._sample = (now, processed_rows, processed_bytes)
+
+        eta = None
+        state = stats.get("state")
+        if state == "FINISHED" or query.finished:
+            eta = 0.0
+        elif percentage and 0 < percentage < 100:
+            running = max(elapsed - queued, 0.0)
+            eta = running * (100.0 - percentage) / percentage
+
+        return QueryProgress(
+            query.query_id,
+            state,
+            percentage,
+            processed_rows,
+            processed_bytes,
+            query.client_stats.rows,
+            elapsed,
+            queued,
+            rows_per_second,
+            bytes_per_second,
+            eta,
+            now - self._changed,
+        )
+
+    def _report(self, query, force: bool) -> None:
+        with self._lock:
+            self._progress = progress = self._update(query)
+            now = time.monotonic()
+            if self.callback is None or not (
+                force or self._reported is None or now - self._reported >= self.interval
+            ):
+                return
+            self._reported = now
+        try:
+            self.callback(progress)
+        except Exception:
+            logger.exception("progress callback of query %s failed", query.query_id)
+
+    def on_page(self, query, rows):
+        self._report(query, force=False)
+
+    def on_completed(self, query):
+        self._report(query, force=True)
@@ -0,0 +1,104 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module integrates the client with OpenTelemetry tracing. Tracing is
+disabled by default and requires the ``opentelemetry-api`` package, install
+it with ``pip install trino[tracing]``. Enable it once per process: ::
+
+    >> import trino.tracing
+    >> trino.tracing.enable()
+
+Spans are then created for the HTTP requests, the queries, the prepared
+statements, the transactions and the OAuth2 token flow. While tracing is
+disabled, :func:`start_span` returns a shared no-op context manager so that
+the instrumented code pays only for a function call.
+"""
+from typing import Any, Dict, Optional
+
+import trino.logging
+
+__all__ = ["enable", "disable", "is_enabled", "start_span", "set_attribute", "add_event"]
+
+logger = trino.logging.get_logger(__name__)
+
+TRACER_NAME = "trino"
+
+_tracer: Optional[Any] = None
+
+
+class _NoOpSpan(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+def enable(tracer_provider: Optional[Any] = None) -> None:
+    """
+    Create spans with the tracer named ``trino`` of ``tracer_provider``, or of
+    the global tracer provider if it is ``None``.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        raise RuntimeError("unable to import opentelemetry")
+
+    from trino import __version__
+    _tracer = trace.get_tracer(TRACER_NAME, __version__, tracer_provider=tracer_provider)
+    logger.debug("tracing enabled")
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def _attributes(attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not attributes:
+        return {}
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Return a context manager starting a span named ``name`` as the current
+    span. ``None`` attributes are not recorded.
+    """
+    if _tracer is None:
+        return _NO_OP_SPAN
+    return _tracer.start_as_current_span(name, attributes=_attributes(attributes))
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set an attribute of the current span."""
+    if _tracer is None or value is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attribute(key, value)
+
+
+def add_event(name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """Add an event to the current span."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().add_event(name, attributes=_attributes(attributes))
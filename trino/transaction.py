@@ -12,7 +12,7 @@
 from enum import Enum, unique
 from typing import Iterable
 
-from trino import constants
+from trino import constants, tracing
 import trino.client
 import trino.exceptions
 import trino.logging
@@ -60,42 +60,46 @@ class Transaction(object):
         return self._id
 
     def begin(self):
-        response = self._request.post(START_TRANSACTION)
-        if not response.ok:
-            raise trino.exceptions.DatabaseError(
-                "failed to start transaction: {}".format(response.status_code)
-            )
-        transaction_id = response.headers.get(constants.HEADER_STARTED_TRANSACTION)
-        if transaction_id and transaction_id != NO_TRANSACTION:
-            self._id = response.headers[constants.HEADER_STARTED_TRANSACTION]
-        status = self._request.process(response)
-        while status.next_uri:
-            response = self._request.get(status.next_uri)
+        with tracing.start_span("trino.transaction.begin"):
+            response = self._request.post(START_TRANSACTION)
+            if not response.ok:
+                raise trino.exceptions.DatabaseError(
+                    "failed to start transaction: {}".format(response.status_code)
+                )
             transaction_id = response.headers.get(constants.HEADER_STARTED_TRANSACTION)
             if transaction_id and transaction_id != NO_TRANSACTION:
                 self._id = response.headers[constants.HEADER_STARTED_TRANSACTION]
             status = self._request.process(response)
-        self._request.transaction_id = self._id
-        logger.info("transaction started: %s", self._id)
+            while status.next_uri:
+                response = self._request.get(status.next_uri)
+                transaction_id = response.headers.get(constants.HEADER_STARTED_TRANSACTION)
+                if transaction_id and transaction_id != NO_TRANSACTION:
+                    self._id = response.headers[constants.HEADER_STARTED_TRANSACTION]
+                status = self._request.process(response)
+            self._request.transaction_id = self._id
+            tracing.set_attribute("trino.transaction_id", self._id)
+            logger.info("transaction started: %s", self._id)
 
     def commit(self):
-        query = trino.client.TrinoQuery(self._request, COMMIT)
-        try:
-            list(query.execute())
-        except Exception as err:
-            raise trino.exceptions.DatabaseError(
-                "failed to commit transaction {}: {}".format(self._id, err)
-            )
-        self._id = NO_TRANSACTION
-        self._request.transaction_id = self._id
+        with tracing.start_span("trino.transaction.commit", {"trino.transaction_id": self._id}):
+            query = trino.client.TrinoQuery(self._request, COMMIT)
+            try:
+                list(query.execute())
+            except Exception as err:
+                raise trino.exceptions.DatabaseError(
+                    "failed to commit transaction {}: {}".format(self._id, err)
+                )
+            self._id = NO_TRANSACTION
+            self._request.transaction_id = self._id
 
     def rollback(self):
-        query = trino.client.TrinoQuery(self._request, ROLLBACK)
-        try:
-            list(query.execute())
-        except Exception as err:
-            raise trino.exceptions.DatabaseError(
-                "failed to rollback transaction {}: {}".format(self._id, err)
-            )
-        self._id = NO_TRANSACTION
-        self._request.transaction_id = self._id
+        with tracing.start_span("trino.transaction.rollback", {"trino.transaction_id": self._id}):
+            query = trino.client.TrinoQuery(self._request, ROLLBACK)
+            try:
+                list(query.execute())
+            except Exception as err:
+                raise trino.exceptions.DatabaseError(
+                    "failed to rollback transaction {}: {}".format(self._id, err)
+                )
+            self._id = NO_TRANSACTION
+            self._request.transaction_id = self._id
@@ -0,0 +1,398 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+This module defines the transports sending the HTTP requests of the client.
+A transport implements :meth:`Transport.send`, sending a request and
+returning its status, headers and body as a byte stream. It is passed to a
+connection as its HTTP session: ::
+
+    >> from trino.transport import Urllib3Transport
+    >> conn = trino.dbapi.connect(host="localhost", port=8080, user="the-user",
+    ..                            http_session=Urllib3Transport())
+
+:class:`Transport` provides the part of the ``requests.Session`` interface
+used by the client and the authentication classes: ``get``, ``post`` and
+``delete``, and the ``headers``, ``auth``, ``verify`` and ``cert``
+attributes. An authentication object is called with a
+:class:`TransportRequest` before it is sent, and can register ``response``
+hooks, called with the response and returning the response to use, such as
+the response of the request sent again with a token. Errors are raised as
+``requests`` exceptions so that the retry policies apply to every transport.
+
+- :class:`RequestsTransport` sends requests with a ``requests.Session`` and
+  supports every authentication, including Kerberos.
+- :class:`Urllib3Transport` sends requests with an ``urllib3.PoolManager``,
+  without the per request overhead of ``requests``, which is significant
+  when the pages of results are small.
+"""
+import abc
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+import urllib3
+
+import trino.logging
+
+__all__ = ["RequestsTransport", "Transport", "TransportRequest", "TransportResponse", "Urllib3Transport"]
+
+logger = trino.logging.get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 10
+CHUNK_SIZE = 64 * 1024
+
+# status codes requests considers to be redirects
+_REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
+
+class TransportRequest(object):
+    """Request sent by a :class:`Transport`."""
+
+    def __init__(self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes] = None):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.hooks: List[Callable[..., Any]] = []
+
+    def register_hook(self, event: str, hook: Callable[..., Any]) -> None:
+        if event != "response":
+            raise ValueError("unsupported hook: {}".format(event))
+        self.hooks.append(hook)
+
+    def copy(self) -> "TransportRequest":
+        return TransportRequest(self.method, self.url, dict(self.headers), self.body)
+
+    def __repr__(self):
+        return "<TransportRequest [{}]>".format(self.method)
+
+
+class TransportResponse(object):
+    """
+    Response returned by a :class:`Transport`. Its body is given as
+    ``content`` or as a ``stream`` of bytes read on first access.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: Any,
+        url: str,
+        request: Any = None,
+        content: Optional[bytes] = None,
+        stream: Optional[Iterable[bytes]] = None,
+        connection: Optional["Transport"] = None,
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.request = request
+        self.connection = connection
+        self.encoding: Optional[str] = None
+        self.history: List["TransportResponse"] = []
+        self._content = content
+        self._stream = stream
+
+    def iter_content(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """Iterate over the body, the chunks are as sent by the transport whatever ``chunk_size``."""
+        if self._content is not None:
+            yield self._content
+            return
+        stream, self._stream = self._stream, None
+        if stream is None:
+            raise RuntimeError("the content of the response has already been consumed")
+        yield from stream
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b"".join(self.iter_content())
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def is_redirect(self) -> bool:
+        return "location" in self.headers and self.status_code in _REDIRECT_STATUS_CODES
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def close(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return "<TransportResponse [{}]>".format(self.status_code)
+
+
+class Transport(metaclass=abc.ABCMeta):
+    """
+    Base class of the transports. Subclasses implement :meth:`send`, the
+    other methods prepare the request like ``requests.Session`` does.
+
+    Transports take a proxy when they are created, in ``_proxy``. A request
+    given ``proxies``, e.g. from the ``SOCKS_PROXY`` environment variable,
+    fails with a transport without proxy rather than bypass them.
+    """
+
+    def __init__(self):
+        self.headers: Dict[str, str] = {}
+        self.auth: Optional[Callable[[Any], Any]] = None
+        self.cert = None
+        self.verify = True
+        self.trust_env = True
+        self._proxy: Optional[str] = None
+
+    @abc.abstractmethod
+    def send(
+        self,
+        request: TransportRequest,
+        timeout: Any = None,
+        allow_redirects: bool = False,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> TransportResponse:
+        """
+        Send ``request`` and return its response. ``timeout`` is a number of
+        seconds or a ``(connect, read)`` tuple. Unless ``stream`` is set, the
+        body is read before returning so that errors reading it are raised
+        here. ``request`` may also be a ``requests.PreparedRequest``, as
+        sent by authentication hooks.
+        """
+        pass
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Any = None,
+        allow_redirects: bool = True,
+        proxies: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> TransportResponse:
+        if self._proxy is None and proxies and any(proxies.values()):
+            raise ValueError(
+                "{} has no proxy, create it with the proxy of the requests: {}".format(type(self).__name__, proxies)
+            )
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        # like requests, headers set to None are not sent
+        request_headers = {name: value for name, value in request_headers.items() if value is not None}
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        request = TransportRequest(method, url, request_headers, data)
+        if self.auth is not None:
+            request = self.auth(request)
+        response = self.send(request, timeout=timeout, allow_redirects=allow_redirects, stream=stream)
+        for hook in request.hooks:
+            response = hook(response, timeout=timeout) or response
+        return response
+
+    def get(self, url, **kwargs) -> TransportResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> TransportResponse:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs) -> TransportResponse:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Transport sending requests with a ``requests.Session``, the default
+    session of the client. Its responses are ``requests.Response`` objects
+    and authentication is left to ``requests``.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session if session is not None else requests.Session()
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    @headers.setter
+    def headers(self, value):
+        self.session.headers = value
+
+    @property
+    def auth(self):
+        return self.session.auth
+
+    @auth.setter
+    def auth(self, value):
+        self.session.auth = value
+
+    @property
+    def cert(self):
+        return self.session.cert
+
+    @cert.setter
+    def cert(self, value):
+        self.session.cert = value
+
+    @property
+    def verify(self):
+        return self.session.verify
+
+    @verify.setter
+    def verify(self, value):
+        self.session.verify = value
+
+    @property
+    def trust_env(self):
+        return self.session.trust_env
+
+    @trust_env.setter
+    def trust_env(self, value):
+        self.session.trust_env = value
+
+    def send(self, request, timeout=None, allow_redirects=False, stream=False, **kwargs):
+        prepared = requests.Request(request.method, request.url, headers=request.headers, data=request.body).prepare()
+        return self.session.send(prepared, timeout=timeout, allow_redirects=allow_redirects, stream=stream)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _urllib3_error(err: Exception) -> Exception:
+    """Return the ``requests`` exception equivalent to the ``urllib3`` exception ``err``."""
+    if isinstance(err, urllib3.exceptions.ConnectTimeoutError):
+        return requests.exceptions.ConnectTimeout(str(err))
+    if isinstance(err, urllib3.exceptions.ReadTimeoutError):
+        return requests.exceptions.ReadTimeout(str(err))
+    if isinstance(err, urllib3.exceptions.SSLError):
+        return requests.exceptions.SSLError(str(err))
+    if isinstance(err, urllib3.exceptions.DecodeError):
+        return requests.exceptions.ContentDecodingError(str(err))
+    if isinstance(err, (urllib3.exceptions.ProtocolError, urllib3.exceptions.IncompleteRead)):
+        return requests.exceptions.ChunkedEncodingError(str(err))
+    return requests.exceptions.ConnectionError(str(err))
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport sending requests with an ``urllib3.PoolManager``.
+
+    :param max_connections: maximum number of connections kept per host.
+    :param proxy: URL of a proxy.
+    :param pool_kwargs: other arguments of ``urllib3.PoolManager``.
+
+    The pool is created on the first request, after the authentication
+    objects of the connection have set ``auth``, ``cert`` and ``verify``.
+    Kerberos authentication relies on ``requests`` and needs
+    :class:`RequestsTransport`.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS, proxy: Optional[str] = None, **pool_kwargs):
+        super().__init__()
+        self._max_connections = max_connections
+        self._proxy = proxy
+        self._pool_kwargs = pool_kwargs
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            kwargs: Dict[str, Any] = dict(maxsize=self._max_connections, retries=False)
+            if self.verify is False:
+                kwargs["cert_reqs"] = "CERT_NONE"
+            elif isinstance(self.verify, str):
+                kwargs["ca_certs"] = self.verify
+            if self.cert is not None:
+                if isinstance(self.cert, tuple):
+                    kwargs["cert_file"], kwargs["key_file"] = self.cert
+                else:
+                    kwargs["cert_file"] = self.cert
+            kwargs.update(self._pool_kwargs)
+            if self._proxy is not None:
+                self._pool = urllib3.ProxyManager(self._proxy, **kwargs)
+            else:
+                self._pool = urllib3.PoolManager(**kwargs)
+        return self._pool
+
+    @staticmethod
+    def _timeout(timeout):
+        if timeout is None:
+            return urllib3.Timeout(connect=None, read=None)
+        if isinstance(timeout, tuple):
+            return urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        return urllib3.Timeout(connect=timeout, read=timeout)
+
+    @staticmethod
+    def _stream(response) -> Iterator[bytes]:
+        try:
+            yield from response.stream(CHUNK_SIZE, decode_content=True)
+        except urllib3.exceptions.HTTPError as err:
+            raise _urllib3_error(err) from err
+        finally:
+            response.release_conn()
+
+    def send(self, request, timeout=None, allow_redirects=False, stream=False, **kwargs):
+        try:
+            response = self._get_pool().request(
+                request.method,
+                request.url,
+                body=request.body,
+                headers=dict(request.headers),
+                timeout=self._timeout(timeout),
+                redirect=allow_redirects,
+                preload_content=False,
+            )
+        except urllib3.exceptions.HTTPError as err:
+            raise _urllib3_error(err) from err
+        transport_response = TransportResponse(
+            response.status,
+            response.headers,
+            response.geturl() or request.url,
+            request=request,
+            stream=self._stream(response),
+            connection=self,
+        )
+        if not stream:
+            # read the body here so that errors while reading it are retried
+            transport_response.content
+        return transport_response
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.clear()
+            self._pool = None